@@ -10,11 +10,18 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 # OpenWatherMap Config
 OPENWEATHER_URL = os.getenv("OPENWEATHER_URL")
 API_KEY = os.getenv("API_KEY")
+OPENWEATHER_RPM = float(os.getenv("OPENWEATHER_RPM", "60"))  # calls/minute of the key's plan
 
 # Orobnat config
 BASE = os.getenv("BASE_OROBNAT")
 URL_GET = os.getenv("URL_OROBNAT_GET")
 URL_POST = os.getenv("URL_OROBNAT_POST")
+HTML_PARSER = os.getenv("HTML_PARSER", "auto")  # auto | lxml | bs4 | stream
+OROBNAT_ENCODING = os.getenv("OROBNAT_ENCODING", "")  # pin the page encoding ("" = sniff)
+OROBNAT_REGION = os.getenv("OROBNAT_REGION", "11")  # idRegion of cities without a region
+# Typed valeur/limite/reference columns: opt-in, set to "1" once db/resultats_values.sql
+# is applied (upserts fail on the missing columns otherwise)
+RESULTS_TYPED_COLUMNS = os.getenv("RESULTS_TYPED_COLUMNS", "0") == "1"
 
 # API data.gouv.fr -- Communes in France
 CSV_URL = os.getenv("CSV_URL")
@@ -0,0 +1,12 @@
+-- Conflict targets of the catalogue upserts (hydro/discovery.py):
+-- water_network on water_code, cities on (commune_code, water_code).
+CREATE UNIQUE INDEX IF NOT EXISTS water_network_water_code_key
+    ON water_network (water_code);
+CREATE UNIQUE INDEX IF NOT EXISTS cities_commune_water_key
+    ON cities (commune_code, water_code);
+
+-- Discovered cities come without postal code or coordinates
+ALTER TABLE cities
+    ALTER COLUMN postal_code DROP NOT NULL,
+    ALTER COLUMN lat DROP NOT NULL,
+    ALTER COLUMN lon DROP NOT NULL;
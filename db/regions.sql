@@ -0,0 +1,5 @@
+-- OROBNAT idRegion of each city / network (hydro/regions.py). NULL rows use
+-- OROBNAT_REGION (default '11', Ile-de-France).
+ALTER TABLE cities ADD COLUMN IF NOT EXISTS region TEXT;
+ALTER TABLE water_network ADD COLUMN IF NOT EXISTS region TEXT;
+CREATE INDEX IF NOT EXISTS cities_region_idx ON cities (region);
@@ -0,0 +1,23 @@
+-- Typed columns parsed from the raw valeur / limite_qualite / reference_qualite text
+-- (hydro/parsing/values.py). The raw columns are kept unchanged.
+-- The ETL writes them only with RESULTS_TYPED_COLUMNS=1: apply this file first, then set it.
+ALTER TABLE fait_anl_resultats_analyses
+    ADD COLUMN IF NOT EXISTS valeur_op TEXT,
+    ADD COLUMN IF NOT EXISTS valeur_num DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS valeur_max DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS valeur_unit TEXT,
+    ADD COLUMN IF NOT EXISTS valeur_flag TEXT,
+    ADD COLUMN IF NOT EXISTS limite_qualite_op TEXT,
+    ADD COLUMN IF NOT EXISTS limite_qualite_num DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS limite_qualite_max DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS limite_qualite_unit TEXT,
+    ADD COLUMN IF NOT EXISTS limite_qualite_flag TEXT,
+    ADD COLUMN IF NOT EXISTS reference_qualite_op TEXT,
+    ADD COLUMN IF NOT EXISTS reference_qualite_num DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS reference_qualite_max DOUBLE PRECISION,
+    ADD COLUMN IF NOT EXISTS reference_qualite_unit TEXT,
+    ADD COLUMN IF NOT EXISTS reference_qualite_flag TEXT;
+
+-- Threshold checks and time series on the typed values
+CREATE INDEX IF NOT EXISTS idx_resultats_parametre_valeur
+    ON fait_anl_resultats_analyses (parametre, valeur_num);
@@ -3,8 +3,14 @@
 
 from __future__ import annotations
 
+import logging
+import threading
+import time
+from collections.abc import Callable, Iterator
 from typing import Any
 
+import httpx
+from postgrest.exceptions import APIError
 from supabase import Client, create_client
 
 from config import SUPABASE_KEY, SUPABASE_URL
@@ -27,19 +33,46 @@ TBL_INFO = "fait_anl_informations_generales"
 TBL_CONF = "fait_anl_conformite"
 TBL_RESULTS = "fait_anl_resultats_analyses"
 
+log = logging.getLogger("hydromet")
+
 
 # =====================================================================
 # Generic helpers (optional small wrappers for consistency)
 # =====================================================================
 
 
-def _exec_or_raise(op, *, label: str = ""):
+# observer(stage, seconds, rows, ok) of every query, e.g. hydro's metrics registry;
+# installed by the caller so this package does not depend on hydro
+QueryObserver = Callable[[str, float, int | None, bool], None]
+_query_observer: QueryObserver | None = None
+
+
+def set_query_observer(observer: QueryObserver | None) -> None:
+    """Report every query (stage `db.<label>`) to `observer` (None = stop reporting)."""
+    global _query_observer  # noqa: PLW0603
+    _query_observer = observer
+
+
+def _exec_or_raise(op, *, label: str = "", observe: QueryObserver | None = None):
     """
     Execute a Supabase operation and return its response.
     If Supabase raises, let it bubble up; callers can catch if needed.
+    Time and row count go to `observe` (default: the set_query_observer one)
+    under `db.<label>`.
     """
-    resp = op.execute()
-    # You may add logging here if desired
+    observe = observe or _query_observer
+    stage = f"db.{label or 'query'}"
+    t0 = time.perf_counter()
+    try:
+        resp = op.execute()
+    except Exception:
+        if observe:
+            observe(stage, time.perf_counter() - t0, None, False)
+        raise
+    if observe:
+        data = getattr(resp, "data", None)
+        rows = len(data) if isinstance(data, list) else None
+        observe(stage, time.perf_counter() - t0, rows, True)
     return resp
 
 
@@ -48,12 +81,60 @@ def _exec_or_raise(op, *, label: str = ""):
 # =====================================================================
 
 
-def fetch_cities() -> list[dict[str, Any]]:
-    """Fetch active cities from Supabase."""
-    res = _exec_or_raise(
-        supabase.table(TBL_CITIES).select("*").eq("active", True), label="fetch_cities"
-    )
-    return res.data or []
+# Cities are paged on their primary key: unique, indexed, never NULL
+CITY_KEY = "id"
+CITY_PAGE_SIZE = 500  # below PostgREST's default max-rows (1000)
+
+
+def iter_cities(
+    columns: tuple[str, ...] | None = None, page_size: int = CITY_PAGE_SIZE
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield active cities page by page (keyset pagination on CITY_KEY), selecting
+    only `columns` (None = all). Never truncated by the server's row cap.
+    Rows are not filtered on their codes: each job skips what it cannot use.
+    """
+    cols = "*" if not columns else ",".join(dict.fromkeys((CITY_KEY, *columns)))
+    last: Any = None
+    while True:
+        q = supabase.table(TBL_CITIES).select(cols).eq("active", True)
+        if last is not None:
+            q = q.gt(CITY_KEY, last)
+        q = q.order(CITY_KEY).limit(page_size)
+        rows = _exec_or_raise(q, label="iter_cities").data or []
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last = rows[-1][CITY_KEY]
+
+
+def cities_version() -> dict[str, Any]:
+    """
+    Cheap change marker for the active cities: row count plus the newest
+    inserted_at / updated_at (updated_at is skipped if the column does not exist).
+    """
+    version: dict[str, Any] = {}
+    for col in ("inserted_at", "updated_at"):
+        try:
+            res = _exec_or_raise(
+                supabase.table(TBL_CITIES)
+                .select(col, count="exact")
+                .eq("active", True)
+                .order(col, desc=True, nullsfirst=False)
+                .limit(1),
+                label="cities_version",
+            )
+        except Exception as e:
+            log.debug(f"cities_version: no {col} ({e})")
+            continue
+        version["count"] = res.count
+        version[f"max_{col}"] = res.data[0].get(col) if res.data else None
+    return version
+
+
+def fetch_cities(columns: tuple[str, ...] | None = None) -> list[dict[str, Any]]:
+    """Fetch all active cities from Supabase (paginated)."""
+    return list(iter_cities(columns))
 
 
 def insert_city(data: dict[str, Any]) -> Any:
@@ -74,11 +155,73 @@ def insert_water_network(data: dict[str, Any]) -> Any:
         return {"error": str(e)}
 
 
+def upsert_water_networks(rows: list[dict[str, Any]]) -> int:
+    """Upsert water_network rows on water_code (names are refreshed); return rows sent."""
+    for i in range(0, len(rows), CITY_PAGE_SIZE):
+        _exec_or_raise(
+            supabase.table(TBL_WATER_NETWORK).upsert(
+                rows[i : i + CITY_PAGE_SIZE], on_conflict="water_code"
+            ),
+            label="upsert_water_networks",
+        )
+    return len(rows)
+
+
+def insert_missing_cities(rows: list[dict[str, Any]]) -> int:
+    """
+    Insert the city rows whose (commune_code, water_code) is not in `cities`
+    yet; existing rows are left untouched (active flag, coordinates, ...).
+    Return rows sent.
+    """
+    for i in range(0, len(rows), CITY_PAGE_SIZE):
+        _exec_or_raise(
+            supabase.table(TBL_CITIES).upsert(
+                rows[i : i + CITY_PAGE_SIZE],
+                on_conflict="commune_code,water_code",
+                ignore_duplicates=True,
+            ),
+            label="insert_missing_cities",
+        )
+    return len(rows)
+
+
 def insert_weather(row: dict[str, Any]) -> Any:
     """Insert one weather_data row."""
     return _exec_or_raise(supabase.table(TBL_WEATHER).insert(row), label="insert_weather")
 
 
+# One observation per OpenWeather city and measurement time (db/weather.sql)
+WEATHER_KEY = ("city_id", "dt_unix")
+
+
+def upsert_weather(rows: list[dict[str, Any]]) -> int:
+    """
+    Upsert weather_data rows on WEATHER_KEY, CITY_PAGE_SIZE rows per request,
+    so a rerun updates instead of duplicating. Rows sharing a key are
+    collapsed (last wins): one statement cannot update a row twice.
+    Until db/weather.sql is applied (no unique index for ON CONFLICT) the rows
+    are inserted as before. Return rows sent.
+    """
+    unique = list({tuple(r.get(k) for k in WEATHER_KEY): r for r in rows}.values())
+    keyed = True
+    for i in range(0, len(unique), CITY_PAGE_SIZE):
+        chunk = unique[i : i + CITY_PAGE_SIZE]
+        if keyed:
+            try:
+                _exec_or_raise(
+                    supabase.table(TBL_WEATHER).upsert(chunk, on_conflict=",".join(WEATHER_KEY)),
+                    label="upsert_weather",
+                )
+                continue
+            except APIError as e:
+                if _api_code(e) != "42P10":  # no unique index matching ON CONFLICT
+                    raise
+                log.warning("No (city_id, dt_unix) index on weather_data: inserting instead")
+                keyed = False
+        _exec_or_raise(supabase.table(TBL_WEATHER).insert(chunk), label="insert_weather")
+    return len(unique)
+
+
 # =====================================================================
 # New normalized analysis helpers (4 tables)
 # =====================================================================
@@ -134,6 +277,7 @@ def upsert_resultats(rows: list[dict[str, Any]]) -> Any:
     PK: (id, parametre)
     Expected keys per row:
       - id, parametre, valeur, limite_qualite, reference_qualite
+      - optional typed columns <field>_op/_num/_max/_unit/_flag (db/resultats_values.sql)
     """
     if not rows:
         return {"status": "noop", "message": "empty list"}
@@ -164,6 +308,261 @@ def upsert_all_normalized(
         upsert_resultats(resultats_rows)
 
 
+# =====================================================================
+# Cross-page bulk writer
+# =====================================================================
+
+# (table, on_conflict columns) in FK-safe order: criteres first
+NORMALIZED_TABLES = [
+    (TBL_CRITERES, ("id",)),
+    (TBL_INFO, ("id",)),
+    (TBL_CONF, ("id",)),
+    (TBL_RESULTS, ("id", "parametre")),
+]
+
+
+BULK_ATTEMPTS = 3  # whole-batch tries on transient errors
+BULK_BACKOFF = 2.0  # seconds, doubled per retry
+
+# SQLSTATE classes caused by some rows of a batch: data exception, integrity constraint
+_ROW_SQLSTATES = ("22", "23")
+# ... and those worth retrying as is: connection, rollback, resources, operator intervention
+_TRANSIENT_SQLSTATES = ("08", "40", "53", "57")
+SQLSTATE_LEN = 5  # PostgREST error codes of this length are Postgres SQLSTATEs
+HTTP_CODE_LEN = 3  # ... and of this one, the HTTP status of a non-JSON error
+
+
+def _api_code(e: Exception) -> str:
+    return str(e.code or "") if isinstance(e, APIError) else ""
+
+
+def is_missing_column(e: Exception) -> bool:
+    """The query named a column the table lacks (a migration not applied yet)."""
+    return _api_code(e) in ("42703", "PGRST204")
+
+
+def _is_row_error(e: Exception) -> bool:
+    """A data/constraint error: some rows are bad, the others can still be written."""
+    code = _api_code(e)
+    return len(code) == SQLSTATE_LEN and code[:2] in _ROW_SQLSTATES
+
+
+def _is_transient(e: Exception) -> bool:
+    """Network errors, 429/5xx and retryable Postgres errors (outage, overload, deadlock)."""
+    if isinstance(e, httpx.TransportError | OSError):
+        return True
+    code = _api_code(e)
+    if len(code) == HTTP_CODE_LEN:
+        return code == "429" or code.startswith("5")
+    return len(code) == SQLSTATE_LEN and code[:2] in _TRANSIENT_SQLSTATES
+
+
+def _upsert_batch(
+    table: str,
+    rows: list[dict[str, Any]],
+    key_cols: tuple[str, ...],
+    observe: QueryObserver | None = None,
+) -> None:
+    """One multi-row upsert; transient errors retry the whole batch, then are raised."""
+    for attempt in range(1, BULK_ATTEMPTS + 1):
+        try:
+            _exec_or_raise(
+                supabase.table(table).upsert(rows, on_conflict=",".join(key_cols)),
+                label=f"bulk_upsert:{table}",
+                observe=observe,
+            )
+            return
+        except Exception as e:
+            if attempt >= BULK_ATTEMPTS or not _is_transient(e):
+                raise
+            log.warning(f"Bulk upsert into {table} failed ({e}); retrying the whole batch")
+            time.sleep(BULK_BACKOFF * 2 ** (attempt - 1))
+
+
+def _upsert_isolated(
+    table: str,
+    rows: list[dict[str, Any]],
+    key_cols: tuple[str, ...],
+    observe: QueryObserver | None = None,
+) -> list[tuple[dict[str, Any], str]]:
+    """
+    Upsert `rows` in one request; on a data/constraint error, bisect so only
+    bad rows are dropped. Any other error (outage, schema) is raised for the
+    whole batch: bisecting it would only multiply the requests.
+    Return [(row, error)] for the rows that could not be written.
+    """
+    if not rows:
+        return []
+    try:
+        _upsert_batch(table, rows, key_cols, observe)
+        return []
+    except Exception as e:
+        if not _is_row_error(e):
+            raise
+        if len(rows) == 1:
+            return [(rows[0], str(e))]
+    mid = len(rows) // 2
+    return _upsert_isolated(table, rows[:mid], key_cols, observe) + _upsert_isolated(
+        table, rows[mid:], key_cols, observe
+    )
+
+
+def upsert_many_normalized(
+    pages: list[tuple[dict[str, Any], dict[str, Any], dict[str, Any], list[dict[str, Any]]]],
+    observe: QueryObserver | None = None,
+) -> list[tuple[str, str, str]]:
+    """
+    Multi-page version of upsert_all_normalized: one upsert per table for all
+    `pages` (criteres, informations, conformite, resultats), in FK-safe order.
+    A page whose criteres row fails is dropped from the dependent tables.
+    Return [(table, page_id, error)] for every row that was not written;
+    errors that are not about specific rows are raised.
+    """
+    batches: list[list[dict[str, Any]]] = [[], [], [], []]
+    for crit, info, conf, res in pages:
+        batches[0].append(crit)
+        batches[1].append(info)
+        batches[2].append(conf)
+        batches[3].extend(res or [])
+
+    errors: list[tuple[str, str, str]] = []
+    bad_ids: set[str] = set()
+    for (table, key_cols), rows in zip(NORMALIZED_TABLES, batches, strict=True):
+        # Same key twice in one statement is rejected by Postgres: keep the last one
+        dedup = {tuple(r.get(c) for c in key_cols): r for r in rows if r.get("id") not in bad_ids}
+        for row, err in _upsert_isolated(table, list(dedup.values()), key_cols, observe):
+            errors.append((table, str(row.get("id")), err))
+            if table == TBL_CRITERES:
+                bad_ids.add(row.get("id"))
+    for pid in bad_ids:
+        errors.append((TBL_CRITERES, str(pid), "dependent rows skipped (criteres failed)"))
+    return errors
+
+
+class BulkWriter:
+    """
+    Buffer normalized rows from many pages and write each table as one
+    multi-row upsert. Flushes when `max_pages` pages are buffered, when the
+    oldest buffered page is `max_seconds` old (checked on add and by a
+    background thread, so a slow tail is not held back), or on flush()/close().
+    `on_done(page_id, error)` callbacks run after the page's rows were attempted;
+    when a whole flush fails, every page of it gets the error.
+    Thread-safe: workers may add pages concurrently. `observe` receives the
+    timing of every bulk upsert (default: the set_query_observer one).
+    """
+
+    def __init__(
+        self,
+        max_pages: int = 200,
+        max_seconds: float = 15.0,
+        observe: QueryObserver | None = None,
+    ):
+        self.max_pages = max(1, max_pages)
+        self.max_seconds = max_seconds
+        self.observe = observe
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pages: list = []
+        self._callbacks: list[tuple[str, Callable[[str, str | None], None] | None]] = []
+        self._first_at = 0.0
+        self._closed = threading.Event()
+        self._timer: threading.Thread | None = None
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.pages_failed = 0
+        self.rows_written = 0
+        self.errors: list[tuple[str, str, str]] = []
+
+    def add_page(
+        self,
+        criteres_row: dict[str, Any],
+        informations_row: dict[str, Any],
+        conformite_row: dict[str, Any],
+        resultats_rows: list[dict[str, Any]],
+        on_done: Callable[[str, str | None], None] | None = None,
+    ) -> None:
+        if not criteres_row or "id" not in criteres_row:
+            raise ValueError("BulkWriter.add_page: 'id' is required")
+        with self._lock:
+            if not self._pages:
+                self._first_at = time.monotonic()
+            if self._timer is None and self.max_seconds > 0:
+                self._timer = threading.Thread(
+                    target=self._flush_when_due, name="bulk-flush", daemon=True
+                )
+                self._timer.start()
+            self._pages.append((criteres_row, informations_row, conformite_row, resultats_rows))
+            self._callbacks.append((criteres_row["id"], on_done))
+            due = len(self._pages) >= self.max_pages or (
+                time.monotonic() - self._first_at >= self.max_seconds
+            )
+        if due:
+            self.flush()
+
+    def _due(self) -> bool:
+        with self._lock:
+            return bool(self._pages) and time.monotonic() - self._first_at >= self.max_seconds
+
+    def _flush_when_due(self) -> None:
+        """Time-based flush while no new page arrives."""
+        while not self._closed.wait(min(1.0, self.max_seconds / 2)):
+            if self._due():
+                try:
+                    self.flush()
+                except Exception as e:  # never kill the timer; close() flushes again
+                    log.error(f"Background bulk flush failed: {e}")
+
+    def flush(self) -> int:
+        """Write everything buffered; return the number of pages flushed."""
+        with self._flush_lock:
+            with self._lock:
+                pages, callbacks = self._pages, self._callbacks
+                self._pages, self._callbacks = [], []
+            if not pages:
+                return 0
+            self.flushes += 1
+            by_id: dict[str, str] = {}
+            try:
+                errors = upsert_many_normalized(pages, self.observe)
+            except Exception as e:
+                self.failed_flushes += 1
+                self.pages_failed += len(pages)
+                log.error(f"Bulk flush of {len(pages)} page(s) failed: {e}")
+                by_id = {str(pid): f"bulk write failed: {e}" for pid, _ in callbacks}
+            else:
+                self.rows_written += sum(3 + len(p[3] or []) for p in pages) - len(errors)
+                self.errors.extend(errors)
+                if errors:
+                    log.error(
+                        f"Bulk flush: {len(errors)} row(s) rejected out of {len(pages)} page(s)"
+                    )
+                for _, pid, err in errors:
+                    by_id.setdefault(pid, err)
+            for pid, cb in callbacks:
+                if not cb:
+                    continue
+                try:  # the pages already left the buffer: every callback must run
+                    cb(pid, by_id.get(str(pid)))
+                except Exception as e:
+                    log.error(f"Bulk flush: on_done failed for page {pid}: {e}")
+            return len(pages)
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+
+    def summary(self) -> str:
+        return (
+            f"Bulk writes: {self.flushes} flush(es) | rows written: {self.rows_written} | "
+            f"rows rejected: {len(self.errors)}"
+            + (
+                f" | failed flushes: {self.failed_flushes} ({self.pages_failed} page(s))"
+                if self.failed_flushes
+                else ""
+            )
+        )
+
+
 # =====================================================================
 # Small read helpers (useful for debugging)
 # =====================================================================
@@ -0,0 +1,14 @@
+-- Conflict target of the weather upsert (weather/fetch_weather.py):
+-- one weather_data row per (city_id, dt_unix).
+-- Deploy step (see db/README.md): the DELETE below is destructive, back up
+-- weather_data first. Until this runs, upsert_weather falls back to inserts.
+
+-- Drop the duplicates earlier reruns inserted, keeping the first row
+DELETE FROM weather_data a
+    USING weather_data b
+    WHERE a.ctid > b.ctid
+      AND a.city_id = b.city_id
+      AND a.dt_unix = b.dt_unix;
+
+CREATE UNIQUE INDEX IF NOT EXISTS weather_data_city_dt_key
+    ON weather_data (city_id, dt_unix);
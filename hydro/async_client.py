@@ -0,0 +1,144 @@
+"""
+Asyncio counterpart of http_client (aiohttp):
+- make_session(): one ClientSession shared by every in-flight search
+- warmup_get(): warm-up GET, retried; failures are logged and ignored
+- post_search(): POST the search payload, re-warming once if the session expired
+Retries, circuit breaker and stats work exactly as in the sync client (retry.py).
+"""
+
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from .http_client import DEFAULT_RETRY, looks_expired, warmup_params
+from .metrics import METRICS
+from .parsing.encoding import charset_from_content_type, decode_html
+from .retry import CircuitBreaker, RequestStats, RetryPolicy, send_async
+from .settings import DEFAULT_HEADERS, URL_GET, URL_POST, VERIFY_SSL
+from .throttle import TokenBucket
+
+log = logging.getLogger("hydromet")
+
+# (status, body, session_expired, Retry-After)
+_Attempt = tuple[int, str, bool, str | None]
+
+
+def make_session(concurrency: int = 100) -> aiohttp.ClientSession:
+    """
+    Return a ClientSession with default headers and a keep-alive connector
+    capped at `concurrency` open connections. Must be called inside a running loop.
+    """
+    connector = aiohttp.TCPConnector(limit=concurrency, ssl=None if VERIFY_SSL else False)
+    return aiohttp.ClientSession(
+        headers={**DEFAULT_HEADERS, "Accept-Encoding": "gzip, deflate"},
+        connector=connector,
+        cookie_jar=aiohttp.CookieJar(unsafe=True),
+    )
+
+
+def _timeout(policy: RetryPolicy) -> aiohttp.ClientTimeout:
+    return aiohttp.ClientTimeout(sock_connect=policy.connect_timeout, sock_read=policy.read_timeout)
+
+
+def _retryable_exc(e: Exception) -> bool:
+    return isinstance(e, aiohttp.ClientConnectionError | asyncio.TimeoutError)
+
+
+def _status_of(a: _Attempt) -> tuple[int, str | None]:
+    return a[0], a[3]
+
+
+async def warmup_get(
+    session: aiohttp.ClientSession,
+    limiter: TokenBucket | None = None,
+    *,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+    region: str | None = None,
+) -> None:
+    """Optional warm-up GET (menu of `region`). If it fails after retries, we log and continue."""
+    policy = policy or DEFAULT_RETRY
+    params = warmup_params(region)
+
+    async def attempt() -> _Attempt:
+        async with session.get(URL_GET, params=params, timeout=_timeout(policy)) as resp:
+            await resp.read()
+            return resp.status, "", False, resp.headers.get("Retry-After")
+
+    try:
+        await send_async(
+            attempt,
+            _status_of,
+            policy=policy,
+            breaker=breaker,
+            stats=stats,
+            before=limiter.acquire_async if limiter else None,
+            retryable_exc=_retryable_exc,
+        )
+    except Exception as e:
+        log.warning(f"Warm-up GET failed, continuing without it: {e}")
+
+
+async def _post(
+    session: aiohttp.ClientSession,
+    payload: dict,
+    limiter: TokenBucket | None,
+    *,
+    retry_if_expired: bool,
+    policy: RetryPolicy,
+    breaker: CircuitBreaker | None,
+    stats: RequestStats | None,
+) -> _Attempt:
+    async def attempt() -> _Attempt:
+        async with session.post(URL_POST, data=payload, timeout=_timeout(policy)) as resp:
+            body = await resp.read()
+            METRICS.add("http.bytes", len(body))
+            with METRICS.timer("http.decode"):
+                header = charset_from_content_type(resp.headers.get("Content-Type"))
+                text = decode_html(body, header)
+            locations = [r.headers.get("Location") or "" for r in resp.history]
+            expired = looks_expired(resp.status, str(resp.url), locations, body)
+            if not (expired and retry_if_expired) and resp.status not in policy.retry_statuses:
+                resp.raise_for_status()
+            return resp.status, text, expired, resp.headers.get("Retry-After")
+
+    t0 = time.perf_counter()
+    result = await send_async(
+        attempt,
+        _status_of,
+        policy=policy,
+        breaker=breaker,
+        stats=stats,
+        before=limiter.acquire_async if limiter else None,
+        retryable_exc=_retryable_exc,
+    )
+    METRICS.observe("http.post", time.perf_counter() - t0)
+    if result[0] >= 400 and not (result[2] and retry_if_expired):
+        raise RuntimeError(f"POST failed: {result[0]}")
+    return result
+
+
+async def post_search(
+    session: aiohttp.ClientSession,
+    payload: dict,
+    limiter: TokenBucket | None = None,
+    *,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+) -> tuple[int, str]:
+    """
+    POST to OROBNAT and return (status_code, response_text).
+    Raises on non-2xx responses once retries are exhausted.
+    """
+    kw = {"policy": policy or DEFAULT_RETRY, "breaker": breaker, "stats": stats}
+    status, text, expired, _ = await _post(session, payload, limiter, retry_if_expired=True, **kw)
+    if expired:
+        log.info("OROBNAT session expired; warming up again")
+        session.cookie_jar.clear()
+        await warmup_get(session, limiter, **kw)
+        status, text, _, _ = await _post(session, payload, limiter, retry_if_expired=False, **kw)
+    return status, text
@@ -0,0 +1,106 @@
+# hydro/async_runner.py
+"""
+Async ETL: many city searches in flight on one event loop.
+
+- network: one aiohttp session, a semaphore caps in-flight cities
+- CPU (parsing) and DB writes (blocking supabase client): run in a thread
+  executor, so the loop only ever waits on sockets
+"""
+
+import asyncio
+import logging
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+
+from . import async_client
+from .etl_runner import EtlContext, ingest_fetched
+from .payloads import build_search_payload
+from .retry import CircuitBreaker, RequestStats, RetryPolicy, is_success
+from .throttle import TokenBucket
+
+log = logging.getLogger("hydromet")
+
+# (index, city, page_id, error) — same shape as executor.run_batch
+AsyncResult = tuple[int, dict, str | None, Exception | None]
+
+
+async def process_city_async(
+    city: dict,
+    session,
+    *,
+    limiter: TokenBucket | None = None,
+    executor: ThreadPoolExecutor | None = None,
+    ctx: EtlContext | None = None,
+    on_done: Callable[[str, str | None], None] | None = None,
+    **http_kw,
+) -> str:
+    """
+    `http_kw` (policy, breaker, stats) is forwarded to async_client.post_search;
+    `on_done` to ingest_fetched.
+    """
+    payload = build_search_payload(city)
+    status, html = await async_client.post_search(session, payload, limiter, **http_kw)
+    if not is_success(status):
+        raise RuntimeError(f"POST failed: {status}")
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, ingest_fetched, html, payload, ctx or EtlContext(), on_done
+    )
+
+
+async def run_batch_async(
+    cities: Iterable[dict],
+    *,
+    concurrency: int = 50,
+    limiter: TokenBucket | None = None,
+    write_workers: int = 4,
+    on_result: Callable[[AsyncResult], None] | None = None,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+    ctx: EtlContext | None = None,
+    on_done: Callable[[int, dict], Callable[[str, str | None], None]] | None = None,
+) -> list[AsyncResult]:
+    """
+    Process every city with at most `concurrency` searches in flight.
+    `on_result` is called (on the loop thread) as soon as each city finishes.
+    `ctx` supplies the post-fetch collaborators (cache, fingerprints, writer);
+    `on_done(i, city)` builds the city's ingest_fetched callback (bulk writes).
+    """
+    http_kw = {"policy": policy, "breaker": breaker, "stats": stats}
+    sem = asyncio.Semaphore(max(1, concurrency))
+    results: list[AsyncResult] = []
+
+    with ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="hydro-io") as ex:
+        async with async_client.make_session(concurrency) as session:
+            await async_client.warmup_get(session, limiter, **http_kw)
+
+            async def one(i: int, city: dict) -> None:
+                async with sem:
+                    try:
+                        pid = await process_city_async(
+                            city,
+                            session,
+                            limiter=limiter,
+                            executor=ex,
+                            ctx=ctx,
+                            on_done=on_done(i, city) if on_done else None,
+                            **http_kw,
+                        )
+                        res: AsyncResult = (i, city, pid, None)
+                    except Exception as e:
+                        res = (i, city, None, e)
+                results.append(res)
+                if on_result:
+                    try:
+                        on_result(res)
+                    except Exception as e:  # a bad callback must not abort the gather
+                        log.error(f"Recording city #{i} failed: {e}")
+
+            await asyncio.gather(*(one(i, c) for i, c in enumerate(cities)))
+    return results
+
+
+def run_batch_async_sync(cities: Iterable[dict], **kwargs) -> list[AsyncResult]:
+    """Blocking entry point for the CLI."""
+    return asyncio.run(run_batch_async(cities, **kwargs))
@@ -0,0 +1,207 @@
+# hydro/backfill.py
+"""
+Historical backfill: walk OROBNAT's posPLV (0 = latest sample, 1 = the one
+before, ...) for each city and store every past sample.
+
+A SQLite state (one row per city) makes the walk resumable and incremental:
+- next_pos: next position of the deep walk, saved after every stored page
+- newest:   sampling date of the newest sample the backfill covered
+- oldest:   sampling date of the last sample reached by the deep walk
+- end_seen: consecutive runs whose deep walk hit an empty or repeated page
+- complete: the end was seen END_CONFIRMATIONS runs in a row; one odd page
+  (error page, empty answer under load) only makes the next run retry it
+
+Each run first tops up the samples published since `newest` (from posPLV 0,
+stopping at the first sample already covered), shifts next_pos by their
+number (new samples push the older ones to higher positions), then resumes
+the deep walk up to `depth`. Samples already in the database (e.g. stored by
+the daily run) are not rewritten. Pages are upserted directly, so the state
+never runs ahead of what is stored.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from db.supabase_utils import get_page_exists
+
+from .etl_runner import EtlContext, prelevement_datetime, upsert_page
+from .metrics import METRICS
+from .parsing.mappers import build_id_from_date_and_insee
+from .parsing.page import ParsedPage, parse_page
+from .payloads import build_search_payload, city_key
+from .retry import is_success
+
+DEFAULT_DEPTH = 100  # highest posPLV walked per city
+END_CONFIRMATIONS = 2  # runs in a row that must see the end before it is final
+
+
+@dataclass
+class BackfillState:
+    next_pos: int = 0
+    newest: str | None = None  # ISO sampling datetimes
+    oldest: str | None = None
+    complete: bool = False
+    samples: int = 0
+    end_seen: int = 0
+
+
+class BackfillStore:
+    """SQLite-backed city_key -> BackfillState map with per-run counters."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS backfill (
+                    city_key   TEXT PRIMARY KEY,
+                    next_pos   INTEGER NOT NULL,
+                    newest     TEXT,
+                    oldest     TEXT,
+                    complete   INTEGER NOT NULL,
+                    samples    INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    end_seen   INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            cols = {r[1] for r in self._db.execute("PRAGMA table_info(backfill)")}
+            if "end_seen" not in cols:  # state files written before end_seen existed
+                self._db.execute(
+                    "ALTER TABLE backfill ADD COLUMN end_seen INTEGER NOT NULL DEFAULT 0"
+                )
+        self.counts = {"fetched": 0, "stored": 0, "existing": 0}
+
+    def get(self, key: str) -> BackfillState:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT next_pos, newest, oldest, complete, samples, end_seen FROM backfill "
+                "WHERE city_key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return BackfillState()
+        return BackfillState(row[0], row[1], row[2], bool(row[3]), row[4], row[5])
+
+    def save(self, key: str, st: BackfillState) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO backfill (city_key, next_pos, newest, oldest, complete, "
+                "samples, updated_at, end_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    st.next_pos,
+                    st.newest,
+                    st.oldest,
+                    int(st.complete),
+                    st.samples,
+                    time.time(),
+                    st.end_seen,
+                ),
+            )
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def totals(self) -> tuple[int, int]:
+        """(cities with a complete history, cities walked so far)."""
+        with self._lock:
+            row = self._db.execute("SELECT SUM(complete), COUNT(*) FROM backfill").fetchone()
+        return int(row[0] or 0), int(row[1] or 0)
+
+    def summary(self) -> str:
+        c = self.counts
+        complete, walked = self.totals()
+        return (
+            f"Backfill: {c['fetched']} page(s) fetched | {c['stored']} sample(s) stored | "
+            f"{c['existing']} already in DB | {complete}/{walked} city(ies) complete"
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _fetch(city: dict, pos: int, ctx: EtlContext) -> tuple[dict, ParsedPage, datetime | None]:
+    payload = build_search_payload(city, pos)
+    status, html = ctx.pool.post_search(payload)
+    if not is_success(status):
+        raise RuntimeError(f"POST failed: {status} (posPLV={pos})")
+    if ctx.cache:
+        ctx.cache.put(payload, html)
+    with METRICS.timer("parse.page"):
+        page = parse_page(html)
+    return payload, page, prelevement_datetime(page)
+
+
+def _store(page: ParsedPage, payload: dict, dt: datetime, store: BackfillStore) -> None:
+    """Upsert one sample unless it is already in the database."""
+    page_id = build_id_from_date_and_insee(dt, payload.get("communeDepartement"))
+    if get_page_exists(page_id):
+        store.count("existing")
+        return
+    upsert_page(page, payload)
+    store.count("stored")
+
+
+def backfill_city(
+    city: dict, ctx: EtlContext, store: BackfillStore, depth: int = DEFAULT_DEPTH
+) -> str:
+    """
+    Top up and continue the posPLV walk of one city; return a short progress note.
+    With ctx.write=False pages are fetched and parsed only (no upsert, no state).
+    """
+    key = city_key(city)
+    st = store.get(key)
+    persist = ctx.write
+
+    new = 0
+    if st.newest:
+        newest = st.newest
+        for pos in range(depth + 1):
+            payload, page, dt = _fetch(city, pos, ctx)
+            store.count("fetched")
+            if dt is None or dt.isoformat() <= st.newest:
+                break  # reached the samples already covered
+            if pos == 0:
+                newest = dt.isoformat()
+            if persist:
+                _store(page, payload, dt, store)
+            new += 1
+        st.next_pos += new
+        st.newest = newest
+        st.samples += new
+        if persist and new:
+            store.save(key, st)
+
+    if not st.complete:
+        for pos in range(st.next_pos, depth + 1):
+            payload, page, dt = _fetch(city, pos, ctx)
+            store.count("fetched")
+            if dt is None or dt.isoformat() == st.oldest:
+                # past the oldest sample (empty or repeated page), unless it was a bad answer
+                st.end_seen += 1
+                st.complete = st.end_seen >= END_CONFIRMATIONS
+                break
+            st.end_seen = 0
+            st.newest = st.newest or dt.isoformat()
+            if persist:
+                _store(page, payload, dt, store)
+            st.next_pos, st.oldest = pos + 1, dt.isoformat()
+            st.samples += 1
+            if persist:
+                store.save(key, st)
+        if persist:
+            store.save(key, st)
+
+    state = "complete" if st.complete else f"next posPLV {st.next_pos}"
+    if st.end_seen and not st.complete:
+        state += f" (end seen {st.end_seen}/{END_CONFIRMATIONS})"
+    return f"+{new} new, {st.samples} sample(s), {state}"
@@ -0,0 +1,180 @@
+# hydro/cache.py
+"""
+Content-addressed cache of raw OROBNAT responses.
+
+Layout under `root`:
+    objects/<aa>/<sha256>.html.gz   one gzip blob per distinct page body
+    index.sqlite                    (payload, fetch date) -> blob digest
+
+Identical pages fetched on different days share one blob. The cache is
+capped by total blob size and entry age; eviction drops old entries first,
+then least recently used ones, then unreferenced blobs.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import time
+from collections.abc import Iterator
+from datetime import date, timedelta
+from pathlib import Path
+
+log = logging.getLogger("hydromet")
+
+# Only these fields identify a search; anything else in the payload is noise
+PAYLOAD_KEYS = ("idRegion", "usd", "posPLV", "departement", "communeDepartement", "reseau")
+
+
+def payload_key(payload: dict) -> str:
+    """Canonical JSON of the identifying payload fields."""
+    return json.dumps({k: str(payload.get(k) or "") for k in PAYLOAD_KEYS}, sort_keys=True)
+
+
+class HtmlCache:
+    def __init__(self, root: str, max_mb: float = 2048, max_age_days: int = 365):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / "index.sqlite", check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    payload     TEXT NOT NULL,
+                    fetched_on  TEXT NOT NULL,
+                    digest      TEXT NOT NULL,
+                    size        INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (payload, fetched_on)
+                )
+                """
+            )
+
+    # ---- blobs ----
+    def _blob_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / f"{digest}.html.gz"
+
+    def _write_blob(self, body: bytes) -> tuple[str, int]:
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # unique temp name: workers caching the same page must not share it
+            with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            try:
+                Path(f.name).replace(path)
+            except OSError:
+                Path(f.name).unlink(missing_ok=True)
+                raise
+        return digest, path.stat().st_size
+
+    def _read_blob(self, digest: str) -> bytes | None:
+        path = self._blob_path(digest)
+        if not path.exists():
+            return None
+        return gzip.decompress(path.read_bytes())
+
+    # ---- public API ----
+    def put(self, payload: dict, html: str, fetched_on: date | None = None) -> str:
+        """Store one response; return the blob digest."""
+        day = (fetched_on or date.today()).isoformat()
+        digest, size = self._write_blob(html.encode("utf-8"))
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                (payload_key(payload), day, digest, size, time.time()),
+            )
+        return digest
+
+    def get(self, payload: dict, fetched_on: date | None = None) -> str | None:
+        """Cached body for (payload, day), or None."""
+        day = (fetched_on or date.today()).isoformat()
+        key = payload_key(payload)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT digest FROM entries WHERE payload = ? AND fetched_on = ?", (key, day)
+            ).fetchone()
+            if not row:
+                return None
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET last_access = ? WHERE payload = ? AND fetched_on = ?",
+                    (time.time(), key, day),
+                )
+        body = self._read_blob(row[0])
+        return body.decode("utf-8") if body is not None else None
+
+    def _range_sql(self, since: date | None, until: date | None) -> tuple[str, list]:
+        sql = " WHERE fetched_on >= ?"
+        params: list = [(since or date.min).isoformat()]
+        if until:
+            sql += " AND fetched_on <= ?"
+            params.append(until.isoformat())
+        return sql, params
+
+    def count(self, since: date | None = None, until: date | None = None) -> int:
+        where, params = self._range_sql(since, until)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries" + where, params).fetchone()[0]
+
+    def entries(
+        self, since: date | None = None, until: date | None = None
+    ) -> Iterator[tuple[dict, str, str]]:
+        """Yield (payload, fetched_on, html) ordered by fetch date; blobs are read lazily."""
+        where, params = self._range_sql(since, until)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload, fetched_on, digest FROM entries" + where
+                + " ORDER BY fetched_on, payload",
+                params,
+            ).fetchall()
+        for key, day, digest in rows:
+            body = self._read_blob(digest)
+            if body is None:
+                log.warning(f"Cache blob missing for {key} @ {day}")
+                continue
+            yield json.loads(key), day, body.decode("utf-8")
+
+    def evict(self) -> int:
+        """Apply age and size caps; return the number of entries removed."""
+        cutoff = (date.today() - timedelta(days=self.max_age_days)).isoformat()
+        with self._lock, self._db:
+            removed = self._db.execute(
+                "DELETE FROM entries WHERE fetched_on < ?", (cutoff,)
+            ).rowcount
+            # Blob sizes counted once per distinct digest
+            sizes = dict(self._db.execute("SELECT digest, MAX(size) FROM entries GROUP BY digest"))
+            total = sum(sizes.values())
+            if total > self.max_bytes:
+                lru = self._db.execute(
+                    "SELECT payload, fetched_on, digest FROM entries ORDER BY last_access"
+                ).fetchall()
+                for key, day, digest in lru:
+                    if total <= self.max_bytes:
+                        break
+                    self._db.execute(
+                        "DELETE FROM entries WHERE payload = ? AND fetched_on = ?", (key, day)
+                    )
+                    removed += 1
+                    still_used = self._db.execute(
+                        "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+                    ).fetchone()
+                    if not still_used:
+                        total -= sizes.get(digest, 0)
+            live = {d for (d,) in self._db.execute("SELECT DISTINCT digest FROM entries")}
+        for path in self.objects.glob("*/*.html.gz"):
+            if path.name.split(".")[0] not in live:
+                path.unlink(missing_ok=True)
+        return removed
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,111 @@
+# hydro/city_cache.py
+"""
+Local cache of the active cities (JSON file), shared by the water and weather jobs.
+
+- Younger than `ttl` seconds: used as is, no request at all.
+- Older: one cheap query (db.cities_version: active row count + newest
+  inserted_at / updated_at). Unchanged -> the cache is kept and its TTL
+  restarted; changed -> the cities are re-read page by page.
+- Loaded more than `max_age` seconds ago: re-read whatever the marker says,
+  since in-place edits (coordinates, region, ...) do not move it.
+
+A cache only serves requests for columns it holds; asking for more
+columns reloads it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any
+
+from db.supabase_utils import cities_version, iter_cities
+
+log = logging.getLogger("hydromet")
+
+DEFAULT_TTL = 6 * 3600
+DEFAULT_MAX_AGE = 24 * 3600
+
+
+def _read(path: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        log.warning(f"Ignoring unreadable city cache {path}: {e}")
+        return None
+
+
+def _write(path: Path, data: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def load_cities(
+    columns: tuple[str, ...] | None = None,
+    cache_path: str = "",
+    ttl: float = DEFAULT_TTL,
+    refresh: bool = False,
+    max_age: float = DEFAULT_MAX_AGE,
+) -> list[dict[str, Any]]:
+    """Active cities with `columns` (None = all), through the cache when `cache_path` is set."""
+    if not cache_path:
+        return list(iter_cities(columns))
+
+    path = Path(cache_path)
+    wanted = sorted(columns) if columns else ["*"]
+    cached = None if refresh else _read(path)
+    if cached and not ("*" in cached["columns"] or set(wanted) <= set(cached["columns"])):
+        cached = None
+    if cached and time.time() - cached.get("loaded_at", 0) >= max_age:
+        cached = None
+
+    if cached:
+        age = time.time() - cached["saved_at"]
+        if age < ttl:
+            log.info(f"Cities: {len(cached['rows'])} from cache ({age / 60:.0f} min old)")
+            return cached["rows"]
+        version = cities_version()
+        if version and version == cached["version"]:
+            cached["saved_at"] = time.time()
+            _write(path, cached)
+            log.info(f"Cities: unchanged since last load, {len(cached['rows'])} from cache")
+            return cached["rows"]
+    else:
+        version = cities_version()
+
+    rows = list(iter_cities(columns))
+    now = time.time()
+    _write(
+        path,
+        {"saved_at": now, "loaded_at": now, "version": version, "columns": wanted, "rows": rows},
+    )
+    log.info(f"Cities: {len(rows)} loaded from the database")
+    return rows
+
+
+def add_city_cache_args(parser: argparse.ArgumentParser) -> None:
+    """--city-cache / --city-cache-ttl / --city-cache-max-age / --refresh-cities."""
+    parser.add_argument(
+        "--city-cache", type=str, default="", help="JSON cache of the active cities (optional)"
+    )
+    parser.add_argument(
+        "--city-cache-ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help="Seconds the city cache is trusted without checking the DB for changes",
+    )
+    parser.add_argument(
+        "--city-cache-max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE,
+        help="Seconds after which the city cache is reloaded even if the DB looks unchanged",
+    )
+    parser.add_argument(
+        "--refresh-cities", action="store_true", help="Ignore the city cache and reload it"
+    )
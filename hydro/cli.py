@@ -2,22 +2,145 @@
 # Command Line Interface for HydroMet ETL (English version)
 
 import argparse
+import json
 import logging
 import sys
+import threading
 import time
+from collections.abc import Callable
+from dataclasses import replace
+from datetime import date
+from pathlib import Path
 
-from db.supabase_utils import fetch_cities
+from db.supabase_utils import BulkWriter, is_missing_column, set_query_observer
 
-from .etl_runner import process_city, process_html_debug
+from .backfill import DEFAULT_DEPTH, BackfillStore, backfill_city
+from .cache import HtmlCache
+from .city_cache import add_city_cache_args, load_cities
+from .etl_runner import EtlContext, ingest_html, parse_rows, process_city, process_html_debug
+from .executor import BatchResult, run_batch
+from .fingerprints import FingerprintStore
+from .http_client import SessionPool
+from .journal import FAILED, PENDING, RunJournal
+from .metrics import METRICS
+from .offline import HTML_SUFFIXES, iter_sources, load_manifest
+from .offline import run_bulk_offline as run_saved_pages
+from .parsing.encoding import decode_html
+from .payloads import city_key, city_region
+from .pipeline import run_pipeline
+from .regions import RegionRun, group_by_region, parse_region_map, run_regions
+from .retry import CircuitBreaker, RequestStats, RetryPolicy
+from .settings import DEFAULT_SEARCH
+from .sharding import filter_shard, parse_shard, shard_label
+from .throttle import AdaptiveLimit, TokenBucket
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
 log = logging.getLogger("hydromet")
 
 
-def main():
+class Tally:
+    """
+    OK/FAIL accounting and the end-of-run summary shared by every batch mode.
+    With a journal, every outcome is also persisted as soon as it is recorded.
+    Thread-safe: bulk flushes record their cities from the flushing thread.
+    """
+
+    def __init__(self, total: int, journal: RunJournal | None = None, run_id: int | None = None):
+        self.total = total
+        self.done = 0
+        self.ok = 0
+        self.fail = 0
+        self.failed: list[tuple[str, str]] = []
+        self.journal = journal
+        self.run_id = run_id
+        self._lock = threading.RLock()
+
+    def record_city(
+        self, idx: int, city: dict, pid, err: Exception | None, note: str | None = None
+    ) -> None:
+        with self._lock:
+            if self.journal and self.run_id is not None:
+                error = str(err) if err else None
+                self.journal.record(self.run_id, city_key(city), pid, error, note)
+            self.record(city_name(city, idx), pid, err, note)
+
+    def settle(self, idx: int, city: dict) -> Callable[[str, str | None], None]:
+        """
+        on_done for ingest_fetched: the city is recorded once its rows were
+        written or rejected (with --bulk-pages, at the flush), not when buffered.
+        """
+
+        def done(pid: str, error: str | None) -> None:
+            self.record_city(idx, city, pid, RuntimeError(error) if error else None)
+
+        return done
+
+    def record_failure(self, result: BatchResult) -> None:
+        """on_result of cities recorded through settle(): only earlier failures are left."""
+        if result[3] is not None:
+            self.record_city(*result)
+
+    def record(self, name: str, pid, err: Exception | None, note: str | None = None) -> None:
+        with self._lock:
+            self._record(name, pid, err, note)
+
+    def _record(self, name: str, pid, err: Exception | None, note: str | None = None) -> None:
+        self.done += 1
+        if err is None:
+            log.info(f"[{self.done}/{self.total}] OK {name} -> {note or f'id={pid}'}")
+            self.ok += 1
+        else:
+            log.error(f"[{self.done}/{self.total}] FAIL {name}: {err}")
+            self.fail += 1
+            self.failed.append((name, str(err)))
+
+    def to_dict(self, **extra) -> dict:
+        """Machine-readable summary; per-shard files merge by summing counts."""
+        return {
+            "total": self.total,
+            "ok": self.ok,
+            "fail": self.fail,
+            "failed": [{"name": n, "error": e} for n, e in self.failed],
+            "run_id": self.run_id,
+            **extra,
+        }
+
+    def print_summary(self, *extra: str) -> None:
+        print("\n===== Summary =====")
+        print(f"Total: {self.total} | OK: {self.ok} | FAIL: {self.fail}")
+        for line in extra:
+            print(line)
+        if self.failed:
+            print("Failures:")
+            for name, err in self.failed[:10]:
+                print(f" - {name}: {err}")
+            if len(self.failed) > 10:
+                print(f" ... and {len(self.failed)-10} more")
+                if self.journal:
+                    print(f" (full list in the run journal, run_id={self.run_id})")
+
+
+def city_name(city: dict, idx: int) -> str:
+    return city.get("city_name") or city.get("commune_code") or f"idx-{idx}"
+
+
+def _parse_date(s: str) -> date | None:
+    return date.fromisoformat(s) if s else None
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="HydroMet ETL runner")
     parser.add_argument(
-        "--html", type=str, default="", help="Path to a local HTML file (offline mode)"
+        "--html",
+        nargs="+",
+        default=[],
+        help="Local HTML file(s) (offline mode); also directories, globs and tar/zip archives",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default="",
+        help="Offline: CSV/JSONL mapping each file to reseau/departement/communeDepartement",
     )
     parser.add_argument("--reseau", type=str, default="", help="Reseau code (optional)")
     parser.add_argument("--departement", type=str, default="", help="Departement code (optional)")
@@ -33,69 +156,601 @@ def main():
     parser.add_argument(
         "--sleep", type=float, default=0.8, help="Seconds to sleep between cities (anti rate-limit)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Cities processed concurrently, per region (1 = sequential)",
+    )
+    parser.add_argument(
+        "--rps",
+        type=float,
+        default=0.0,
+        help="Max OROBNAT requests/second shared by the workers of a region; replaces --sleep "
+        "(0 = off, defaults to 1.0 when --workers > 1 without --adaptive)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the requests in flight per region (AIMD, 1..--workers) to OROBNAT's "
+        "latency and 429/5xx/timeouts; replaces --sleep",
+    )
+    parser.add_argument(
+        "--regions",
+        type=str,
+        default="",
+        help="Only process cities of these OROBNAT regions (comma separated idRegion)",
+    )
+    parser.add_argument(
+        "--region-workers",
+        type=str,
+        default="",
+        help="Per-region workers, e.g. 11=4,24=2 (other regions: --workers)",
+    )
+    parser.add_argument(
+        "--region-rps",
+        type=str,
+        default="",
+        help="Per-region requests/second, e.g. 11=2,24=0.5 (other regions: --rps)",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Run the batch on an asyncio event loop (--workers = searches in flight)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Staged fetch -> parse -> write pipeline (--workers = fetch threads)",
+    )
+    parser.add_argument(
+        "--parse-procs", type=int, default=2, help="Pipeline / bulk offline: parser processes"
+    )
+    parser.add_argument(
+        "--queue-size", type=int, default=32, help="Pipeline: max pages waiting per stage"
+    )
+    parser.add_argument(
+        "--retries", type=int, default=3, help="Retries per OROBNAT request on timeout/429/5xx"
+    )
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--read-timeout", type=float, default=40.0, help="Seconds")
+    parser.add_argument(
+        "--breaker-cooldown",
+        type=float,
+        default=30.0,
+        help="Seconds all workers pause when the recent error rate spikes (0 = no breaker)",
+    )
+    parser.add_argument(
+        "--cookie-jar",
+        type=str,
+        default="",
+        help="JSON file to persist OROBNAT session cookies between runs (optional)",
+    )
 
-    args = parser.parse_args()
+    # Raw HTML cache / replay
+    parser.add_argument(
+        "--cache-dir", type=str, default="", help="Store every fetched page in this cache"
+    )
+    parser.add_argument("--cache-max-mb", type=float, default=2048, help="Cache size cap (MB)")
+    parser.add_argument("--cache-max-age-days", type=int, default=365, help="Cache age cap")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Re-parse and upsert pages from --cache-dir instead of fetching OROBNAT "
+        "(HTML_PARSER=stream is the fastest parser for large replays)",
+    )
+    parser.add_argument("--since", type=str, default="", help="Replay: first fetch date (ISO)")
+    parser.add_argument("--until", type=str, default="", help="Replay: last fetch date (ISO)")
+    parser.add_argument(
+        "--fingerprints",
+        type=str,
+        default="",
+        help="SQLite file of page fingerprints; unchanged pages skip parsing and upserts",
+    )
+    parser.add_argument(
+        "--journal", type=str, default="", help="SQLite run journal (per-city status, errors)"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the latest journaled run: only cities not yet OK",
+    )
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Reprocess only the cities that failed in the latest journaled run",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default="",
+        help="Process only shard i of N (e.g. 0/4), by stable hash of commune_code|water_code",
+    )
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Walk past samples (posPLV 0..--backfill-depth) of every city; resumable",
+    )
+    parser.add_argument(
+        "--backfill-depth",
+        type=int,
+        default=DEFAULT_DEPTH,
+        help="Backfill: highest posPLV fetched per city",
+    )
+    parser.add_argument(
+        "--backfill-state",
+        type=str,
+        default=".hydro/backfill.sqlite",
+        help="Backfill: SQLite file with each city's walk position",
+    )
+    parser.add_argument(
+        "--summary-json", type=str, default="", help="Also write the run summary to this JSON file"
+    )
+    add_city_cache_args(parser)
+    parser.add_argument(
+        "--metrics-json", type=str, default="", help="Write per-stage timings (p50/p95/p99) here"
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        type=str,
+        default="",
+        help="Write per-stage timings in Prometheus textfile-collector format",
+    )
+    parser.add_argument(
+        "--no-write",
+        action="store_true",
+        help="Fetch and parse only: skip every DB upsert (to measure fetch + parse)",
+    )
+    parser.add_argument(
+        "--bulk-pages",
+        type=int,
+        default=0,
+        help="Buffer N pages and write each table in one upsert (0 = 4 upserts per city)",
+    )
+    parser.add_argument(
+        "--bulk-seconds", type=float, default=15.0, help="Max age of buffered rows (seconds)"
+    )
+    return parser
 
-    try:
-        # ---------- Offline mode (local HTML) ----------
-        if args.html:
-            with open(args.html, encoding="utf-8") as f:
-                html = f.read()
-            page_id = process_html_debug(
-                html,
-                city_stub={
-                    "reseau": args.reseau,
-                    "departement": args.departement,
-                    "communeDepartement": args.commune,
-                },
+
+# Columns of `cities` the water ETL reads (payload, journal/shard key, log names, region pool)
+CITY_COLUMNS = ("commune_code", "water_code", "city_name", "region")
+
+
+def write_summary_json(path: str, tally: Tally, **extra) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tally.to_dict(**extra), f, ensure_ascii=False, indent=2)
+
+
+def _writer_lines(ctx: EtlContext) -> list[str]:
+    """Flush the bulk writer (if any) and return its summary line."""
+    if not ctx.writer:
+        return [] if ctx.write else ["Writes: skipped (--no-write)"]
+    ctx.writer.close()
+    return [ctx.writer.summary()]
+
+
+def _metrics_lines() -> list[str]:
+    lines = METRICS.summary_lines()
+    return ["Stage timings:", *lines] if lines else []
+
+
+def write_metrics(args) -> None:
+    if args.metrics_json:
+        METRICS.write_json(args.metrics_json)
+    if args.metrics_prom:
+        METRICS.write_prometheus(args.metrics_prom)
+
+
+def is_single_html(args) -> bool:
+    """--html with one plain file and no manifest keeps the original one-page mode."""
+    if len(args.html) != 1 or args.manifest:
+        return False
+    path = Path(args.html[0])
+    return path.is_file() and path.name.lower().endswith(HTML_SUFFIXES)
+
+
+def run_offline(args) -> None:
+    html = decode_html(Path(args.html[0]).read_bytes())
+    page_id = process_html_debug(
+        html,
+        city_stub={
+            "reseau": args.reseau,
+            "departement": args.departement,
+            "communeDepartement": args.commune,
+        },
+    )
+    print(f"[OK] Insert/Update from local HTML. id={page_id}")
+
+
+def run_bulk_offline(args, ctx: EtlContext) -> None:
+    manifest = load_manifest(args.manifest) if args.manifest else {}
+    tally = Tally(0)
+
+    def counted(pages):
+        # archives are read once: the total grows as pages are found
+        for page in pages:
+            tally.total += 1
+            yield page
+
+    writer = None
+    if ctx.write:
+        writer = ctx.writer or BulkWriter(
+            max_pages=50, max_seconds=args.bulk_seconds, observe=METRICS.query
+        )
+        ctx.writer = writer
+    procs = max(1, args.parse_procs)
+    log.info(f"Loading saved pages on {procs} process(es)...")
+    t0 = time.perf_counter()
+    run_saved_pages(
+        counted(iter_sources(args.html)),
+        manifest=manifest,
+        defaults={
+            "reseau": args.reseau,
+            "departement": args.departement,
+            "communeDepartement": args.commune,
+        },
+        procs=procs,
+        writer=writer,
+        on_result=lambda r: tally.record(r[1], r[2], r[3]),
+    )
+    writer_lines = _writer_lines(ctx)
+    elapsed = time.perf_counter() - t0
+    if args.summary_json:
+        write_summary_json(args.summary_json, tally, elapsed=elapsed)
+    tally.print_summary(
+        f"Elapsed: {elapsed:.1f}s ({tally.done / max(elapsed, 1e-9):.1f} pages/s)",
+        *writer_lines,
+        *_metrics_lines(),
+    )
+
+
+def run_replay(args, ctx: EtlContext) -> None:
+    cache = ctx.cache
+    since, until = _parse_date(args.since), _parse_date(args.until)
+    tally = Tally(cache.count(since, until))
+    entries = cache.entries(since, until)
+    log.info(f"Replaying {tally.total} cached page(s) with {max(1, args.workers)} worker(s)...")
+    t0 = time.perf_counter()
+
+    def name(payload: dict, day) -> str:
+        return f"{payload.get('communeDepartement')}@{day}"
+
+    def replay_one(entry: tuple) -> str:
+        payload, day, html = entry
+        if not ctx.write:
+            page_id = parse_rows(html, payload)[0]
+            tally.record(name(payload, day), page_id, None)
+            return page_id
+
+        def done(pid: str, error: str | None) -> None:
+            tally.record(name(payload, day), pid, RuntimeError(error) if error else None)
+
+        return ingest_html(html, payload, ctx.writer, on_done=done)
+
+    # successes are recorded by done() once written (bulk flush), failures here
+    for _, (payload, day, _), _, err in run_batch(entries, replay_one, workers=args.workers):
+        if err is not None:
+            tally.record(name(payload, day), None, err)
+    writer_lines = _writer_lines(ctx)
+    tally.print_summary(
+        f"Elapsed: {time.perf_counter() - t0:.1f}s", *writer_lines, *_metrics_lines()
+    )
+
+
+def select_batch(args, cities: list[dict]) -> tuple[list[dict], RunJournal | None, int | None]:
+    """
+    Cities for this batch run, plus the journal and run_id recording it.
+    --resume / --retry-failed pick cities from the latest journaled run.
+    """
+    if (args.resume or args.retry_failed) and not args.journal:
+        raise ValueError("--resume/--retry-failed need --journal")
+    journal = RunJournal(args.journal) if args.journal else None
+    shard = parse_shard(args.shard)
+    if shard:
+        cities = filter_shard(cities, shard)
+        log.info(f"Shard {shard_label(shard)}: {len(cities)} city(ies)")
+
+    if journal and (args.resume or args.retry_failed):
+        run_id = journal.latest_run()
+        if run_id is None:
+            raise ValueError(f"No run found in journal {args.journal}")
+        statuses = (FAILED,) if args.retry_failed else (PENDING, FAILED)
+        keys = journal.keys(run_id, statuses)
+        journal.reopen(run_id)
+        selected = [c for c in cities if city_key(c) in keys]
+        log.info(f"Journal run {run_id}: {len(selected)} city(ies) left to process")
+        return selected, journal, run_id
+
+    total = len(cities) if args.limit in (None, 0) else min(args.limit, len(cities))
+    selected = cities[:total]
+    run_id = None
+    if journal:
+        run_id = journal.start([(city_key(c), city_name(c, i)) for i, c in enumerate(selected)])
+        log.info(f"Journal run {run_id} started")
+    return selected, journal, run_id
+
+
+def region_budget(args, region: str | None = None) -> tuple[int, float]:
+    """(workers, rps) of `region`: --region-workers/--region-rps, else --workers/--rps."""
+    if region is None:
+        return args.workers, args.rps
+    workers = parse_region_map(args.region_workers).get(region, args.workers)
+    return int(workers), parse_region_map(args.region_rps).get(region, args.rps)
+
+
+def _cookie_path(args, region: str | None) -> str | None:
+    """--cookie-jar, suffixed with the region for pools of non-default regions."""
+    if not args.cookie_jar or region in (None, DEFAULT_SEARCH["idRegion"]):
+        return args.cookie_jar or None
+    path = Path(args.cookie_jar)
+    return str(path.with_name(f"{path.stem}.{region}{path.suffix}"))
+
+
+def make_pool(args, region: str | None = None) -> SessionPool:
+    """
+    SessionPool with the run's rate limit, retry policy, breaker and request
+    stats; with `region`, that region's own budget, breaker and sessions.
+    """
+    workers, rps = region_budget(args, region)
+    rps = rps or (1.0 if workers > 1 and not args.adaptive else 0.0)
+    limiter = TokenBucket(rps, burst=max(1, workers)) if rps > 0 else None
+    limit = (
+        AdaptiveLimit(f"orobnat.{region or 'all'}", max_limit=max(1, workers))
+        if args.adaptive
+        else None
+    )
+    policy = RetryPolicy(
+        attempts=max(1, args.retries + 1),
+        connect_timeout=args.connect_timeout,
+        read_timeout=args.read_timeout,
+    )
+    breaker = CircuitBreaker(cooldown=args.breaker_cooldown) if args.breaker_cooldown else None
+    return SessionPool(
+        limiter=limiter,
+        cookie_path=_cookie_path(args, region),
+        policy=policy,
+        breaker=breaker,
+        stats=RequestStats(),
+        region=region,
+        limit=limit,
+    )
+
+
+def region_runs(args, base: EtlContext, cities: list[dict]) -> list[RegionRun]:
+    """One RegionRun (own pool, limiter, breaker, workers) per region of `cities`."""
+    runs = []
+    for region, group in group_by_region(cities).items():
+        pool = make_pool(args, region)
+        workers, _ = region_budget(args, region)
+        runs.append(
+            RegionRun(
+                region=region,
+                cities=group,
+                ctx=replace(base, limiter=pool.limiter, pool=pool),
+                workers=max(1, workers),
+                # The blind sleep only applies to the plain sequential loop
+                pause=args.sleep if (workers <= 1 and not (pool.limiter or pool.limit)) else 0.0,
             )
-            print(f"[OK] Insert/Update from local HTML. id={page_id}")
-            return
+        )
+    return runs
 
-        # ---------- Online mode ----------
-        cities = fetch_cities()
-        if not cities:
-            log.error("No active cities found in DB.")
-            sys.exit(2)
 
-        # Single-city mode when index is provided
-        if args.city_index is not None:
-            idx = max(0, min(args.city_index, len(cities) - 1))
-            city = cities[idx]
-            name = city.get("city_name") or city.get("commune_code") or f"idx-{idx}"
-            log.info(f"Processing 1 city: {name}")
-            page_id = process_city(city)
-            print(f"[OK] Insert/Update from OROBNAT. id={page_id} (city_index={idx})")
+def open_backfill(args, ctx: EtlContext) -> BackfillStore | None:
+    if not args.backfill:
+        return None
+    if ctx.writer:
+        log.info("Backfill upserts each page directly (--bulk-pages ignored)")
+    log.info(f"Backfill: posPLV 0..{args.backfill_depth}, state in {args.backfill_state}")
+    return BackfillStore(args.backfill_state)
+
+
+def _city_fn(
+    args, tally: Tally, selected: list[dict], backfill: BackfillStore | None
+) -> tuple[Callable[[dict, EtlContext], object], Callable[[BatchResult], None]]:
+    """(fn, on_result) for run_regions."""
+    if backfill:
+        # a backfill walks each city sequentially; region workers walk cities at once
+        return (
+            lambda c, rctx: backfill_city(c, rctx, backfill, args.backfill_depth),
+            lambda r: tally.record_city(r[0], r[1], None, r[3], note=r[2]),
+        )
+    # cities are recorded once their rows were written (bulk flush), failures on return
+    positions = {id(c): i for i, c in enumerate(selected)}
+    return (
+        lambda c, rctx: process_city(c, rctx, tally.settle(positions[id(c)], c)),
+        tally.record_failure,
+    )
+
+
+def select_cities(args) -> list[dict]:
+    """Active cities the water ETL can fetch (both codes set), restricted to --regions."""
+    cache = (args.city_cache, args.city_cache_ttl, args.refresh_cities, args.city_cache_max_age)
+    try:
+        cities = load_cities(CITY_COLUMNS, *cache)
+    except Exception as e:
+        if not is_missing_column(e):
+            raise
+        # cities.region comes with db/regions.sql; without it every city is in the default region
+        log.warning(f"No cities.region column, selecting every column (apply db/regions.sql): {e}")
+        cities = load_cities(None, *cache)
+    coded = [c for c in cities if c.get("commune_code") and c.get("water_code")]
+    if len(coded) < len(cities):
+        log.warning(f"Skipping {len(cities) - len(coded)} active city(ies) without codes")
+    cities = coded
+    if args.regions:
+        wanted = {r.strip() for r in args.regions.split(",") if r.strip()}
+        cities = [c for c in cities if city_region(c) in wanted]
+    return cities
+
+
+def run_online(args, base: EtlContext) -> None:
+    cities = select_cities(args)
+    if not cities:
+        log.error("No active cities found in DB.")
+        sys.exit(2)
+
+    # Single-city mode when index is provided
+    if args.city_index is not None:
+        idx = max(0, min(args.city_index, len(cities) - 1))
+        city = cities[idx]
+        log.info(f"Processing 1 city: {city_name(city, idx)}")
+        page_id = process_city(city, base)
+        print(f"[OK] Insert/Update from OROBNAT. id={page_id} (city_index={idx})")
+        return
+
+    if (args.pipeline or args.use_async) and len(group_by_region(cities)) > 1:
+        # their single pool cannot keep each region's sessions, budget and breaker apart
+        log.error(
+            "--pipeline/--async run one region at a time: add --regions, or drop them "
+            "for the per-region threaded mode"
+        )
+        sys.exit(2)
+
+    # Batch mode: process ALL active cities (with optional limit)
+    selected, journal, run_id = select_batch(args, cities)
+    total = len(selected)
+    tally = Tally(total, journal, run_id)
+    backfill = open_backfill(args, base)
+
+    if args.pipeline or args.use_async:
+        ctx, pool = run_shared_pool(args, base, selected, tally)
+        pools, runs = [pool], []
+        trips = f" | breaker trips: {pool.breaker.trips}" if pool.breaker else ""
+        request_lines = [pool.stats.summary() + trips]
+        request_lines += [pool.limit.summary()] if pool.limit else []
+    else:
+        ctx, runs = base, region_runs(args, base, selected)
+        pools = [r.ctx.pool for r in runs]
+        for r in runs:
+            log.info(f"Region {r.region}: {len(r.cities)} city(ies), {r.workers} worker(s)")
+        run_regions(runs, *_city_fn(args, tally, selected, backfill))
+        request_lines = [r.summary() for r in runs]
+    for p in pools:
+        p.close()
+    backfill_lines = []
+    if backfill:
+        backfill_lines.append(backfill.summary())
+        backfill.close()
+    writer_lines = _writer_lines(ctx)
+    if journal and run_id is not None:
+        journal.finish(run_id)
+        journal.close()
+
+    shard = shard_label(parse_shard(args.shard))
+    if args.summary_json:
+        regions = {r.region: r.to_dict() for r in runs}
+        write_summary_json(args.summary_json, tally, shard=shard, regions=regions)
+    tally.print_summary(
+        f"Shard: {shard}",
+        f"Warm-ups: {sum(p.warmups for p in pools)}",
+        *request_lines,
+        *([ctx.fingerprints.summary()] if ctx.fingerprints else []),
+        *backfill_lines,
+        *writer_lines,
+        *_metrics_lines(),
+    )
+
+
+def run_shared_pool(
+    args, base: EtlContext, selected: list[dict], tally: Tally
+) -> tuple[EtlContext, SessionPool]:
+    """
+    --pipeline / --async: every city goes through one pool, warmed on the
+    region of the cities (run_online keeps these modes to a single region).
+    """
+    pool = make_pool(args, city_region(selected[0]) if selected else None)
+    ctx = replace(base, limiter=pool.limiter, pool=pool)
+    workers = max(1, args.workers)
+    log.info(f"Processing {len(selected)} active city(ies) with {workers} worker(s)...")
+    if args.pipeline:
+        if not ctx.writer and ctx.write:
+            writer = BulkWriter(max_seconds=args.bulk_seconds, observe=METRICS.query)
+            ctx = replace(ctx, writer=writer)
+        run_pipeline(
+            selected,
+            ctx,
+            fetchers=args.workers,
+            parsers=args.parse_procs,
+            queue_size=args.queue_size,
+            on_result=lambda r: tally.record_city(*r),
+        )
+    else:
+        # aiohttp is optional: only --async needs it
+        from .async_runner import run_batch_async_sync  # noqa: PLC0415
+
+        run_batch_async_sync(
+            selected,
+            concurrency=max(1, args.workers),
+            limiter=pool.limiter,
+            on_result=tally.record_failure,
+            on_done=tally.settle,
+            policy=pool.policy,
+            breaker=pool.breaker,
+            stats=pool.stats,
+            ctx=ctx,
+        )
+    return ctx, pool
+
+
+def main():
+    args = build_parser().parse_args()
+    set_query_observer(METRICS.query)  # db.* stage timings in the run report
+
+    try:
+        # ---------- Offline mode (one local HTML file) ----------
+        if args.html and is_single_html(args):
+            run_offline(args)
             return
 
-        # Batch mode: process ALL active cities (with optional limit)
-        total = len(cities) if args.limit in (None, 0) else min(args.limit, len(cities))
-        ok, fail = 0, 0
-        failed = []
-
-        log.info(f"Processing {total} active city(ies)...")
-        for i, city in enumerate(cities[:total], start=1):
-            name = city.get("city_name") or city.get("commune_code") or f"idx-{i-1}"
-            try:
-                pid = process_city(city)
-                log.info(f"[{i}/{total}] OK {name} -> id={pid}")
-                ok += 1
-            except Exception as e:
-                log.error(f"[{i}/{total}] FAIL {name}: {e}")
-                fail += 1
-                failed.append((name, str(e)))
-            # Anti rate-limit pause
-            if args.sleep > 0 and i < total:
-                time.sleep(args.sleep)
+        if args.replay and not args.cache_dir:
+            log.error("--replay needs --cache-dir")
+            sys.exit(2)
+        if args.backfill and (args.pipeline or args.use_async or args.city_index is not None):
+            log.error("--backfill is a threaded batch mode (no --pipeline/--async/--city-index)")
+            sys.exit(2)
+        if args.adaptive and args.use_async:
+            log.error("--adaptive applies to the threaded modes (not --async)")
+            sys.exit(2)
+        ctx = EtlContext(
+            cache=(
+                HtmlCache(args.cache_dir, args.cache_max_mb, args.cache_max_age_days)
+                if args.cache_dir
+                else None
+            ),
+            fingerprints=FingerprintStore(args.fingerprints) if args.fingerprints else None,
+            writer=(
+                BulkWriter(
+                    max_pages=args.bulk_pages,
+                    max_seconds=args.bulk_seconds,
+                    observe=METRICS.query,
+                )
+                if args.bulk_pages > 0 and not args.no_write
+                else None
+            ),
+            write=not args.no_write,
+        )
 
-        print("\n===== Summary =====")
-        print(f"Total: {total} | OK: {ok} | FAIL: {fail}")
-        if failed:
-            print("Failures:")
-            for name, err in failed[:10]:
-                print(f" - {name}: {err}")
-            if len(failed) > 10:
-                print(f" ... and {len(failed)-10} more")
+        try:
+            # ---------- Bulk offline mode (dirs, globs, archives) ----------
+            if args.html:
+                run_bulk_offline(args, ctx)
+            # ---------- Replay mode (cached HTML) ----------
+            elif args.replay:
+                run_replay(args, ctx)
+            # ---------- Online mode ----------
+            else:
+                run_online(args, ctx)
+        finally:
+            if ctx.writer:
+                ctx.writer.close()  # never lose buffered rows, even on a crash
+            if ctx.cache:
+                ctx.cache.evict()
+                ctx.cache.close()
+            if ctx.fingerprints:
+                ctx.fingerprints.close()
+            write_metrics(args)
 
     except Exception as e:
         print(f"[FATAL] ETL runtime error: {e}", file=sys.stderr)
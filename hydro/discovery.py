@@ -0,0 +1,298 @@
+# hydro/discovery.py
+"""
+Network catalogue discovery: crawl the OROBNAT search form of a region.
+
+The form chains three selects: departement -> communeDepartement -> reseau.
+The region menu lists its departements, posting a departement returns the
+form with its communes, and posting a commune returns its networks.
+crawl_region() walks that tree (--workers requests in flight under the
+shared --rps budget) and returns one CatalogueRow per (commune, network).
+
+A crawl is saved as a versioned JSON file under <dir>/region-<id>/ (UTC
+timestamp as name, content hash as version; an unchanged crawl writes
+nothing), diffed against the previous complete crawl and, with --upsert,
+written to the database:
+- water_network: one row per network (names and region refreshed; the region
+                 is dropped when db/regions.sql is not applied)
+- cities:        one row per (commune, network) pair not known yet; existing
+                 rows are never modified. New rows have no postal code or
+                 coordinates and stay inactive unless --activate
+                 (the weather job skips active cities until they are geocoded).
+
+Usage:
+    python -m hydro.discovery --region 11 --rps 2 --workers 4
+    python -m hydro.discovery --region 11 --upsert --diff-json diff.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from .executor import run_batch
+from .http_client import SessionPool
+from .parsing.page import ParsedPage, parse_page
+from .retry import CircuitBreaker, RequestStats, RetryPolicy, is_success
+from .settings import DEFAULT_SEARCH
+from .throttle import TokenBucket
+
+log = logging.getLogger("hydromet")
+
+DEFAULT_DIR = ".hydro/catalogue"
+CITY_DEFAULTS = {"country": "FR", "timezone": "Europe/Paris"}
+
+
+class CatalogueRow(NamedTuple):
+    departement: str
+    departement_name: str
+    commune_code: str
+    commune_name: str
+    water_code: str
+    network_name: str
+
+
+def _options(page: ParsedPage, name: str) -> list[tuple[str, str]]:
+    """(value, label) of a select, without the empty placeholder option."""
+    return [
+        (value.strip(), label.strip())
+        for value, label, _ in page.selects.get(name) or []
+        if value.strip()
+    ]
+
+
+def form_payload(region: str, departement: str, commune: str = "") -> dict[str, str]:
+    """Search form with only the upper selects filled (refreshes the lower ones)."""
+    return {
+        "methode": "rechercher",
+        "idRegion": region,
+        "usd": DEFAULT_SEARCH["usd"],
+        "posPLV": DEFAULT_SEARCH["posPLV"],
+        "departement": departement,
+        "communeDepartement": commune,
+        "reseau": "",
+    }
+
+
+def _form(pool: SessionPool, payload: dict) -> ParsedPage:
+    status, html = pool.post_search(payload)
+    if not is_success(status):
+        raise RuntimeError(f"POST failed: {status}")
+    return parse_page(html)
+
+
+def crawl_region(
+    pool: SessionPool, region: str, workers: int = 1
+) -> tuple[list[CatalogueRow], list[str]]:
+    """Every (commune, network) of `region`, plus one line per form that could not be read."""
+    failures: list[str] = []
+    deps = _options(parse_page(pool.get_menu(region)), "departement")
+    log.info(f"Region {region}: {len(deps)} departement(s)")
+
+    communes: list[dict[str, str]] = []
+    jobs = [{"departement": d, "departement_name": n} for d, n in deps]
+    for _, job, page, err in run_batch(
+        jobs, lambda j: _form(pool, form_payload(region, j["departement"])), workers
+    ):
+        if err:
+            failures.append(f"departement {job['departement']}: {err}")
+            continue
+        found = _options(page, "communeDepartement")
+        log.info(f"Departement {job['departement']}: {len(found)} commune(s)")
+        communes += [{**job, "commune_code": c, "commune_name": n} for c, n in found]
+
+    rows: list[CatalogueRow] = []
+    results = run_batch(
+        communes,
+        lambda j: _form(pool, form_payload(region, j["departement"], j["commune_code"])),
+        workers,
+    )
+    for done, (_, job, page, err) in enumerate(results, 1):
+        if err:
+            failures.append(f"commune {job['commune_code']}: {err}")
+        else:
+            nets = _options(page, "reseau")
+            rows += [CatalogueRow(**job, water_code=w, network_name=n) for w, n in nets]
+        if done % 100 == 0:
+            log.info(f"Communes: {done}/{len(communes)} crawled, {len(rows)} pair(s)")
+    return sorted(set(rows)), failures
+
+
+# ---------------------------------------------------------------------
+# Versioned local catalogue
+# ---------------------------------------------------------------------
+
+
+def catalogue_version(rows: list[CatalogueRow]) -> str:
+    body = json.dumps([list(r) for r in sorted(rows)], ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+def load_latest(directory: str, region: str) -> dict[str, Any] | None:
+    """The most recent complete crawl of `region`, or None."""
+    for path in sorted((Path(directory) / f"region-{region}").glob("*.json"), reverse=True):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if not data.get("partial"):
+            data["rows"] = [CatalogueRow(**r) for r in data["rows"]]
+            data["path"] = str(path)
+            return data
+    return None
+
+
+def save_catalogue(
+    directory: str, region: str, rows: list[CatalogueRow], failures: list[str]
+) -> Path:
+    now = datetime.now(timezone.utc)
+    path = Path(directory) / f"region-{region}" / f"{now:%Y%m%dT%H%M%SZ}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "region": region,
+        "crawled_at": now.isoformat(),
+        "version": catalogue_version(rows),
+        "partial": bool(failures),
+        "failures": failures,
+        "rows": [r._asdict() for r in rows],
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=1), encoding="utf-8")
+    return path
+
+
+def diff_catalogues(
+    old: list[CatalogueRow], new: list[CatalogueRow], removals: bool = True
+) -> dict[str, list]:
+    """
+    Networks and (commune|network) pairs added/removed, and renamed networks.
+    removals=False leaves the removed lists empty (the new crawl is partial).
+    """
+    old_nets = {r.water_code: r.network_name for r in old}
+    new_nets = {r.water_code: r.network_name for r in new}
+    old_pairs = {f"{r.commune_code}|{r.water_code}" for r in old}
+    new_pairs = {f"{r.commune_code}|{r.water_code}" for r in new}
+    return {
+        "networks_added": sorted(new_nets.keys() - old_nets.keys()),
+        "networks_removed": sorted(old_nets.keys() - new_nets.keys()) if removals else [],
+        "networks_renamed": [
+            {"water_code": c, "old": old_nets[c], "new": new_nets[c]}
+            for c in sorted(old_nets.keys() & new_nets.keys())
+            if old_nets[c] != new_nets[c]
+        ],
+        "pairs_added": sorted(new_pairs - old_pairs),
+        "pairs_removed": sorted(old_pairs - new_pairs) if removals else [],
+    }
+
+
+# ---------------------------------------------------------------------
+# Database rows
+# ---------------------------------------------------------------------
+
+
+def network_rows(rows: list[CatalogueRow], region: str) -> list[dict[str, Any]]:
+    nets = {r.water_code: r.network_name for r in rows}
+    return [
+        {"water_code": c, "water_network_name": n or None, "region": region}
+        for c, n in sorted(nets.items())
+    ]
+
+
+def city_rows(rows: list[CatalogueRow], region: str, active: bool = False) -> list[dict[str, Any]]:
+    pairs = {(r.commune_code, r.water_code): r.commune_name for r in rows}
+    return [
+        {
+            "commune_code": commune,
+            "water_code": water,
+            "city_name": name,
+            "region": region,
+            **CITY_DEFAULTS,
+            "active": active,
+        }
+        for (commune, water), name in sorted(pairs.items())
+    ]
+
+
+def upsert_catalogue(
+    rows: list[CatalogueRow], region: str, active: bool = False
+) -> tuple[int, int]:
+    """
+    Bulk-write networks then cities (FK order); return the row counts sent.
+    Without db/regions.sql the rows are written without their region.
+    """
+    # imported here so a crawl without --upsert needs no database credentials
+    from db.supabase_utils import (  # noqa: PLC0415
+        insert_missing_cities,
+        is_missing_column,
+        upsert_water_networks,
+    )
+
+    def write(send, table_rows: list[dict[str, Any]]) -> int:
+        try:
+            return send(table_rows)
+        except Exception as e:
+            if not is_missing_column(e):
+                raise
+            log.warning(f"No region column, writing rows without it (apply db/regions.sql): {e}")
+            return send([{k: v for k, v in r.items() if k != "region"} for r in table_rows])
+
+    networks = write(upsert_water_networks, network_rows(rows, region))
+    return networks, write(insert_missing_cities, city_rows(rows, region, active))
+
+
+def main(argv: list[str] | None = None) -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Crawl the OROBNAT network catalogue")
+    parser.add_argument("--region", type=str, default=DEFAULT_SEARCH["idRegion"])
+    parser.add_argument("--catalogue-dir", type=str, default=DEFAULT_DIR)
+    parser.add_argument("--workers", type=int, default=2, help="Form requests in flight")
+    parser.add_argument("--rps", type=float, default=1.0, help="Max OROBNAT requests/second")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per request")
+    parser.add_argument(
+        "--upsert", action="store_true", help="Write networks and new cities to the database"
+    )
+    parser.add_argument(
+        "--activate", action="store_true", help="--upsert: insert new cities as active"
+    )
+    parser.add_argument("--diff-json", type=str, default="", help="Also write the diff here")
+    args = parser.parse_args(argv)
+
+    pool = SessionPool(
+        limiter=TokenBucket(args.rps, burst=max(1, args.workers)) if args.rps > 0 else None,
+        policy=RetryPolicy(attempts=max(1, args.retries + 1)),
+        breaker=CircuitBreaker(),
+        stats=RequestStats(),
+    )
+    try:
+        rows, failures = crawl_region(pool, args.region, args.workers)
+    finally:
+        pool.close()
+    for line in failures:
+        log.error(f"Not crawled: {line}")
+
+    previous = load_latest(args.catalogue_dir, args.region)
+    if previous and previous["version"] == catalogue_version(rows) and not failures:
+        log.info(f"Catalogue unchanged since {previous['path']}")
+    else:
+        path = save_catalogue(args.catalogue_dir, args.region, rows, failures)
+        log.info(f"Catalogue saved to {path}")
+    diff = diff_catalogues(previous["rows"] if previous else [], rows, removals=not failures)
+    if args.diff_json:
+        Path(args.diff_json).write_text(json.dumps(diff, ensure_ascii=False, indent=2), "utf-8")
+
+    written = upsert_catalogue(rows, args.region, args.activate) if args.upsert else None
+
+    print("\n===== Catalogue =====")
+    print(
+        f"Region {args.region}: {len({r.commune_code for r in rows})} commune(s) | "
+        f"{len({r.water_code for r in rows})} network(s) | {len(rows)} pair(s)"
+        + (f" | PARTIAL ({len(failures)} form(s) failed)" if failures else "")
+    )
+    print(" | ".join(f"{k}: {len(v)}" for k, v in diff.items()))
+    if written:
+        print(f"Upserted: {written[0]} network(s) | {written[1]} city row(s) sent")
+    print(pool.stats.summary())
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
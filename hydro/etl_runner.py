@@ -1,70 +1,177 @@
 # hydro/etl_runner.py
 
-from bs4 import BeautifulSoup
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
 
-from .http_client import make_session, post_search, warmup_get
+from db.supabase_utils import BulkWriter
+
+from .cache import HtmlCache
+from .fingerprints import UNCHANGED, FingerprintStore
+from .http_client import SessionPool
+from .metrics import METRICS
 from .parsing.mappers import build_id_from_date_and_insee, parse_datetime_any
-from .parsing.sections import parse_section_kv
+from .parsing.page import ParsedPage, parse_page
+from .parsing.sections import INFO_TITLE
 from .payloads import build_search_payload
+from .retry import is_success
 from .tables.conformite import build_conformite, upsert_conformite
 from .tables.criteres import build_criteres, upsert_criteres
-from .tables.informations import build_informations, upsert_informations
+from .tables.informations import INFO_FIELDS, build_informations, upsert_informations
 from .tables.resultats import build_resultats, upsert_resultats
+from .throttle import TokenBucket
 
+log = logging.getLogger("hydromet")
 
-def _extract_prelevement_datetime(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-    info = parse_section_kv(soup, "Informations générales")
-    for k, v in info.items():
-        if "prélèvement" in k.lower():
-            return parse_datetime_any(v)
-    return None
 
+@dataclass
+class EtlContext:
+    """Collaborators shared by every city of a run (all optional).
 
-def _compute_page_id(html: str, payload: dict) -> str:
-    dt = _extract_prelevement_datetime(html)
-    code_insee = payload.get("communeDepartement")  # <- INSEE desde el payload
-    return build_id_from_date_and_insee(dt, code_insee)
+    write=False parses and builds the rows but never touches the database
+    (nor the fingerprint store), to measure fetch + parse on their own.
+    """
 
+    limiter: TokenBucket | None = None
+    pool: SessionPool | None = None
+    cache: HtmlCache | None = None
+    fingerprints: FingerprintStore | None = None
+    writer: BulkWriter | None = None
+    write: bool = True
 
-def process_city(city: dict) -> str:
-    session = make_session()
-    warmup_get(session)
-    payload = build_search_payload(city)
-    status, html = post_search(session, payload)
-    if not (200 <= status < 300):
-        raise RuntimeError(f"POST failed: {status}")
 
-    page_id = _compute_page_id(html, payload)
+def prelevement_datetime(page: ParsedPage):
+    """Sampling date of the page, or None when it shows no sample."""
+    return parse_datetime_any(INFO_FIELDS.extract(page.section(INFO_TITLE))["date_prelevement"])
+
+
+def _compute_page_id(page: ParsedPage, payload: dict) -> str:
+    dt = prelevement_datetime(page)
+    code_insee = payload.get("communeDepartement")  # <- INSEE desde el payload
+    return build_id_from_date_and_insee(dt, code_insee)
 
-    row_criteres = build_criteres(html, payload, page_id)
-    row_info = build_informations(html, page_id)
-    row_conf = build_conformite(html, page_id)
-    rows_res = build_resultats(html, page_id)
+
+def build_page_rows(page: ParsedPage, payload: dict) -> tuple[str, dict, dict, dict, list[dict]]:
+    """Build the 4 table rows of one parsed page: (page_id, criteres, info, conf, resultats)."""
+    page_id = _compute_page_id(page, payload)
+    with METRICS.timer("build.criteres"):
+        crit = build_criteres(page, payload, page_id)
+    with METRICS.timer("build.informations"):
+        info = build_informations(page, page_id)
+    with METRICS.timer("build.conformite"):
+        conf = build_conformite(page, page_id)
+    with METRICS.timer("build.resultats"):
+        res = build_resultats(page, page_id)
+    METRICS.add("rows.resultats", len(res))
+    METRICS.add("pages.built")
+    return page_id, crit, info, conf, res
+
+
+def parse_rows(html: str, payload: dict) -> tuple[str, dict, dict, dict, list[dict]]:
+    """parse_page + build_page_rows; top-level so a process pool can pickle it."""
+    return build_page_rows(_timed_parse(html), payload)
+
+
+def _timed_parse(html: str) -> ParsedPage:
+    with METRICS.timer("parse.page"):
+        return parse_page(html)
+
+
+def upsert_page(
+    page: ParsedPage,
+    payload: dict,
+    writer: BulkWriter | None = None,
+    on_done: Callable[[str, str | None], None] | None = None,
+) -> str:
+    """
+    Upsert the 4 tables in FK-safe order, or hand them to `writer` for a later
+    bulk flush. `on_done(page_id, error)` runs once the rows were written.
+    """
+    page_id, row_criteres, row_info, row_conf, rows_res = build_page_rows(page, payload)
+    if writer:
+        writer.add_page(row_criteres, row_info, row_conf, rows_res, on_done=on_done)
+        return page_id
 
     upsert_criteres(row_criteres)
     upsert_informations(row_info)
     upsert_conformite(row_conf)
     upsert_resultats(rows_res)
-
+    if on_done:
+        try:  # the page is written: a failing callback must not turn it into a FAIL
+            on_done(page_id, None)
+        except Exception as e:
+            log.error(f"on_done failed for page {page_id}: {e}")
     return page_id
 
 
+def process_city(
+    city: dict,
+    ctx: EtlContext | None = None,
+    on_done: Callable[[str, str | None], None] | None = None,
+) -> str:
+    ctx = ctx or EtlContext()
+    pool = ctx.pool or SessionPool(limiter=ctx.limiter)
+    payload = build_search_payload(city)
+    status, html = pool.post_search(payload)
+    if not is_success(status):
+        raise RuntimeError(f"POST failed: {status}")
+
+    return ingest_fetched(html, payload, ctx, on_done)
+
+
+def ingest_fetched(
+    html: str,
+    payload: dict,
+    ctx: EtlContext,
+    on_done: Callable[[str, str | None], None] | None = None,
+) -> str:
+    """
+    Everything after the POST: cache the raw page, skip it if its fingerprint
+    is unchanged, otherwise parse + upsert and remember the new fingerprint.
+    `on_done(page_id, error)` runs once the page is settled: right away when
+    nothing is written, after the bulk flush when ctx.writer buffers the rows.
+    It is not called when this function raises.
+    """
+    if ctx.cache:
+        ctx.cache.put(payload, html)
+    if not ctx.write:
+        page_id = parse_rows(html, payload)[0]
+        if on_done:
+            on_done(page_id, None)
+        return page_id
+    if not ctx.fingerprints:
+        return ingest_html(html, payload, ctx.writer, on_done=on_done)
+
+    store = ctx.fingerprints
+    status, fp, stored_id = store.check(payload, html)
+    if status == UNCHANGED and stored_id:
+        if on_done:
+            on_done(stored_id, None)
+        return stored_id
+
+    def remember(page_id: str, error: str | None) -> None:
+        if error is None:
+            store.commit(payload, fp, page_id)
+        if on_done:
+            on_done(page_id, error)
+
+    return ingest_html(html, payload, ctx.writer, on_done=remember)
+
+
+def ingest_html(
+    html: str,
+    payload: dict,
+    writer: BulkWriter | None = None,
+    on_done: Callable[[str, str | None], None] | None = None,
+) -> str:
+    """Parse one results page and upsert its 4 tables (CPU + DB; no OROBNAT request)."""
+    return upsert_page(_timed_parse(html), payload, writer, on_done)
+
+
 def process_html_debug(html: str, city_stub: dict | None = None) -> str:
     payload = {
         "reseau": (city_stub or {}).get("reseau", ""),
         "departement": (city_stub or {}).get("departement", ""),
         "communeDepartement": (city_stub or {}).get("communeDepartement", ""),
     }
-    page_id = _compute_page_id(html, payload)
-
-    row_criteres = build_criteres(html, payload, page_id)
-    row_info = build_informations(html, page_id)
-    row_conf = build_conformite(html, page_id)
-    rows_res = build_resultats(html, page_id)
-
-    upsert_criteres(row_criteres)
-    upsert_informations(row_info)
-    upsert_conformite(row_conf)
-    upsert_resultats(rows_res)
-    return page_id
+    return ingest_html(html, payload)
@@ -0,0 +1,54 @@
+# hydro/executor.py
+"""
+Bounded worker pool for batch runs.
+
+run_batch() calls `fn(city)` for every city on at most `workers` threads and
+yields (index, city, result, error) as each call finishes. Exceptions never
+escape: they are reported in the `error` slot so the caller can keep its
+OK/FAIL accounting.
+"""
+
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any
+
+BatchResult = tuple[int, dict, Any, Exception | None]
+
+
+def _call(fn: Callable[[dict], Any], city: dict) -> tuple[Any, Exception | None]:
+    try:
+        return fn(city), None
+    except Exception as e:
+        return None, e
+
+
+def run_batch(
+    cities: Iterable[dict], fn: Callable[[dict], Any], workers: int = 1
+) -> Iterator[BatchResult]:
+    """
+    Run `fn` over `cities` with at most `workers` calls in flight.
+    Cities are submitted lazily, so an iterator of cities is never fully materialized.
+    """
+    workers = max(1, workers)
+    if workers == 1:
+        for i, city in enumerate(cities):
+            result, err = _call(fn, city)
+            yield i, city, result, err
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hydro") as pool:
+        pending: dict = {}
+        it = enumerate(cities)
+        for i, city in it:
+            pending[pool.submit(_call, fn, city)] = (i, city)
+            if len(pending) >= workers:
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, city = pending.pop(fut)
+                result, err = fut.result()
+                yield i, city, result, err
+                nxt = next(it, None)
+                if nxt is not None:
+                    pending[pool.submit(_call, fn, nxt[1])] = nxt
@@ -1,3 +1,5 @@
+import os
+
 import requests
 import urllib3
 
@@ -5,9 +7,10 @@ import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # === 0) Parámetros de búsqueda (los usas en el POST)
+REGION = os.getenv("OROBNAT_REGION", "11")
 payload = {
     "methode": "rechercher",
-    "idRegion": "11",
+    "idRegion": REGION,
     "usd": "AEP",
     "posPLV": "0",
     "departement": "095",
@@ -19,7 +22,7 @@ payload = {
 session = requests.Session()
 url_get = "https://orobnat.sante.gouv.fr/orobnat/afficherPage.do"
 resp_get = session.get(
-    url_get, params={"methode": "menu", "usd": "AEP", "idRegion": "11"}, verify=False
+    url_get, params={"methode": "menu", "usd": "AEP", "idRegion": REGION}, verify=False
 )
 print("GET status:", resp_get.status_code)
 
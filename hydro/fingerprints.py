@@ -0,0 +1,90 @@
+# hydro/fingerprints.py
+"""
+Change detection for OROBNAT pages.
+
+For each search payload we remember the fingerprint of the last page that was
+fully upserted and the page_id it produced. When the next fetch returns the
+same fingerprint, the city is skipped before parsing and before any DB call.
+
+A fingerprint is the sha256 of the body with volatile bits removed
+(jsessionid tokens, whitespace runs), so re-served pages hash identically.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .cache import payload_key
+
+NEW, CHANGED, UNCHANGED = "new", "changed", "unchanged"
+
+_VOLATILE = [
+    re.compile(r";jsessionid=[^\"'?#\s>]*", re.IGNORECASE),
+    re.compile(r"\s+"),
+]
+
+
+def page_fingerprint(html: str) -> str:
+    text = _VOLATILE[0].sub("", html)
+    text = _VOLATILE[1].sub(" ", text)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class FingerprintStore:
+    """SQLite-backed (payload -> fingerprint, page_id) map with per-run counters."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS fingerprints (
+                    payload     TEXT PRIMARY KEY,
+                    fingerprint TEXT NOT NULL,
+                    page_id     TEXT NOT NULL,
+                    updated_at  REAL NOT NULL
+                )
+                """
+            )
+        self.counts = {NEW: 0, CHANGED: 0, UNCHANGED: 0}
+
+    def check(self, payload: dict, html: str) -> tuple[str, str, str | None]:
+        """
+        Compare `html` with the last committed page for `payload`.
+        Return (status, fingerprint, stored_page_id); status is NEW, CHANGED or UNCHANGED.
+        """
+        fp = page_fingerprint(html)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint, page_id FROM fingerprints WHERE payload = ?",
+                (payload_key(payload),),
+            ).fetchone()
+            if row is None:
+                status = NEW
+            elif row[0] == fp:
+                status = UNCHANGED
+            else:
+                status = CHANGED
+            self.counts[status] += 1
+        return status, fp, row[1] if row else None
+
+    def commit(self, payload: dict, fingerprint: str, page_id: str) -> None:
+        """Record a page as fully upserted (call only after every upsert succeeded)."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)",
+                (payload_key(payload), fingerprint, page_id, time.time()),
+            )
+
+    def summary(self) -> str:
+        c = self.counts
+        return f"Pages: new {c[NEW]} | changed {c[CHANGED]} | unchanged (skipped) {c[UNCHANGED]}"
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
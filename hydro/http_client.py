@@ -3,48 +3,327 @@ Very small HTTP client:
 - creates a requests.Session
 - supports an optional warm-up GET
 - posts the search payload
+- optionally waits on a shared rate limiter before each request and keeps
+  the requests in flight under a shared AdaptiveLimit
+- retries timeouts / 429 / 5xx with backoff (see retry.py)
+- SessionPool: warmed-up keep-alive sessions reused across cities
 """
 
+import json
+import logging
+import queue
+import re
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
 import requests
 import urllib3
+from requests.adapters import HTTPAdapter
 
-from .settings import DEFAULT_HEADERS, URL_GET, URL_POST, VERIFY_SSL
+from .metrics import METRICS
+from .parsing.encoding import charset_from_content_type, decode_html
+from .retry import CircuitBreaker, RequestStats, RetryPolicy, is_success, send
+from .settings import DEFAULT_HEADERS, DEFAULT_SEARCH, URL_GET, URL_POST, VERIFY_SSL
+from .throttle import AdaptiveLimit, TokenBucket
 
 # Silence "InsecureRequestWarning" if VERIFY_SSL=False during early tests.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+log = logging.getLogger("hydromet")
+
+# Statuses / markers that mean the server dropped our session state
+EXPIRED_STATUSES = {401, 403}
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+_FORM = re.compile(r"<form", re.I)
+_FORM_BYTES = re.compile(rb"<form", re.I)
+
+WARMUP_PARAMS = {"methode": "menu", "usd": "AEP", "idRegion": DEFAULT_SEARCH["idRegion"]}
+DEFAULT_RETRY = RetryPolicy()
+
 
 def make_session() -> requests.Session:
     """
     Return a plain requests.Session with default headers.
-    Keep it tiny and predictable; retries can be added later if needed.
+    Retries are handled per call by retry.send(), not by the adapter.
     """
     s = requests.Session()
     s.headers.update(DEFAULT_HEADERS)
+    # Keep-alive + compressed bodies; one connection per session is enough
+    s.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
     return s
 
 
-def warmup_get(session: requests.Session) -> None:
+def _status_of(resp: requests.Response) -> tuple[int, str | None]:
+    return resp.status_code, resp.headers.get("Retry-After")
+
+
+def warmup_params(region: str | None = None) -> dict[str, str]:
+    """Menu GET parameters of `region` (the default region when None)."""
+    return {**WARMUP_PARAMS, "idRegion": region} if region else WARMUP_PARAMS
+
+
+def warmup_get(
+    session: requests.Session,
+    limiter: TokenBucket | None = None,
+    *,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+    region: str | None = None,
+    limit: AdaptiveLimit | None = None,
+) -> None:
     """
-    Optional warm-up GET. If it fails, we simply continue.
-    Some sites set cookies or session state on the first GET.
+    Optional warm-up GET (menu of `region`), retried per `policy`. If it still
+    fails, we log and continue. Some sites set cookies or session state on the first GET.
     """
+    policy = policy or DEFAULT_RETRY
+    params = warmup_params(region)
     try:
-        session.get(
-            URL_GET,
-            params={"methode": "menu", "usd": "AEP", "idRegion": "11"},
-            timeout=30,
-            verify=VERIFY_SSL,
-        )
-    except Exception:
-        pass
+        with METRICS.timer("http.warmup"):
+            send(
+                lambda: session.get(
+                    URL_GET, params=params, timeout=policy.timeout, verify=VERIFY_SSL
+                ),
+                _status_of,
+                policy=policy,
+                breaker=breaker,
+                stats=stats,
+                before=limiter.acquire if limiter else None,
+                limit=limit,
+            )
+    except Exception as e:
+        log.warning(f"Warm-up GET failed, continuing without it: {e}")
 
 
-def post_search(session: requests.Session, payload: dict) -> tuple[int, str]:
+def post_search(
+    session: requests.Session,
+    payload: dict,
+    limiter: TokenBucket | None = None,
+    *,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+    limit: AdaptiveLimit | None = None,
+) -> tuple[int, str]:
     """
     Perform the POST to OROBNAT and return (status_code, response_text).
+    Timeouts, connection errors and 429/5xx are retried per `policy`.
     Raises HTTPError on non-2xx responses.
     """
-    resp = session.post(URL_POST, data=payload, timeout=40, verify=VERIFY_SSL)
+    resp = _post(
+        session, payload, limiter, policy=policy, breaker=breaker, stats=stats, limit=limit
+    )
     resp.raise_for_status()
-    return resp.status_code, resp.text
+    return resp.status_code, _decode(resp)
+
+
+def _decode(resp: requests.Response) -> str:
+    """
+    Decode the body once, with the header/pinned/<meta> charset (see
+    parsing.encoding), instead of resp.text, which guesses (or runs charset
+    detection over the whole page) when the header names no charset.
+    """
+    METRICS.add("http.bytes", len(resp.content))
+    with METRICS.timer("http.decode"):
+        header = charset_from_content_type(resp.headers.get("Content-Type"))
+        return decode_html(resp.content, header)
+
+
+def _post(
+    session: requests.Session,
+    payload: dict,
+    limiter: TokenBucket | None = None,
+    *,
+    policy: RetryPolicy | None = None,
+    breaker: CircuitBreaker | None = None,
+    stats: RequestStats | None = None,
+    limit: AdaptiveLimit | None = None,
+) -> requests.Response:
+    policy = policy or DEFAULT_RETRY
+    with METRICS.timer("http.post"):
+        return send(
+            lambda: session.post(
+                URL_POST, data=payload, timeout=policy.timeout, verify=VERIFY_SSL
+            ),
+            _status_of,
+            policy=policy,
+            breaker=breaker,
+            stats=stats,
+            before=limiter.acquire if limiter else None,
+            limit=limit,
+        )
+
+
+def session_expired(resp: requests.Response) -> bool:
+    """
+    True when OROBNAT answered as if our session was unknown:
+    403/401, a redirect back to the menu, or a 200 page without the search form.
+    """
+    locations = [r.headers.get("Location") or "" for r in resp.history]
+    return looks_expired(resp.status_code, resp.url or "", locations, resp.content)
+
+
+def looks_expired(
+    status: int, url: str, redirect_locations: list[str], body: str | bytes
+) -> bool:
+    """
+    Client-agnostic core of session_expired (shared with the async client).
+    `body` may be the raw bytes: the check needs no decoding.
+    """
+    if status in EXPIRED_STATUSES or status in REDIRECT_STATUSES:
+        return True
+    if any("methode=menu" in loc for loc in redirect_locations) or "methode=menu" in url:
+        return True
+    form = _FORM_BYTES if isinstance(body, bytes) else _FORM
+    return is_success(status) and not form.search(body)
+
+
+# =====================================================================
+# Session pool
+# =====================================================================
+
+
+class SessionPool:
+    """
+    Thread-safe pool of warmed-up sessions.
+
+    Each session is warmed once (warm-up GET) and then reused for as many
+    POSTs as needed; it is re-warmed only when `session_expired` says the
+    server forgot it. Idle sessions keep their keep-alive connection.
+    If `cookie_path` is set, cookies are loaded from / saved to that JSON file
+    so the next run can skip the first warm-up. Sessions are warmed on the
+    menu of `region` (one pool per region in multi-region runs). With `limit`,
+    every request of the pool holds one of its adaptive slots.
+    """
+
+    def __init__(
+        self,
+        limiter: TokenBucket | None = None,
+        cookie_path: str | None = None,
+        policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        stats: RequestStats | None = None,
+        *,
+        region: str | None = None,
+        limit: AdaptiveLimit | None = None,
+    ):
+        self.region = region
+        self.limiter = limiter
+        self.limit = limit
+        self.policy = policy or DEFAULT_RETRY
+        self.breaker = breaker
+        self.stats = stats
+        self.cookie_path = Path(cookie_path) if cookie_path else None
+        self._idle: queue.LifoQueue[requests.Session] = queue.LifoQueue()
+        self._all: list[requests.Session] = []
+        self._lock = threading.Lock()
+        self._saved_cookies = self._load_cookies()
+        self.warmups = 0
+
+    # ---- cookies persistence ----
+    def _load_cookies(self) -> dict[str, str]:
+        if not self.cookie_path or not self.cookie_path.exists():
+            return {}
+        try:
+            return json.loads(self.cookie_path.read_text(encoding="utf-8")) or {}
+        except Exception as e:
+            log.warning(f"Ignoring unreadable cookie file {self.cookie_path}: {e}")
+            return {}
+
+    def save_cookies(self) -> None:
+        if not self.cookie_path or not self._all:
+            return
+        cookies = requests.utils.dict_from_cookiejar(self._all[0].cookies)
+        self.cookie_path.parent.mkdir(parents=True, exist_ok=True)
+        self.cookie_path.write_text(json.dumps(cookies), encoding="utf-8")
+
+    # ---- lifecycle ----
+    def _new_session(self) -> requests.Session:
+        s = make_session()
+        with self._lock:
+            cookies = dict(self._saved_cookies)
+            self._saved_cookies = {}  # only the first session reuses the persisted cookies
+            self._all.append(s)
+        if cookies:
+            s.cookies.update(cookies)
+        else:
+            self.warm(s)
+        return s
+
+    def warm(self, session: requests.Session) -> None:
+        warmup_get(
+            session,
+            self.limiter,
+            policy=self.policy,
+            breaker=self.breaker,
+            stats=self.stats,
+            region=self.region,
+            limit=self.limit,
+        )
+        self.warmups += 1
+
+    @contextmanager
+    def session(self) -> Iterator[requests.Session]:
+        """Borrow a warmed session for the duration of the block."""
+        try:
+            s = self._idle.get_nowait()
+        except queue.Empty:
+            s = self._new_session()
+        try:
+            yield s
+        finally:
+            self._idle.put(s)
+
+    def post_search(self, payload: dict) -> tuple[int, str]:
+        """post_search() on a pooled session, re-warming once if the session expired."""
+        with self.session() as s:
+            resp = self._post(s, payload)
+            if session_expired(resp):
+                log.info("OROBNAT session expired; warming up again")
+                s.cookies.clear()
+                self.warm(s)
+                resp = self._post(s, payload)
+            resp.raise_for_status()
+            return resp.status_code, _decode(resp)
+
+    def get_menu(self, region: str | None = None) -> str:
+        """The search form of `region` (default: the pool's), on a pooled session."""
+        with self.session() as s:
+            resp = send(
+                lambda: s.get(
+                    URL_GET,
+                    params=warmup_params(region or self.region),
+                    timeout=self.policy.timeout,
+                    verify=VERIFY_SSL,
+                ),
+                _status_of,
+                policy=self.policy,
+                breaker=self.breaker,
+                stats=self.stats,
+                before=self.limiter.acquire if self.limiter else None,
+                limit=self.limit,
+            )
+            resp.raise_for_status()
+            return _decode(resp)
+
+    def _post(self, session: requests.Session, payload: dict) -> requests.Response:
+        return _post(
+            session,
+            payload,
+            self.limiter,
+            policy=self.policy,
+            breaker=self.breaker,
+            stats=self.stats,
+            limit=self.limit,
+        )
+
+    def close(self) -> None:
+        self.save_cookies()
+        with self._lock:
+            for s in self._all:
+                s.close()
@@ -0,0 +1,114 @@
+# hydro/journal.py
+"""
+Durable run journal for batch runs (SQLite, one row per city per run).
+
+A run registers every selected city as "pending"; each outcome is written as
+soon as it is known (status, attempt count, last error, page_id, and a
+free-form note such as the backfill progress). A crashed
+or killed run can then be resumed (only non-"ok" cities) or have just its
+failures retried, without redoing the successful fetches.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PENDING, OK, FAILED = "pending", "ok", "failed"
+
+
+class RunJournal:
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at  REAL NOT NULL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS run_cities (
+                    run_id     INTEGER NOT NULL REFERENCES runs(run_id),
+                    city_key   TEXT NOT NULL,
+                    name       TEXT,
+                    status     TEXT NOT NULL,
+                    attempts   INTEGER NOT NULL DEFAULT 0,
+                    error      TEXT,
+                    page_id    TEXT,
+                    updated_at REAL NOT NULL,
+                    note       TEXT,
+                    PRIMARY KEY (run_id, city_key)
+                );
+                """
+            )
+            cols = {r[1] for r in self._db.execute("PRAGMA table_info(run_cities)")}
+            if "note" not in cols:  # journals written before the note column
+                self._db.execute("ALTER TABLE run_cities ADD COLUMN note TEXT")
+
+    def start(self, cities: list[tuple[str, str]]) -> int:
+        """Register a new run over [(city_key, name)]; return its run_id."""
+        now = time.time()
+        with self._lock, self._db:
+            run_id = self._db.execute("INSERT INTO runs (started_at) VALUES (?)", (now,)).lastrowid
+            self._db.executemany(
+                "INSERT OR IGNORE INTO run_cities (run_id, city_key, name, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(run_id, key, name, PENDING, now) for key, name in cities],
+            )
+        return int(run_id)
+
+    def latest_run(self) -> int | None:
+        with self._lock:
+            row = self._db.execute("SELECT MAX(run_id) FROM runs").fetchone()
+        return row[0] if row and row[0] is not None else None
+
+    def keys(self, run_id: int, statuses: tuple[str, ...]) -> set[str]:
+        marks = ",".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT city_key FROM run_cities WHERE run_id = ? AND status IN ({marks})",
+                (run_id, *statuses),
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def reopen(self, run_id: int) -> None:
+        """Mark a resumed run as unfinished again."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE runs SET finished_at = NULL WHERE run_id = ?", (run_id,))
+
+    def record(
+        self,
+        run_id: int,
+        key: str,
+        page_id: str | None,
+        error: str | None,
+        note: str | None = None,
+    ) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE run_cities SET status = ?, attempts = attempts + 1, error = ?, "
+                "page_id = COALESCE(?, page_id), note = COALESCE(?, note), updated_at = ? "
+                "WHERE run_id = ? AND city_key = ?",
+                (FAILED if error else OK, error, page_id, note, time.time(), run_id, key),
+            )
+
+    def finish(self, run_id: int) -> None:
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id)
+            )
+
+    def status_counts(self, run_id: int) -> dict[str, int]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM run_cities WHERE run_id = ? GROUP BY status",
+                (run_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,178 @@
+# hydro/metrics.py
+"""
+Lightweight, process-wide timing and counter registry for the ETL.
+
+    with METRICS.timer("http.post"):
+        ...
+    METRICS.add("http.bytes", len(body))
+
+Each timer stage keeps its raw samples (runs are thousands of pages, not
+millions), so the report can give exact p50/p95/p99. Work submitted to a
+process pool goes through measured(): the child ships the samples it took
+back with the result, and the parent merge()s them into its own registry.
+Output formats:
+- write_json():       run report
+- write_prometheus(): node_exporter textfile collector format
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+PERCENTILES = (50, 95, 99)
+
+T = TypeVar("T")
+
+# (timings, counters) taken with Metrics.drain()
+Samples = tuple[dict[str, list[float]], dict[str, float]]
+
+
+def _percentile(sorted_data: list[float], p: float) -> float:
+    if not sorted_data:
+        return 0.0
+    return sorted_data[min(len(sorted_data) - 1, int(p / 100 * len(sorted_data)))]
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings: dict[str, list[float]] = defaultdict(list)
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self.started = time.time()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._timings[stage].append(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def add(self, counter: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[counter] += value
+
+    def query(self, stage: str, seconds: float, rows: int | None, ok: bool) -> None:
+        """Database query observer (db.supabase_utils.set_query_observer / BulkWriter)."""
+        self.observe(stage, seconds)
+        if rows is not None:
+            self.add(f"{stage}.rows", rows)
+        if not ok:
+            self.add(f"{stage}.errors")
+
+    def drain(self) -> Samples:
+        """Take and clear the raw timings and counters (gauges are left alone)."""
+        with self._lock:
+            samples = (dict(self._timings), dict(self._counters))
+            self._timings.clear()
+            self._counters.clear()
+        return samples
+
+    def merge(self, samples: Samples) -> None:
+        """Add samples taken with drain(), e.g. in a worker process."""
+        timings, counters = samples
+        with self._lock:
+            for stage, data in timings.items():
+                self._timings[stage].extend(data)
+            for counter, value in counters.items():
+                self._counters[counter] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {k: sorted(v) for k, v in self._timings.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        stages = {}
+        for stage, data in sorted(timings.items()):
+            stages[stage] = {
+                "count": len(data),
+                "sum": sum(data),
+                **{f"p{p}": _percentile(data, p) for p in PERCENTILES},
+                "max": data[-1] if data else 0.0,
+            }
+        return {
+            "started_at": self.started,
+            "elapsed": time.time() - self.started,
+            "stages": stages,
+            "counters": dict(sorted(counters.items())),
+            "gauges": dict(sorted(gauges.items())),
+        }
+
+    def summary_lines(self) -> list[str]:
+        snap = self.snapshot()
+        lines = [
+            f" - {stage}: n={s['count']} p50={s['p50'] * 1000:.1f}ms "
+            f"p95={s['p95'] * 1000:.1f}ms p99={s['p99'] * 1000:.1f}ms"
+            for stage, s in snap["stages"].items()
+        ]
+        lines += [f" - {k}: {v:g}" for k, v in snap["counters"].items()]
+        return lines
+
+    def write_json(self, path: str, **extra) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.snapshot(), **extra}, f, ensure_ascii=False, indent=2)
+
+    def write_prometheus(self, path: str, prefix: str = "hydromet") -> None:
+        """Write a textfile-collector file (atomically, via a temp file)."""
+        snap = self.snapshot()
+        out: list[str] = []
+        name = f"{prefix}_stage_seconds"
+        out.append(f"# TYPE {name} summary")
+        for stage, s in snap["stages"].items():
+            for p in PERCENTILES:
+                out.append(f'{name}{{stage="{stage}",quantile="{p / 100:g}"}} {s[f"p{p}"]:.6f}')
+            out.append(f'{name}_sum{{stage="{stage}"}} {s["sum"]:.6f}')
+            out.append(f'{name}_count{{stage="{stage}"}} {s["count"]}')
+        for counter, v in snap["counters"].items():
+            metric = f"{prefix}_{_metric_name(counter)}_total"
+            out.append(f"# TYPE {metric} counter")
+            out.append(f"{metric} {v:g}")
+        for gauge, v in snap["gauges"].items():
+            metric = f"{prefix}_{_metric_name(gauge)}"
+            out.append(f"# TYPE {metric} gauge")
+            out.append(f"{metric} {v:g}")
+        out.append(f"# TYPE {prefix}_run_elapsed_seconds gauge")
+        out.append(f"{prefix}_run_elapsed_seconds {snap['elapsed']:.3f}")
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(out) + "\n")
+        os.replace(tmp, path)
+
+
+def _metric_name(s: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", s)
+
+
+# Process-wide registry used by http_client, etl_runner, tables and supabase_utils
+METRICS = Metrics()
+
+
+def measured(fn: Callable[..., T], *args: Any) -> tuple[T, Samples]:
+    """
+    Process-pool entry point: fn(*args) plus the samples it recorded in this
+    worker's METRICS (a forked child's inherited samples are dropped first).
+    """
+    METRICS.drain()
+    return fn(*args), METRICS.drain()
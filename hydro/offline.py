@@ -0,0 +1,202 @@
+# hydro/offline.py
+"""
+Bulk offline ingestion of saved OROBNAT pages.
+
+Sources can be HTML files, directories (every .html/.htm page or archive
+inside), glob patterns and .tar/.tar.gz/.tgz/.zip archives. An optional manifest (CSV with a header
+row, or JSONL) maps each file to its search payload:
+
+    file,reseau,departement,communeDepartement
+    2024/paris.html,075000123,075,75056
+
+`file` is matched against the path inside the directory/archive, then
+against the bare file name. Payload fields missing from the manifest are
+taken from the CLI defaults, then from the options selected in the page's
+own search form.
+
+Pages are parsed on a process pool; rows are written by one BulkWriter in
+the parent process (multi-row upserts).
+"""
+
+import csv
+import glob
+import json
+import logging
+import tarfile
+import zipfile
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path, PurePosixPath
+
+from db.supabase_utils import BulkWriter
+
+from .etl_runner import build_page_rows
+from .metrics import METRICS, measured
+from .parsing.encoding import decode_html
+from .parsing.page import ParsedPage, parse_page
+
+log = logging.getLogger("hydromet")
+
+PAYLOAD_KEYS = ("reseau", "departement", "communeDepartement")
+HTML_SUFFIXES = (".html", ".htm")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# (source name, html)
+SourcePage = tuple[str, str]
+# (index, name, page_id, error)
+Result = tuple[int, str, str | None, Exception | None]
+
+
+def _is_html(name: str) -> bool:
+    return name.lower().endswith(HTML_SUFFIXES)
+
+
+def _is_archive(name: str) -> bool:
+    return name.lower().endswith((*TAR_SUFFIXES, ".zip"))
+
+
+def _decode(data: bytes) -> str:
+    return decode_html(data)  # saved pages keep the server's encoding
+
+
+def _iter_tar(path: Path) -> Iterator[SourcePage]:
+    with tarfile.open(path, "r:*") as tar:
+        for member in tar:
+            if member.isfile() and _is_html(member.name):
+                f = tar.extractfile(member)
+                if f:
+                    yield PurePosixPath(member.name).as_posix(), _decode(f.read())
+
+
+def _iter_zip(path: Path) -> Iterator[SourcePage]:
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if not info.is_dir() and _is_html(info.filename):
+                yield info.filename, _decode(zf.read(info))
+
+
+def _iter_path(path: Path) -> Iterator[SourcePage]:
+    name = path.name.lower()
+    if path.is_dir():
+        for f in sorted(path.rglob("*")):
+            if not f.is_file():
+                continue
+            if _is_html(f.name):
+                yield f.relative_to(path).as_posix(), _decode(f.read_bytes())
+            elif _is_archive(f.name):
+                yield from _iter_path(f)
+    elif name.endswith(TAR_SUFFIXES):
+        yield from _iter_tar(path)
+    elif name.endswith(".zip"):
+        yield from _iter_zip(path)
+    else:
+        yield path.as_posix(), _decode(path.read_bytes())
+
+
+def iter_sources(specs: Iterable[str]) -> Iterator[SourcePage]:
+    """Yield (name, html) for every page under files, dirs, globs and archives."""
+    for spec in specs:
+        paths = sorted(glob.glob(spec, recursive=True)) if glob.has_magic(spec) else [spec]
+        if not paths:
+            log.warning(f"No file matches {spec}")
+        for p in paths:
+            yield from _iter_path(Path(p))
+
+
+def load_manifest(path: str) -> dict[str, dict[str, str]]:
+    """Read a CSV or JSONL manifest into {file: payload}."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            records = [json.loads(line) for line in f if line.strip()]
+        else:
+            records = list(csv.DictReader(f))
+    manifest = {}
+    for rec in records:
+        file = (rec.get("file") or "").strip()
+        if not file:
+            continue
+        if "commune" in rec and "communeDepartement" not in rec:
+            rec["communeDepartement"] = rec["commune"]
+        manifest[file] = {k: str(rec.get(k) or "").strip() for k in PAYLOAD_KEYS}
+    return manifest
+
+
+def lookup_payload(
+    manifest: dict[str, dict[str, str]], name: str, defaults: dict[str, str]
+) -> dict[str, str]:
+    entry = manifest.get(name) or manifest.get(PurePosixPath(name).name) or {}
+    return {k: entry.get(k) or defaults.get(k) or "" for k in PAYLOAD_KEYS}
+
+
+def complete_payload(page: ParsedPage, payload: dict) -> dict:
+    """Fill empty payload fields from the options selected in the page's search form."""
+    out = dict(payload)
+    for key in PAYLOAD_KEYS:
+        if not out.get(key):
+            out[key] = next((v for v, _, sel in page.selects.get(key) or [] if sel), "")
+    return out
+
+
+def parse_saved_page(html: str, payload: dict) -> tuple[str, dict, dict, dict, list[dict]]:
+    """Worker side: parse one saved page into its 4 table rows (picklable)."""
+    with METRICS.timer("parse.page"):
+        page = parse_page(html)
+    payload = complete_payload(page, payload)
+    if not payload["communeDepartement"]:
+        # the page id is built from it; refuse rather than write under "00000"
+        raise ValueError("No communeDepartement in the manifest, CLI or page")
+    return build_page_rows(page, payload)
+
+
+def run_bulk_offline(
+    pages: Iterable[SourcePage],
+    *,
+    manifest: dict[str, dict[str, str]] | None = None,
+    defaults: dict[str, str] | None = None,
+    procs: int = 2,
+    writer: BulkWriter | None = None,
+    on_result: Callable[[Result], None] | None = None,
+) -> int:
+    """
+    Parse every page on `procs` processes and hand the rows to `writer`
+    (None = parse only). Returns the number of pages submitted.
+    """
+    manifest, defaults = manifest or {}, defaults or {}
+    procs = max(1, procs)
+    inflight: dict[Future, tuple[int, str]] = {}
+
+    def report(i: int, name: str, pid: str | None, err: Exception | None) -> None:
+        if on_result:
+            on_result((i, name, pid, err))
+
+    def drain(block_until: int) -> None:
+        while len(inflight) > block_until:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, name = inflight.pop(fut)
+                try:
+                    (page_id, crit, info, conf, res), samples = fut.result()
+                except Exception as e:
+                    report(i, name, None, e)
+                    continue
+                METRICS.merge(samples)  # parse.page / build.* timed in the worker
+                METRICS.add("offline.pages")
+                if writer is None:
+                    report(i, name, page_id, None)
+                    continue
+
+                def done_cb(pid: str, error: str | None, i=i, name=name) -> None:
+                    report(i, name, pid, RuntimeError(error) if error else None)
+
+                writer.add_page(crit, info, conf, res, on_done=done_cb)
+
+    n = 0
+    with ProcessPoolExecutor(max_workers=procs) as ex:
+        for n, (name, html) in enumerate(pages, start=1):
+            payload = lookup_payload(manifest, name, defaults)
+            inflight[ex.submit(measured, parse_saved_page, html, payload)] = (n - 1, name)
+            drain(4 * procs)  # bounded: archives can hold far more pages than fit in RAM
+        drain(0)
+    if writer:
+        writer.flush()
+    return n
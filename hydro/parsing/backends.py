@@ -0,0 +1,212 @@
+# hydro/parsing/backends.py
+"""
+HTML parser backends that turn an OROBNAT page into a ParsedPage.
+
+- "bs4":  BeautifulSoup + html.parser (pure Python, always available)
+- "lxml": lxml.html (libxml2, C); several times faster on large pages
+- "stream": no DOM, stops once the sections we use are read (see stream.py);
+            meant for bulk replay / offline loads (HTML_PARSER=stream)
+- "auto": lxml when installed, else bs4
+
+Every backend accepts str or raw bytes (decoded once, see encoding.py) and
+they must all produce identical ParsedPage objects: tests/ checks the rows
+built from the saved pages in tests/fixtures/pages, and
+`python -m hydro.parsing.compare <pages...>` diffs any other corpus.
+"""
+
+import logging
+from collections.abc import Callable
+
+from bs4 import BeautifulSoup
+
+from ..settings import HTML_PARSER
+from .encoding import decode_html, page_encoding
+from .mappers import communes_text_to_csv, normalize_headers
+from .parsed import ParsedPage
+from .sections import (
+    COMMUNES_LABEL,
+    RESULTS_TITLE,
+    communes_from_label,
+    kv_from_table,
+    results_row,
+    results_rows_from_table,
+)
+from .stream import parse_stream
+
+try:
+    import lxml.html as lxml_html
+except ImportError:  # optional dependency
+    lxml_html = None
+
+log = logging.getLogger("hydromet")
+
+Backend = Callable[[str | bytes], ParsedPage]
+
+
+# ---------------------------------------------------------------------
+# BeautifulSoup (html.parser)
+# ---------------------------------------------------------------------
+
+
+def parse_bs4(html: str | bytes) -> ParsedPage:
+    if isinstance(html, bytes):
+        html = decode_html(html)  # decode once; bs4 would run its own detection
+    soup = BeautifulSoup(html, "html.parser")
+    page = ParsedPage()
+
+    for h3 in soup.find_all("h3"):
+        title = h3.get_text() or ""
+        if title in page.sections:
+            continue
+        table = h3.find_next("table")
+        if RESULTS_TITLE in title and not page.results_rows and table:
+            page.results_rows = results_rows_from_table(table)
+        page.sections[title] = kv_from_table(table) if table else {}
+
+    label = soup.find("label", string=lambda x: bool(x) and COMMUNES_LABEL in x)
+    if label:
+        page.communes_csv = communes_from_label(label)
+
+    for select in soup.find_all("select"):
+        name = select.get("name")
+        if not name or name in page.selects:
+            continue
+        page.selects[name] = [
+            (opt.get("value") or "", opt.get_text(strip=True), opt.has_attr("selected"))
+            for opt in select.find_all("option")
+        ]
+    return page
+
+
+# ---------------------------------------------------------------------
+# lxml (libxml2)
+# Each helper mirrors the BeautifulSoup call it replaces.
+# ---------------------------------------------------------------------
+
+_TEXT = ".//text()[not(ancestor::script or ancestor::style)]"
+_NEXT = "(descendant::{0} | following::{0})[1]"  # bs4 find_next(name)
+
+
+def _strings(el) -> list[str]:
+    """bs4 `stripped_strings`."""
+    return [s.strip() for s in el.xpath(_TEXT) if s.strip()]
+
+
+def _find_next(el, name: str):
+    found = el.xpath(_NEXT.format(name))
+    return found[0] if found else None
+
+
+def _single_string(el) -> str | None:
+    """bs4 `.string`: the only string inside `el`, following single children."""
+    while True:
+        children = [c for c in el if isinstance(c.tag, str)]
+        text = el.text or ""
+        if not children:
+            return text if text else None
+        if len(children) > 1 or text or (children[0].tail or ""):
+            return None
+        el = children[0]
+
+
+def _kv_from_table_lxml(table) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for tr in table.iterfind(".//tr"):
+        th, td = tr.find(".//th"), tr.find(".//td")
+        if th is not None and td is not None:
+            out[" ".join(_strings(th)).strip()] = " ".join(_strings(td))
+    return out
+
+
+def _results_rows_from_table_lxml(table) -> list[dict]:
+    trs = table.findall(".//tr")
+    headers = [" ".join(_strings(th)) for th in trs[0].iterfind(".//th")] if trs else []
+    headers = normalize_headers(headers)
+
+    rows: list[dict] = []
+    for tr in trs[1:]:
+        tds = tr.findall(".//td")
+        if not tds:
+            continue
+        rows.append(results_row(headers, [" ".join(_strings(td)) for td in tds]))
+    return rows
+
+
+def _lxml_root(html: str | bytes):
+    """
+    Bytes in a declared/pinned encoding go straight to libxml2 (no Python
+    decode); undeclared bytes are decoded once by decode_html. str is parsed
+    as is, and only re-encoded if it carries an XML declaration.
+    """
+    if isinstance(html, bytes):
+        encoding = page_encoding(html)
+        if encoding:
+            parser = lxml_html.HTMLParser(encoding=encoding)
+            return lxml_html.document_fromstring(html, parser=parser)
+        html = decode_html(html)
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:  # "Unicode strings with encoding declaration are not supported"
+        parser = lxml_html.HTMLParser(encoding="utf-8")
+        return lxml_html.document_fromstring(html.encode("utf-8"), parser=parser)
+
+
+def parse_lxml(html: str | bytes) -> ParsedPage:
+    if lxml_html is None:
+        raise RuntimeError("lxml backend requested but lxml is not installed")
+    root = _lxml_root(html)
+    page = ParsedPage()
+
+    for h3 in root.iter("h3"):
+        title = "".join(h3.xpath(".//text()"))
+        if title in page.sections:
+            continue
+        table = _find_next(h3, "table")
+        if RESULTS_TITLE in title and not page.results_rows and table is not None:
+            page.results_rows = _results_rows_from_table_lxml(table)
+        page.sections[title] = _kv_from_table_lxml(table) if table is not None else {}
+
+    for label in root.iter("label"):
+        s = _single_string(label)
+        if s and COMMUNES_LABEL in s:
+            span = _find_next(label, "span")
+            if span is not None:
+                page.communes_csv = communes_text_to_csv("\n".join(_strings(span)))
+            break
+
+    for select in root.iter("select"):
+        name = select.get("name")
+        if not name or name in page.selects:
+            continue
+        page.selects[name] = [
+            (opt.get("value") or "", "".join(_strings(opt)), "selected" in opt.attrib)
+            for opt in select.iterfind(".//option")
+        ]
+    return page
+
+
+# ---------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------
+
+BACKENDS: dict[str, Backend] = {"bs4": parse_bs4, "lxml": parse_lxml, "stream": parse_stream}
+
+
+def available_backends() -> list[str]:
+    return [name for name in BACKENDS if name != "lxml" or lxml_html is not None]
+
+
+def get_backend(name: str | None = None) -> Backend:
+    """
+    Resolve a backend by name (default: settings.HTML_PARSER).
+    Falls back to bs4 when lxml is requested but not installed.
+    """
+    name = (name or HTML_PARSER or "auto").lower()
+    if name == "auto":
+        name = "lxml" if lxml_html is not None else "bs4"
+    if name == "lxml" and lxml_html is None:
+        log.warning("HTML_PARSER=lxml but lxml is not installed; using bs4")
+        name = "bs4"
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML parser backend: {name!r} (expected {list(BACKENDS)})")
+    return BACKENDS[name]
@@ -0,0 +1,326 @@
+# hydro/parsing/bench.py
+"""
+Parsing benchmark: pages/second and peak memory of the parser and table builders.
+
+Usage:
+    python -m hydro.parsing.bench                       # synthetic pages, check baseline
+    python -m hydro.parsing.bench --corpus saved_pages/ # + recorded OROBNAT pages
+    python -m hydro.parsing.bench --update-baseline     # accept current numbers
+
+Cases are synthetic pages with a growing "Résultats d'analyses" table
+(small/large/huge) plus, with --corpus, every recorded page found. Targets:
+- parse_page:    HTML -> ParsedPage with the configured backend (HTML_PARSER)
+- parse:<name>:  the same with each available backend (bs4, lxml, stream)
+- build_*:       the four table builders on an already parsed page
+- ingest:        the process_html_debug path (parse + build + write hand-off)
+                 with a NullWriter in place of the database
+- decode:*:      response bytes -> str: requests' Response.text with no
+                 declared charset (detection) vs encoding.decode_html
+- parse_bytes:   the raw bytes straight into parse_page (one decode, or none
+                 in Python with lxml)
+
+Results are compared with the stored baseline (bench_baseline.json next to
+this file); a target slower or hungrier than baseline +/- --tolerance makes
+the exit code 1. Speed is gated as a ratio to REFERENCE_TARGET measured in
+the same run, so the baseline carries over between machines; targets whose
+single run takes less than GATE_MIN_RUN_MS are timer noise and only
+reported. Peak memory is what tracemalloc sees, i.e. Python allocations
+only (libxml2's own buffers are not counted). The test suite runs this check
+with a short --min-time (tests/test_bench.py), so a regression fails it.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+import requests
+
+# The table builders import db.supabase_utils, which builds its client at import
+# time; the bench never writes (NullWriter), so placeholder credentials will do.
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "bench")
+
+from ..etl_runner import ingest_html
+from ..settings import HTML_PARSER
+from ..tables.conformite import build_conformite
+from ..tables.criteres import build_criteres
+from ..tables.informations import build_informations
+from ..tables.resultats import build_resultats
+from .backends import available_backends
+from .compare import iter_html_files
+from .encoding import decode_html
+from .page import parse_page
+
+BASELINE_PATH = Path(__file__).with_name("bench_baseline.json")
+SYNTHETIC_CASES = {"small": 30, "large": 300, "huge": 1000}  # result rows per page
+PAYLOAD = {"reseau": "075000123", "departement": "075", "communeDepartement": "75056"}
+SYNTHETIC_ENCODING = "cp1252"
+MEM_FLOOR_KB = 64  # ignore peak-memory drifts smaller than this
+REFERENCE_TARGET = "parse:bs4"  # pure Python, always available, not tuned here
+GATE_MIN_RUN_MS = 1.0  # faster targets are not speed-gated
+MIN_SAMPLE_S = 0.2  # shortest --min-time accepted: shorter samples are mostly noise
+MIN_RUNS = 3  # runs per target whatever --min-time, so the best of them means something
+
+_PARAMS = (
+    "Ammonium (en NH4)",
+    "Bactéries coliformes /100ml-MS",
+    "Chlore libre",
+    "Conductivité à 25°C",
+    "Entérocoques /100ml-MS",
+    "Escherichia coli /100ml-MF",
+    "Nitrates (en NO3)",
+    "pH",
+    "Température de l'eau",
+    "Turbidité néphélométrique NFU",
+)
+
+
+class NullWriter:
+    """BulkWriter stand-in: accepts pages, counts rows, never touches the database."""
+
+    def __init__(self):
+        self.pages = 0
+        self.rows = 0
+
+    def add_page(self, criteres, info, conf, resultats, on_done=None) -> None:
+        self.pages += 1
+        self.rows += 3 + len(resultats)
+        if on_done:
+            on_done(criteres["id"], None)
+
+
+# ---------------------------------------------------------------------
+# Synthetic pages
+# ---------------------------------------------------------------------
+
+
+def synthetic_page(n_results: int, n_communes: int = 12, seed: int = 0) -> str:
+    """An OROBNAT-shaped results page with `n_results` analysis rows."""
+    rnd = random.Random(seed)
+    communes = "<br/>".join(f" - COMMUNE {i} - QUARTIER {i}" for i in range(n_communes))
+    deps = "".join(
+        f'<option value="{d:03d}"{" selected" if d == 75 else ""}>{d:02d} - DEP {d}</option>'
+        for d in range(1, 96)
+    )
+    rows = []
+    for i in range(n_results):
+        name = f"{_PARAMS[i % len(_PARAMS)]} #{i}"
+        value = f"{rnd.uniform(0, 50):.2f}".replace(".", ",")
+        rows.append(
+            f"<tr><td>{name}</td><td>{value} mg/L</td>"
+            f"<td>&lt;={rnd.randint(1, 100)} mg/L</td><td>&lt;={rnd.randint(1, 5)},0 mg/L</td></tr>"
+        )
+    head = f'<meta charset="{SYNTHETIC_ENCODING}"><title>Résultats</title>'
+    return f"""<html><head>{head}</head><body>
+<form><select name="departement">{deps}</select>
+<select name="communeDepartement"><option value="75056" selected>PARIS</option></select>
+<select name="reseau"><option value="075000123">PARIS CENTRE</option></select></form>
+<label>Commune(s) et/ou quartier(s) du réseau</label><span>{communes}</span>
+<h3>Informations générales</h3><table>
+<tr><th>Date du prélèvement</th><td>12/03/2024 10h15</td></tr>
+<tr><th>Commune de prélèvement</th><td>PARIS</td></tr>
+<tr><th>Installation</th><td>RESERVOIR DE MONTSOURIS</td></tr>
+<tr><th>Service public de distribution</th><td>EAU DE PARIS</td></tr>
+<tr><th>Responsable de distribution</th><td>REGIE EAU DE PARIS</td></tr>
+<tr><th>Maître d'ouvrage</th><td>VILLE DE PARIS</td></tr></table>
+<h3>Conformité</h3><table>
+<tr><th>Conclusions sanitaires</th><td>Eau conforme aux exigences de qualité.</td></tr>
+<tr><th>Conformité bactériologique</th><td>oui</td></tr>
+<tr><th>Conformité physico-chimique</th><td>oui</td></tr>
+<tr><th>Respect des références de qualité</th><td>oui</td></tr></table>
+<h3>Résultats d'analyses</h3><table>
+<tr><th>Paramètre</th><th>Valeur</th>
+<th>Limite de qualité</th><th>Référence de qualité</th></tr>
+{"".join(rows)}</table></body></html>"""
+
+
+# ---------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------
+
+
+def _requests_text(body: bytes) -> str:
+    """What resp.text costs when the server declares no charset."""
+    resp = requests.Response()
+    resp._content = body
+    resp.encoding = None
+    return resp.text
+
+
+def _targets(pages: list[str], raw: list[bytes]) -> dict[str, Callable[[], None]]:
+    parsed = [parse_page(h) for h in pages]
+    writer = NullWriter()
+
+    def each(fn: Callable) -> Callable[[], None]:
+        return lambda: [fn(p) for p in parsed]
+
+    per_backend = {
+        f"parse:{name}": (lambda name=name: [parse_page(h, name) for h in pages])
+        for name in available_backends()
+    }
+    return {
+        "parse_page": lambda: [parse_page(h) for h in pages],
+        **per_backend,
+        "build_criteres": each(lambda p: build_criteres(p, PAYLOAD, "id")),
+        "build_informations": each(lambda p: build_informations(p, "id")),
+        "build_conformite": each(lambda p: build_conformite(p, "id")),
+        "build_resultats": each(lambda p: build_resultats(p, "id")),
+        "ingest": lambda: [ingest_html(h, PAYLOAD, writer) for h in pages],
+        "decode:requests": lambda: [_requests_text(b) for b in raw],
+        "decode:pinned": lambda: [decode_html(b) for b in raw],
+        "parse_bytes": lambda: [parse_page(b) for b in raw],
+    }
+
+
+def measure(targets: dict[str, Callable[[], None]], n_pages: int, min_time: float) -> dict:
+    """
+    pages/second of each target's fastest run, then peak memory of one run.
+    Targets are timed round-robin (one run each per round, GC off as in timeit)
+    for about `min_time` seconds per target: a machine slowing down mid-bench
+    slows every target alike, so ratios to REFERENCE_TARGET hold.
+    """
+    for fn in targets.values():
+        fn()  # warm-up (imports, regex caches)
+    best = dict.fromkeys(targets, float("inf"))
+    rounds, t0, budget = 0, time.perf_counter(), min_time * len(targets)
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while rounds < MIN_RUNS or time.perf_counter() - t0 < budget:
+            for name, fn in targets.items():
+                t = time.perf_counter()
+                fn()
+                best[name] = min(best[name], time.perf_counter() - t)
+            rounds += 1
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    results = {}
+    for name, fn in targets.items():
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[name] = {
+            "pages_per_s": n_pages / best[name],
+            "run_ms": best[name] * 1000,
+            "peak_kb": peak / 1024,
+        }
+    return results
+
+
+def run_cases(cases: dict[str, list[bytes]], min_time: float) -> dict[str, dict[str, dict]]:
+    """`cases` hold the pages as served (bytes); str targets get them decoded once.
+
+    Each result also gets `relative`: its speed over REFERENCE_TARGET's in the same case.
+    """
+    results: dict[str, dict[str, dict]] = {}
+    for case, raw in cases.items():
+        pages = [decode_html(b) for b in raw]
+        targets = measure(_targets(pages, raw), len(pages), min_time)
+        ref = targets[REFERENCE_TARGET]["pages_per_s"]
+        for r in targets.values():
+            r["relative"] = r["pages_per_s"] / ref
+        results[case] = targets
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return one line per regression against `baseline`.
+
+    Speed compares `relative` (x REFERENCE_TARGET), never absolute pages/s, and skips
+    the reference itself and targets under GATE_MIN_RUN_MS per run.
+    """
+    regressions = []
+    for case, targets in results.items():
+        for name, r in targets.items():
+            b = baseline.get(case, {}).get(name)
+            if not b:
+                continue
+            timed = name != REFERENCE_TARGET and r["run_ms"] >= GATE_MIN_RUN_MS
+            if timed and "relative" in b and r["relative"] < b["relative"] * (1 - tolerance):
+                regressions.append(
+                    f"{case}/{name}: {r['relative']:.3f}x {REFERENCE_TARGET} "
+                    f"< baseline {b['relative']:.3f}x"
+                )
+            if r["peak_kb"] > max(b["peak_kb"] * (1 + tolerance), b["peak_kb"] + MEM_FLOOR_KB):
+                regressions.append(
+                    f"{case}/{name}: peak {r['peak_kb']:.0f} KB > baseline {b['peak_kb']:.0f} KB"
+                )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark hydro.parsing and hydro.tables")
+    parser.add_argument("--corpus", nargs="*", default=[], help="Recorded pages (files/dirs)")
+    parser.add_argument(
+        "--cases",
+        type=str,
+        default=",".join(SYNTHETIC_CASES),
+        help="Synthetic cases to run (comma separated; empty = none)",
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds of timing per target")
+    parser.add_argument("--baseline", type=str, default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=0.4, help="Allowed relative drift")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--json", type=str, default="", help="Also write results to this file")
+    args = parser.parse_args(argv)
+    if args.min_time < MIN_SAMPLE_S:
+        parser.error(f"--min-time must be at least {MIN_SAMPLE_S}s")
+
+    cases: dict[str, list[bytes]] = {}
+    for name in filter(None, args.cases.split(",")):
+        # served as legacy 8-bit bytes (declared in <meta>), as OROBNAT-like servers do
+        cases[name] = [synthetic_page(SYNTHETIC_CASES[name]).encode(SYNTHETIC_ENCODING)]
+    files = iter_html_files(args.corpus) if args.corpus else []
+    if files:
+        cases["corpus"] = [f.read_bytes() for f in files]
+
+    results = run_cases(cases, args.min_time)
+    print(f"{'case':<8} {'target':<20} {'pages/s':>10} {'relative':>9} {'peak KB':>10}")
+    for case, targets in results.items():
+        for name, r in targets.items():
+            print(
+                f"{case:<8} {name:<20} {r['pages_per_s']:>10.1f} "
+                f"{r['relative']:>9.3f} {r['peak_kb']:>10.0f}"
+            )
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        results.pop("corpus", None)  # recorded corpora differ between machines
+        meta = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "parser": HTML_PARSER,
+        }
+        baseline_path.write_text(
+            json.dumps({"_meta": meta, **results}, indent=2) + "\n", encoding="utf-8"
+        )
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --update-baseline", file=sys.stderr)
+        return 0
+
+    baseline = json.loads(baseline_path.read_text("utf-8"))
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"[REGRESSION] {line}")
+    print(f"Regressions: {len(regressions)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
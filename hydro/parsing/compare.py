@@ -0,0 +1,86 @@
+# hydro/parsing/compare.py
+"""
+Equivalence check between parser backends on a corpus of saved pages.
+
+Usage:
+    python -m hydro.parsing.compare pages/*.html
+    python -m hydro.parsing.compare saved_pages/          # every *.html inside
+
+Every page is parsed with each available backend; any difference in the
+resulting ParsedPage (sections, result rows, communes, selects) is reported
+and the exit code is 1. The "stream" backend stops after the sections the
+ETL reads, so only those sections are compared for it.
+"""
+
+import argparse
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from .backends import BACKENDS, available_backends
+from .stream import REQUIRED_SECTIONS
+
+
+def iter_html_files(paths: list[str]) -> list[Path]:
+    files: list[Path] = []
+    for p in map(Path, paths):
+        if p.is_dir():
+            files.extend(sorted(p.rglob("*.htm*")))
+        else:
+            files.append(p)
+    return files
+
+
+def required_only(page: dict) -> dict:
+    sections = page["sections"]
+    kept = {t: kv for t, kv in sections.items() if any(w in t for w in REQUIRED_SECTIONS)}
+    return {**page, "sections": kept}
+
+
+def diff_pages(a: dict, b: dict) -> list[str]:
+    diffs = []
+    for key in a:
+        if a[key] != b[key]:
+            diffs.append(key)
+    return diffs
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare HTML parser backends")
+    parser.add_argument("paths", nargs="+", help="HTML files or directories")
+    args = parser.parse_args(argv)
+
+    names = available_backends()
+    if len(names) < 2:
+        print(f"Only {names} available; install lxml to compare backends.", file=sys.stderr)
+
+    files = iter_html_files(args.paths)
+    timings = {n: 0.0 for n in names}
+    mismatches = 0
+    for f in files:
+        html = f.read_text(encoding="utf-8", errors="replace")
+        results = {}
+        for n in names:
+            t0 = time.perf_counter()
+            results[n] = asdict(BACKENDS[n](html))
+            timings[n] += time.perf_counter() - t0
+        ref = results[names[0]]
+        for n in names[1:]:
+            a, b = ref, results[n]
+            if n == "stream":
+                a, b = required_only(a), required_only(b)
+            diffs = diff_pages(a, b)
+            if diffs:
+                mismatches += 1
+                print(f"[DIFF] {f}: {names[0]} vs {n} differ on {', '.join(diffs)}")
+
+    print(f"Pages: {len(files)} | mismatches: {mismatches}")
+    for n in names:
+        per_page = timings[n] / len(files) * 1000 if files else 0.0
+        print(f" - {n}: {per_page:.2f} ms/page")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
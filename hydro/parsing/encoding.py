@@ -0,0 +1,70 @@
+# hydro/parsing/encoding.py
+"""
+Single-pass decoding of OROBNAT pages from raw bytes.
+
+requests' `resp.text` decodes again on every access and, without a charset
+in the Content-Type, either assumes ISO-8859-1 (text/*; wrong for UTF-8
+pages) or runs charset detection over the whole body. Here the encoding is
+chosen once, cheaply, in this order:
+1. charset of the Content-Type header
+2. OROBNAT_ENCODING (config) when pinned
+3. BOM or <meta charset> in the first few KB of the page
+4. UTF-8, falling back to cp1252 if the body is not valid UTF-8
+and the body is decoded exactly once.
+"""
+
+import codecs
+import re
+
+from ..settings import OROBNAT_ENCODING
+
+SNIFF_BYTES = 4096
+FALLBACK_ENCODING = "cp1252"
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9._:-]+)""", re.I)
+_CT_CHARSET = re.compile(r"""charset\s*=\s*["']?([A-Za-z0-9._:-]+)""", re.I)
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _known(name: str | None) -> str | None:
+    if not name:
+        return None
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def charset_from_content_type(content_type: str | None) -> str | None:
+    """Explicit charset of a Content-Type header (requests' ISO-8859-1 default is ignored)."""
+    m = _CT_CHARSET.search(content_type or "")
+    return _known(m.group(1)) if m else None
+
+
+def sniff_charset(body: bytes) -> str | None:
+    """BOM or <meta charset=...> / <meta http-equiv ... charset=...> near the top."""
+    for bom, name in _BOMS:
+        if body.startswith(bom):
+            return name
+    m = _META_CHARSET.search(body, 0, SNIFF_BYTES)
+    return _known(m.group(1).decode("ascii")) if m else None
+
+
+def page_encoding(body: bytes, header_charset: str | None = None) -> str | None:
+    """The declared/pinned/sniffed encoding, or None when the page does not say."""
+    return header_charset or _known(OROBNAT_ENCODING) or sniff_charset(body)
+
+
+def decode_html(body: bytes, header_charset: str | None = None) -> str:
+    """Decode `body` once; undeclared pages are tried as UTF-8, then cp1252."""
+    enc = page_encoding(body, header_charset)
+    if enc:
+        return body.decode(enc, errors="replace")
+    try:
+        return body.decode("utf-8")
+    except UnicodeDecodeError:
+        return body.decode(FALLBACK_ENCODING, errors="replace")
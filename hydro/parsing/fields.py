@@ -0,0 +1,93 @@
+# hydro/parsing/fields.py
+"""
+Declarative column -> label resolution for the section tables.
+
+Each table declares once which page labels feed which column:
+
+    INFO_FIELDS = FieldMap({"installation": "installation", "maitre_ouvrage": "maître"})
+
+Labels and patterns are normalized the same way (case, accents, "_" and
+extra spaces are ignored), so "Maître"/"maitre"/"MAITRE" need one pattern.
+A column takes the first label (in page order) containing its first
+pattern, else its second pattern, and so on; with exact=True a label must
+equal the pattern.
+
+OROBNAT pages share a handful of templates, so the column -> label index is
+computed once per distinct set of labels and then reused: resolving a
+section is one dict lookup per column.
+"""
+
+import re
+import threading
+import unicodedata
+
+MAX_INDEXES = 256  # distinct label sets kept; pages use only a few templates
+
+
+def normalize_label(s: str) -> str:
+    """Casefold, drop accents, treat "_" as a space and collapse whitespace."""
+    t = unicodedata.normalize("NFKD", s.casefold())
+    t = "".join(c for c in t if not unicodedata.combining(c))
+    return re.sub(r"[\s_]+", " ", t).strip()
+
+
+class FieldMap:
+    def __init__(self, columns: dict[str, str | tuple[str, ...]], *, exact: bool = False):
+        self.columns = {
+            col: tuple(normalize_label(p) for p in ((pats,) if isinstance(pats, str) else pats))
+            for col, pats in columns.items()
+        }
+        self.exact = exact
+        self._indexes: dict[tuple[str, ...], dict[str, str | None]] = {}
+        self._lock = threading.Lock()
+
+    def _matches(self, pattern: str, label: str) -> bool:
+        return label == pattern if self.exact else pattern in label
+
+    def _build_index(self, labels: tuple[str, ...]) -> dict[str, str | None]:
+        normalized = [(normalize_label(lb), lb) for lb in labels]
+        index: dict[str, str | None] = {}
+        for col, patterns in self.columns.items():
+            index[col] = next(
+                (lb for p in patterns for norm, lb in normalized if self._matches(p, norm)),
+                None,
+            )
+        return index
+
+    def index(self, labels: tuple[str, ...]) -> dict[str, str | None]:
+        """column -> source label for this set of labels (cached)."""
+        idx = self._indexes.get(labels)
+        if idx is None:
+            idx = self._build_index(labels)
+            with self._lock:
+                if len(self._indexes) >= MAX_INDEXES:
+                    self._indexes.clear()
+                self._indexes[labels] = idx
+        return idx
+
+    def extract(self, kv: dict[str, str]) -> dict[str, str | None]:
+        """{column: value} for one section (None when no label matches)."""
+        return {
+            col: (kv[label] if label is not None else None)
+            for col, label in self.index(tuple(kv)).items()
+        }
+
+    def extract_rows(
+        self, rows: list[dict[str, str]], missing: str | None = None, **const: str
+    ) -> list[dict[str, str | None]]:
+        """
+        extract() for many rows, each prefixed with the `const` columns; rows
+        sharing the same keys share one index lookup.
+        """
+        out = []
+        last_keys: tuple[str, ...] | None = None
+        idx: dict[str, str | None] = {}
+        for r in rows:
+            keys = tuple(r)
+            if keys != last_keys:
+                idx, last_keys = self.index(keys), keys
+            row = dict(const)
+            for col, lb in idx.items():
+                row[col] = r[lb] if lb is not None else missing
+            out.append(row)
+        return out
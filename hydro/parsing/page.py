@@ -0,0 +1,31 @@
+# hydro/parsing/page.py
+"""
+Parse an OROBNAT results page once and index every section we use.
+
+A ParsedPage (hydro.parsing.parsed) is built from a single DOM walk and
+shared by the four table builders. It keeps:
+- key/value tables under each <h3> ("Informations générales", "Conformité", ...)
+- the "Résultats d'analyses" rows
+- the communes block (CSV)
+- the <select> options (departement / communeDepartement)
+"""
+
+from .backends import get_backend
+from .parsed import ParsedPage  # re-exported: the builders import it from here
+
+
+def parse_page(html: str | bytes, backend: str | None = None) -> ParsedPage:
+    """
+    Build the DOM once and extract every section in a single walk.
+    `html` may be the raw response bytes: they are decoded once (or, with
+    lxml, handed to libxml2 with the page encoding).
+    `backend` overrides the configured parser (see hydro.parsing.backends).
+    """
+    return get_backend(backend)(html)
+
+
+def as_page(html_or_page: "str | bytes | ParsedPage") -> ParsedPage:
+    """Accept either raw HTML or an already parsed page."""
+    if isinstance(html_or_page, ParsedPage):
+        return html_or_page
+    return parse_page(html_or_page)
@@ -0,0 +1,57 @@
+# hydro/parsing/parsed.py
+"""
+ParsedPage: everything the table builders read from one OROBNAT results page.
+
+Kept apart from page.py so the backends that build it do not import the
+parse_page() entry point that dispatches to them.
+"""
+
+from dataclasses import dataclass, field
+
+from .sections import INFO_TITLE
+
+SelectOption = tuple[str, str, bool]  # (value, text, selected)
+
+
+@dataclass
+class ParsedPage:
+    sections: dict[str, dict[str, str]] = field(default_factory=dict)
+    results_rows: list[dict] = field(default_factory=list)
+    communes_csv: str = ""
+    selects: dict[str, list[SelectOption]] = field(default_factory=dict)
+
+    def section(self, title: str) -> dict[str, str]:
+        """Return the key/value table of the first <h3> whose text contains `title`."""
+        for h3_text, kv in self.sections.items():
+            if title in h3_text:
+                return kv
+        return {}
+
+    def option_text(
+        self, name: str, value: str | None = None, *, first: bool = False
+    ) -> str | None:
+        """
+        Text of the option matching `value` in select `name`, else the selected
+        option, else (if `first`) the first option.
+        """
+        options = self.selects.get(name) or []
+        for v, text, _ in options:
+            if value is not None and v == value:
+                return text
+        for _, text, selected in options:
+            if selected:
+                return text
+        if first and options:
+            return options[0][1]
+        return None
+
+    def department_and_commune(self, payload: dict) -> tuple[str | None, str | None]:
+        """Same result as sections.parse_department_and_commune, without a DOM walk."""
+        dep = self.option_text("departement", payload.get("departement"), first=True)
+        com = self.option_text("communeDepartement", payload.get("communeDepartement"))
+        if not com:
+            for k, v in self.section(INFO_TITLE).items():
+                if "commune" in k.lower():
+                    com = v
+                    break
+        return dep or None, com or None
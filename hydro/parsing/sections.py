@@ -1,6 +1,18 @@
 from bs4 import BeautifulSoup
 
-from .mappers import normalize_headers
+from .mappers import communes_text_to_csv, normalize_headers
+
+INFO_TITLE = "Informations générales"
+CONF_TITLE = "Conformité"
+RESULTS_TITLE = "Résultats d'analyses"
+COMMUNES_LABEL = "Commune(s) et/ou quartier(s) du réseau"
+
+
+def _find_h3(soup: BeautifulSoup, title: str):
+    for h3 in soup.find_all("h3"):
+        if title in (h3.get_text() or ""):
+            return h3
+    return None
 
 
 def parse_department_and_commune(
@@ -27,28 +39,15 @@ def parse_department_and_commune(
             com = opt.get_text(strip=True)
 
     if not com:
-        h3 = soup.find(
-            lambda t: t.name == "h3" and "Informations générales" in (t.get_text() or "")
-        )
-        if h3:
-            table = h3.find_next("table")
-            if table:
-                for tr in table.find_all("tr"):
-                    th, td = tr.find("th"), tr.find("td")
-                    if th and td and "commune" in " ".join(th.stripped_strings).lower():
-                        com = td.get_text(" ", strip=True)
-                        break
+        for k, v in parse_section_kv(soup, INFO_TITLE).items():
+            if "commune" in k.lower():
+                com = v
+                break
     return dep, com
 
 
-def parse_section_kv(soup: BeautifulSoup, title: str) -> dict[str, str]:
+def kv_from_table(table) -> dict[str, str]:
     out: dict[str, str] = {}
-    h3 = soup.find(lambda t: t.name == "h3" and title in (t.get_text() or ""))
-    if not h3:
-        return out
-    table = h3.find_next("table")
-    if not table:
-        return out
     for tr in table.find_all("tr"):
         th, td = tr.find("th"), tr.find("td")
         if th and td:
@@ -56,15 +55,18 @@ def parse_section_kv(soup: BeautifulSoup, title: str) -> dict[str, str]:
     return out
 
 
-def parse_results_rows(soup: BeautifulSoup) -> list[dict]:
-    rows: list[dict] = []
-    h3 = soup.find(lambda t: t.name == "h3" and "Résultats d'analyses" in (t.get_text() or ""))
+def parse_section_kv(soup: BeautifulSoup, title: str) -> dict[str, str]:
+    h3 = _find_h3(soup, title)
     if not h3:
-        return rows
+        return {}
     table = h3.find_next("table")
     if not table:
-        return rows
+        return {}
+    return kv_from_table(table)
 
+
+def results_rows_from_table(table) -> list[dict]:
+    rows: list[dict] = []
     header_tr = table.find("tr")
     headers = [th.get_text(" ", strip=True) for th in header_tr.find_all("th")] if header_tr else []
     headers = normalize_headers(headers)
@@ -74,32 +76,42 @@ def parse_results_rows(soup: BeautifulSoup) -> list[dict]:
         if not tds:
             continue
         vals = [td.get_text(" ", strip=True) for td in tds]
-        row = {}
-        if headers and len(vals) == len(headers):
-            for k, v in zip(headers, vals, strict=False):
-                row[k] = v
-        else:
-            row = {
-                "parametre": vals[0] if len(vals) > 0 else "",
-                "valeur": vals[1] if len(vals) > 1 else "",
-                "limite_qualite": vals[2] if len(vals) > 2 else "",
-                "reference_qualite": vals[3] if len(vals) > 3 else "",
-            }
-        rows.append(row)
+        rows.append(results_row(headers, vals))
     return rows
 
 
-def extract_communes_block_csv(soup: BeautifulSoup) -> str:
-    from .mappers import communes_text_to_csv
+def results_row(headers: list[str], vals: list[str]) -> dict:
+    if headers and len(vals) == len(headers):
+        return dict(zip(headers, vals, strict=False))
+    return {
+        "parametre": vals[0] if len(vals) > 0 else "",
+        "valeur": vals[1] if len(vals) > 1 else "",
+        "limite_qualite": vals[2] if len(vals) > 2 else "",
+        "reference_qualite": vals[3] if len(vals) > 3 else "",
+    }
 
-    label = soup.find(
-        "label", string=lambda x: bool(x) and "Commune(s) et/ou quartier(s) du réseau" in x
-    )
-    if not label:
-        return ""
+
+def parse_results_rows(soup: BeautifulSoup) -> list[dict]:
+    h3 = _find_h3(soup, RESULTS_TITLE)
+    if not h3:
+        return []
+    table = h3.find_next("table")
+    if not table:
+        return []
+    return results_rows_from_table(table)
+
+
+def communes_from_label(label) -> str:
     span = label.find_next("span")
     if not span:
         return ""
     # reconstruir texto con <br>
     text = "\n".join(s.strip() for s in span.stripped_strings)
     return communes_text_to_csv(text)
+
+
+def extract_communes_block_csv(soup: BeautifulSoup) -> str:
+    label = soup.find("label", string=lambda x: bool(x) and COMMUNES_LABEL in x)
+    if not label:
+        return ""
+    return communes_from_label(label)
@@ -0,0 +1,254 @@
+# hydro/parsing/stream.py
+"""
+Streaming (SAX-style) extractor for the few regions of an OROBNAT page we use.
+
+No DOM is built: a stdlib html.parser.HTMLParser walks the markup once and
+keeps only
+- the key/value table following each <h3> (first occurrence of each title)
+- the rows of the "Résultats d'analyses" table
+- the span following the communes <label>
+- the <select> options (the search form sits at the top of the page)
+
+Parsing stops as soon as every requested section and the communes block are
+complete, so memory is bound to those regions and the rest of the page is
+never tokenized. Input can be a string, raw bytes (decoded once, see
+encoding.py) or an iterable of str chunks (e.g. a file read 64 KB at a time).
+
+The result is the same ParsedPage as the bs4/lxml backends, except that
+sections after the stop point are absent (ParsedPage.section() only looks
+up the requested ones). Known simplification: tables nested inside a
+captured table are flattened into it.
+"""
+
+from collections.abc import Iterable
+from html.parser import HTMLParser
+
+from .encoding import decode_html
+from .mappers import communes_text_to_csv, normalize_headers
+from .parsed import ParsedPage
+from .sections import COMMUNES_LABEL, CONF_TITLE, INFO_TITLE, RESULTS_TITLE, results_row
+
+REQUIRED_SECTIONS = (INFO_TITLE, CONF_TITLE, RESULTS_TITLE)
+CHUNK_SIZE = 64 * 1024
+
+_SKIP = {"script", "style"}
+
+# One captured table row: [(cell tag, stripped strings)]
+Row = list[tuple[str, list[str]]]
+
+
+class _Stop(Exception):
+    pass
+
+
+class SectionExtractor(HTMLParser):
+    def __init__(self, sections: Iterable[str] = REQUIRED_SECTIONS, communes: bool = True):
+        super().__init__(convert_charrefs=True)
+        self.page = ParsedPage()
+        self.wanted = list(sections)
+        self.want_communes = communes
+        self.communes_done = not communes
+        self._skip = 0  # inside <script>/<style>
+
+        # <h3> titles being read / waiting for their table; a slot is a
+        # one-item list so a table opened inside the <h3> still gets its title
+        self._h3_depth = 0
+        self._h3_text: list[str] = []
+        self._h3_slot: list[str] = [""]
+        self._pending: list[list[str]] = []
+        self.stopped = False
+
+        # captured table
+        self._table_depth = 0
+        self._table_titles: list[list[str]] = []
+        self._rows: list[Row] = []
+        self._cells: list[tuple[str, list[str]]] = []  # open cells (nested = flattened)
+
+        # communes block
+        self._label_depth = 0
+        self._label_text: list[str] = []
+        self._label_children = 0
+        self._span_wanted = False
+        self._span_depth = 0
+        self._span_strings: list[str] = []
+
+        # selects
+        self._select: str | None = None
+        self._option: tuple[str, bool] | None = None
+        self._option_text: list[str] = []
+
+    # ---- tags ----
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag in _SKIP:
+            self._skip += 1
+            return
+        if self._label_depth:
+            self._label_children += 1
+
+        if tag == "h3":
+            if self._h3_depth == 0:
+                self._h3_text, self._h3_slot = [], [""]
+                self._pending.append(self._h3_slot)  # find_next("table") includes descendants
+            self._h3_depth += 1
+        elif tag == "table":
+            if self._table_depth:
+                self._table_depth += 1
+            elif self._pending:
+                self._table_titles, self._pending = self._pending, []
+                self._table_depth, self._rows = 1, []
+        elif self._table_depth and tag == "tr":
+            self._cells = []
+            self._rows.append([])
+        elif self._table_depth and tag in ("td", "th"):
+            if not self._rows:
+                self._rows.append([])
+            cell: tuple[str, list[str]] = (tag, [])
+            self._rows[-1].append(cell)
+            self._cells.append(cell)
+        elif tag == "label" and self.want_communes and not self.page.communes_csv:
+            if self._label_depth == 0:
+                self._label_text, self._label_children = [], 0
+            self._label_depth += 1
+        elif tag == "span" and (self._span_wanted or self._span_depth):
+            self._span_wanted = False
+            self._span_depth += 1
+        elif tag == "select":
+            name = dict(attrs).get("name")
+            self._select = name if name and name not in self.page.selects else None
+            if self._select:
+                self.page.selects[self._select] = []
+        elif tag == "option" and self._select:
+            self._close_option()
+            a = dict(attrs)
+            self._option = (a.get("value") or "", "selected" in a)
+            self._option_text = []
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _SKIP:
+            self._skip = max(0, self._skip - 1)
+            return
+        if tag == "h3" and self._h3_depth:
+            self._h3_depth -= 1
+            if self._h3_depth == 0:
+                self._h3_slot[0] = "".join(self._h3_text)
+        elif tag == "table" and self._table_depth:
+            self._table_depth -= 1
+            if self._table_depth == 0:
+                self._finish_table()
+        elif self._table_depth and tag in ("td", "th") and self._cells:
+            self._cells.pop()
+        elif tag == "label" and self._label_depth:
+            self._label_depth -= 1
+            if self._label_depth == 0:
+                text = "".join(self._label_text)
+                if self._label_children == 0 and COMMUNES_LABEL in text:
+                    self._span_wanted = True
+        elif tag == "span" and self._span_depth:
+            self._span_depth -= 1
+            if self._span_depth == 0:
+                self.page.communes_csv = communes_text_to_csv("\n".join(self._span_strings))
+                self.communes_done = True
+                self._check_done()
+        elif tag == "option":
+            self._close_option()
+        elif tag == "select":
+            self._close_option()
+            self._select = None
+
+    def handle_data(self, data: str) -> None:
+        if self._skip:
+            return
+        if self._h3_depth:
+            self._h3_text.append(data)
+        s = data.strip()
+        if self._label_depth:
+            self._label_text.append(data)
+        if not s:
+            return
+        for _, strings in self._cells:
+            strings.append(s)
+        if self._span_depth:
+            self._span_strings.append(s)
+        if self._option is not None:
+            self._option_text.append(s)
+
+    # ---- helpers ----
+
+    def _close_option(self) -> None:
+        if self._option is not None and self._select:
+            value, selected = self._option
+            self.page.selects[self._select].append((value, "".join(self._option_text), selected))
+        self._option = None
+
+    def _finish_table(self) -> None:
+        kv = _kv_from_rows(self._rows)
+        for (title,) in self._table_titles:
+            if title in self.page.sections:
+                continue
+            if RESULTS_TITLE in title and not self.page.results_rows:
+                self.page.results_rows = _results_from_rows(self._rows)
+            self.page.sections[title] = kv
+        self._table_titles, self._rows, self._cells = [], [], []
+        self._check_done()
+
+    def _check_done(self) -> None:
+        if not self.communes_done:
+            return
+        titles = list(self.page.sections)
+        if all(any(w in t for t in titles) for w in self.wanted):
+            self.stopped = True
+            raise _Stop
+
+    def finish(self) -> ParsedPage:
+        """End of input: <h3> titles that never got a table have an empty section."""
+        if not self.stopped:
+            for (title,) in self._pending + self._table_titles:
+                self.page.sections.setdefault(title, {})
+            self._close_option()
+        return self.page
+
+
+def _kv_from_rows(rows: list[Row]) -> dict[str, str]:
+    out: dict[str, str] = {}
+    for row in rows:
+        th = next((strings for tag, strings in row if tag == "th"), None)
+        td = next((strings for tag, strings in row if tag == "td"), None)
+        if th is not None and td is not None:
+            out[" ".join(th).strip()] = " ".join(td)
+    return out
+
+
+def _results_from_rows(rows: list[Row]) -> list[dict]:
+    if not rows:
+        return []
+    headers = normalize_headers([" ".join(s) for tag, s in rows[0] if tag == "th"])
+    out = []
+    for row in rows[1:]:
+        vals = [" ".join(s) for tag, s in row if tag == "td"]
+        if vals:
+            out.append(results_row(headers, vals))
+    return out
+
+
+def parse_stream(
+    html: str | bytes | Iterable[str],
+    sections: Iterable[str] = REQUIRED_SECTIONS,
+    communes: bool = True,
+) -> ParsedPage:
+    """Extract `sections` (and the communes block) from `html`, stopping once all are found."""
+    chunks: Iterable[str]
+    if isinstance(html, bytes):
+        html = decode_html(html)
+    if isinstance(html, str):
+        chunks = (html[i : i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+    else:
+        chunks = html
+    ex = SectionExtractor(sections, communes)
+    try:
+        for chunk in chunks:
+            ex.feed(chunk)
+        ex.close()
+    except _Stop:
+        pass
+    return ex.finish()
@@ -0,0 +1,110 @@
+# hydro/parsing/values.py
+"""
+Typed reading of analysis cells ("<0,05 mg/L", "≤50 mg/L", "≥6,5 et ≤9 unité pH").
+
+parse_value() splits one cell into:
+- op:   "<", "<=", ">", ">=", "=" or None (no number)
+- num:  the value as float (French decimal comma, thousands spaces)
+- max:  upper bound of a range ("≥200 et ≤1100 µS/cm"), else None
+- unit: what follows the number ("mg/L", "µg/L", "n/(100mL)", "unité pH")
+- flag: "below_detection", "range", "absent", "present", "trace", "text" or None
+
+The same strings repeat across thousands of rows (limits, units, "<0,05"),
+so parsing is memoized and parse_values() handles a whole column at once.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple
+
+VALUE_FIELDS = ("valeur", "limite_qualite", "reference_qualite")
+
+# A space-separated group of 3 digits is a thousands group only when nothing but a
+# space, the end or a decimal part follows: in "12 100mL" the "100" starts the unit
+_NUM = r"[-+]?\d+(?:[ \u00a0\u202f]\d{3}(?![^\s.,]))*(?:[.,]\d+)?(?:[eE][-+]?\d+)?"
+_OP = r"<=|>=|≤|≥|<|>|="
+_UNIT_WORDS = r"[^\s\d<>≤≥=]+(?: [^\s\d<>≤≥=]+)*?"  # "mg/L", "unité pH" (no number)
+_SINGLE = re.compile(rf"^(?P<op>{_OP})?\s*(?P<num>{_NUM})\s*(?P<unit>.*)$")
+_RANGE = re.compile(
+    rf"^(?:>=|≥|>)?\s*(?P<lo>{_NUM})(?:\s+(?P<lo_unit>{_UNIT_WORDS}))?\s*(?:et|-|à)\s*"
+    rf"(?:<=|≤|<)?\s*(?P<hi>{_NUM})\s*(?P<unit>.*)$"
+)
+_DETECTION = re.compile(r"\b(?:ld|lq|seuil de d[ée]tection|inf[ée]rieur au seuil)\b")
+_ABSENT = re.compile(r"\b(?:absence|absent|non d[ée]tect[ée]e?s?|n\.?d\.?)\b")
+_PRESENT = re.compile(r"\bpr[ée]sence\b")
+_TRACE = re.compile(r"\btraces?\b")
+# flags of cells without a number, first match wins
+_TEXT_FLAGS = (
+    (_DETECTION, "below_detection"),
+    (_ABSENT, "absent"),
+    (_PRESENT, "present"),
+    (_TRACE, "trace"),
+)
+
+_OPS = {"≤": "<=", "≥": ">=", "<=": "<=", ">=": ">=", "<": "<", ">": ">", "=": "="}
+
+
+class Value(NamedTuple):
+    op: str | None = None
+    num: float | None = None
+    max: float | None = None
+    unit: str | None = None
+    flag: str | None = None
+
+
+def _to_float(s: str) -> float:
+    return float(re.sub(r"[ \u00a0\u202f]", "", s).replace(",", "."))
+
+
+def _normalize(text: str) -> str:
+    t = unicodedata.normalize("NFC", text).replace("μ", "µ").replace("−", "-")
+    return re.sub(r"\s+", " ", t).strip()
+
+
+@lru_cache(maxsize=4096)
+def parse_value(text: str | None) -> Value:
+    """Split one cell into (op, num, max, unit, flag); empty cells give Value()."""
+    if not text or not text.strip():
+        return Value()
+    t = _normalize(text)
+    low = t.lower()
+
+    m = _RANGE.match(t)
+    if m:
+        unit = m["unit"].strip() or m["lo_unit"] or None
+        return Value(">=", _to_float(m["lo"]), _to_float(m["hi"]), unit, "range")
+
+    m = _SINGLE.match(t)
+    if m:
+        op = _OPS.get(m["op"] or "=", "=")
+        unit = m["unit"].strip() or None
+        flag = "below_detection" if _DETECTION.search(low) else None
+        return Value(op, _to_float(m["num"]), None, unit, flag)
+
+    for pattern, flag in _TEXT_FLAGS:
+        if pattern.search(low):
+            return Value(flag=flag)
+    return Value(flag="text")
+
+
+def parse_values(texts: list[str | None]) -> list[Value]:
+    """parse_value over a column; repeated strings are parsed once."""
+    return [parse_value(t) for t in texts]
+
+
+def typed_columns(field: str, v: Value, *, measured: bool = False) -> dict:
+    """
+    Columns stored next to the raw `field` text. For a measured value (valeur),
+    a "<x" result is a censored one: below the lab's detection/quantification limit.
+    """
+    flag = v.flag
+    if measured and flag is None and v.op in ("<", "<="):
+        flag = "below_detection"
+    return {
+        f"{field}_op": v.op,
+        f"{field}_num": v.num,
+        f"{field}_max": v.max,
+        f"{field}_unit": v.unit,
+        f"{field}_flag": flag,
+    }
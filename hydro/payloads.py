@@ -5,7 +5,7 @@ from .settings import DEFAULT_SEARCH
 # from db.supabase_utils import fetch_cities
 
 
-def build_search_payload(city: dict[str, Any]) -> dict[str, str]:
+def build_search_payload(city: dict[str, Any], position: int = 0) -> dict[str, str]:
 
     # city = fetch_cities()[0] if city is None else city
     """
@@ -13,15 +13,17 @@ def build_search_payload(city: dict[str, Any]) -> dict[str, str]:
     Expected 'city' keys:
       - water_code: e.g. "095000386_095"
       - commune_code: e.g. "95176" == Cormeilles-en-Parisis
+      - region (optional): OROBNAT idRegion, e.g. "11" == Île-de-France
+    `position` is posPLV: 0 = latest sample, 1 = the one before, ...
     """
     water_code = (city.get("water_code") or "").strip()
     departement = water_code[:3] if len(water_code) >= 3 else ""
 
     payload = {
         "methode": "rechercher",
-        "idRegion": DEFAULT_SEARCH["idRegion"],
+        "idRegion": city_region(city),
         "usd": DEFAULT_SEARCH["usd"],
-        "posPLV": DEFAULT_SEARCH["posPLV"],
+        "posPLV": str(position) if position else DEFAULT_SEARCH["posPLV"],
         "departement": departement,
         "communeDepartement": (city.get("commune_code") or "").strip(),
         "reseau": water_code,
@@ -30,3 +32,13 @@ def build_search_payload(city: dict[str, Any]) -> dict[str, str]:
 
 
 # print(build_search_payload(None))  # for quick manual testing
+
+
+def city_region(city: dict[str, Any]) -> str:
+    """OROBNAT idRegion of a city row (DEFAULT_SEARCH's when the row has none)."""
+    return str(city.get("region") or "").strip() or DEFAULT_SEARCH["idRegion"]
+
+
+def city_key(city: dict[str, Any]) -> str:
+    """Stable identity of a city row for journals and sharding: '<commune_code>|<water_code>'."""
+    return f"{(city.get('commune_code') or '').strip()}|{(city.get('water_code') or '').strip()}"
@@ -0,0 +1,241 @@
+# hydro/pipeline.py
+"""
+Staged ETL: fetch -> parse -> write, joined by bounded queues.
+
+- fetch:  N threads (I/O bound) share the SessionPool; cache + fingerprint
+          checks happen here so unchanged pages never reach the parsers
+- parse:  a process pool, so BeautifulSoup/lxml work does not fight for the GIL
+- write:  one thread feeding the BulkWriter (multi-row upserts; the writer
+          batches across pages, so more threads would only contend on its flush)
+
+Every queue is bounded: a slow stage blocks the one before it, so memory
+stays flat whatever the number of cities. A failing item is reported as a
+failed city and its stage keeps draining; end-of-stream markers are always
+sent, so one bad page or callback can never leave the other stages blocked.
+Queue depths and per-stage throughput are logged every `report_every` seconds.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+
+from db.supabase_utils import BulkWriter
+
+from .etl_runner import EtlContext, parse_rows
+from .fingerprints import UNCHANGED
+from .http_client import SessionPool
+from .metrics import METRICS, measured
+from .payloads import build_search_payload
+from .retry import is_success
+
+log = logging.getLogger("hydromet")
+
+_DONE = object()  # end-of-stream marker, one per consumer
+
+# (index, city, page_id, error) — same shape as executor.run_batch
+Result = tuple[int, dict, str | None, Exception | None]
+
+
+@dataclass
+class StageCounters:
+    name: str
+    processed: int = 0
+    started: float = field(default_factory=time.monotonic)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def inc(self, n: int = 1) -> None:
+        with self._lock:
+            self.processed += n
+
+    def rate(self) -> float:
+        return self.processed / max(1e-9, time.monotonic() - self.started)
+
+
+class _Pipeline:
+    """Queues, counters and stage loops of one run_pipeline() call."""
+
+    def __init__(
+        self,
+        ctx: EtlContext,
+        fetchers: int,
+        parsers: int,
+        queue_size: int,
+        on_result: Callable[[Result], None] | None,
+    ):
+        self.ctx = ctx
+        self.own_pool = ctx.pool is None
+        self.own_writer = ctx.writer is None
+        self.pool = ctx.pool or SessionPool(limiter=ctx.limiter)
+        self.writer = ctx.writer or BulkWriter()
+        self.fetchers, self.parsers = max(1, fetchers), max(1, parsers)
+        self.todo: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.to_parse: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.to_write: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.counters = {n: StageCounters(n) for n in ("fetch", "parse", "write")}
+        self.stop = threading.Event()
+        self._on_result = on_result
+        self._report_lock = threading.Lock()
+
+    def report(self, i: int, city: dict, pid: str | None, err: Exception | None) -> None:
+        """Hand one outcome to on_result; never raises (stages must keep draining)."""
+        if not self._on_result:
+            return
+        try:
+            with self._report_lock:
+                self._on_result((i, city, pid, err))
+        except Exception as e:
+            log.error(f"[pipeline] recording city #{i} failed: {e}")
+
+    # ---- stage 0: feed cities (blocks when fetchers fall behind) ----
+    def feed(self, cities: Iterable[dict]) -> None:
+        try:
+            for item in enumerate(cities):
+                self.todo.put(item)
+        finally:
+            for _ in range(self.fetchers):
+                self.todo.put(_DONE)
+
+    # ---- stage 1: fetch ----
+    def fetch(self) -> None:
+        try:
+            while (item := self.todo.get()) is not _DONE:
+                i, city = item
+                try:
+                    self._fetch_one(i, city)
+                except Exception as e:
+                    self.report(i, city, None, e)
+        finally:
+            self.to_parse.put(_DONE)
+
+    def _fetch_one(self, i: int, city: dict) -> None:
+        ctx = self.ctx
+        payload = build_search_payload(city)
+        status, html = self.pool.post_search(payload)
+        if not is_success(status):
+            raise RuntimeError(f"POST failed: {status}")
+        self.counters["fetch"].inc()
+        if ctx.cache:
+            ctx.cache.put(payload, html)
+        fp = None
+        if ctx.fingerprints:
+            st, fp, stored_id = ctx.fingerprints.check(payload, html)
+            if st == UNCHANGED and stored_id:
+                self.report(i, city, stored_id, None)
+                return
+        self.to_parse.put((i, city, payload, fp, html))
+
+    # ---- stage 2: parse (process pool, at most 2 x parsers pages in flight) ----
+    def parse(self) -> None:
+        inflight: dict[Future, tuple] = {}
+        remaining = self.fetchers
+        try:
+            with ProcessPoolExecutor(max_workers=self.parsers) as ex:
+                while remaining:
+                    item = self.to_parse.get()
+                    if item is _DONE:
+                        remaining -= 1
+                        continue
+                    i, city, payload, fp, html = item
+                    try:
+                        fut = ex.submit(measured, parse_rows, html, payload)
+                    except Exception as e:  # e.g. BrokenProcessPool: keep draining the queue
+                        self.report(i, city, None, e)
+                        continue
+                    inflight[fut] = (i, city, payload, fp)
+                    self._drain(inflight, 2 * self.parsers - 1)
+                self._drain(inflight, 0)
+        finally:
+            self.to_write.put(_DONE)
+
+    def _drain(self, inflight: dict[Future, tuple], block_until: int) -> None:
+        while len(inflight) > block_until:
+            done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i, city, payload, fp = inflight.pop(fut)
+                try:
+                    rows, samples = fut.result()
+                except Exception as e:
+                    self.report(i, city, None, e)
+                    continue
+                METRICS.merge(samples)  # parse.page / build.* timed in the worker
+                self.counters["parse"].inc()
+                self.to_write.put(((i, city, payload, fp), rows))
+
+    # ---- stage 3: write (bulk upserts) ----
+    def write(self) -> None:
+        while (item := self.to_write.get()) is not _DONE:
+            (i, city, payload, fp), (page_id, crit, info, conf, res) = item
+            if not self.ctx.write:
+                self.counters["write"].inc()
+                self.report(i, city, page_id, None)
+                continue
+            done = self._written(i, city, payload, fp)
+            try:  # add_page may flush synchronously
+                self.writer.add_page(crit, info, conf, res, on_done=done)
+            except Exception as e:
+                self.report(i, city, None, e)
+
+    def _written(self, i: int, city: dict, payload: dict, fp) -> Callable[[str, str | None], None]:
+        def done(pid: str, error: str | None) -> None:
+            if error is None and fp and self.ctx.fingerprints:
+                try:
+                    self.ctx.fingerprints.commit(payload, fp, pid)
+                except Exception as e:  # the rows are written; only the skip is lost
+                    log.error(f"[pipeline] fingerprint of page {pid} not saved: {e}")
+            self.counters["write"].inc()
+            self.report(i, city, pid, RuntimeError(error) if error else None)
+
+        return done
+
+    def monitor(self, every: float) -> None:
+        while not self.stop.wait(every):
+            f, p, w = self.counters["fetch"], self.counters["parse"], self.counters["write"]
+            log.info(
+                f"[pipeline] queues todo={self.todo.qsize()} parse={self.to_parse.qsize()} "
+                f"write={self.to_write.qsize()} | fetch {f.processed} ({f.rate():.2f}/s) "
+                f"parse {p.processed} ({p.rate():.2f}/s) write {w.processed} ({w.rate():.2f}/s)"
+            )
+
+
+def run_pipeline(
+    cities: Iterable[dict],
+    ctx: EtlContext,
+    *,
+    fetchers: int = 4,
+    parsers: int = 2,
+    queue_size: int = 32,
+    report_every: float = 10.0,
+    on_result: Callable[[Result], None] | None = None,
+) -> dict[str, StageCounters]:
+    """Run every city through the three stages; return per-stage counters."""
+    pipe = _Pipeline(ctx, fetchers, parsers, queue_size, on_result)
+    threads = [threading.Thread(target=pipe.feed, args=(cities,), name="pipe-feed")]
+    threads += [
+        threading.Thread(target=pipe.fetch, name=f"pipe-fetch-{n}") for n in range(pipe.fetchers)
+    ]
+    threads += [
+        threading.Thread(target=pipe.parse, name="pipe-parse"),
+        threading.Thread(target=pipe.write, name="pipe-write"),
+    ]
+    mon = threading.Thread(
+        target=pipe.monitor, args=(report_every,), name="pipe-monitor", daemon=True
+    )
+    mon.start()
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if pipe.own_writer:
+            pipe.writer.close()  # flushes the rows still buffered and stops its timer
+        else:
+            pipe.writer.flush()  # rows still buffered below the size/time thresholds
+    finally:
+        pipe.stop.set()
+        if pipe.own_pool:
+            pipe.pool.close()
+    return pipe.counters
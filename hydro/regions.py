@@ -0,0 +1,121 @@
+# hydro/regions.py
+"""
+Multi-region batch runs.
+
+OROBNAT is split by idRegion and each region can answer at its own pace.
+Cities are grouped by region (payloads.city_region) and every region gets
+its own SessionPool (warmed on that region's menu), TokenBucket,
+CircuitBreaker, RequestStats and worker threads, all driven concurrently.
+A slow or failing region only uses up its own workers and only trips its
+own breaker.
+
+Worker counts and rate budgets can be set per region on the command line
+("11=4,24=2"); regions not listed use the global --workers / --rps.
+"""
+
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+from .etl_runner import EtlContext
+from .executor import BatchResult, run_batch
+from .payloads import city_region
+
+
+def parse_region_map(spec: str) -> dict[str, float]:
+    """'11=4,24=1.5' -> {'11': 4.0, '24': 1.5}."""
+    out: dict[str, float] = {}
+    for item in filter(None, (p.strip() for p in (spec or "").split(","))):
+        region, sep, value = item.partition("=")
+        if not sep or not region.strip():
+            raise ValueError(f"Bad region setting {item!r} (expected REGION=VALUE)")
+        out[region.strip()] = float(value)
+    return out
+
+
+def group_by_region(cities: list[dict]) -> dict[str, list[dict]]:
+    """{region: cities}, regions in order of first appearance."""
+    groups: dict[str, list[dict]] = {}
+    for c in cities:
+        groups.setdefault(city_region(c), []).append(c)
+    return groups
+
+
+@dataclass
+class RegionRun:
+    """One region's cities, collaborators and outcome counters."""
+
+    region: str
+    cities: list[dict]
+    ctx: EtlContext
+    workers: int = 1
+    pause: float = 0.0  # legacy --sleep between cities (sequential, unthrottled runs)
+    ok: int = 0
+    fail: int = 0
+    elapsed: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        stats = self.ctx.pool.stats if self.ctx.pool else None
+        limit = self.ctx.pool.limit if self.ctx.pool else None
+        return {
+            "cities": len(self.cities),
+            "ok": self.ok,
+            "fail": self.fail,
+            "elapsed": round(self.elapsed, 3),
+            "cities_per_s": round((self.ok + self.fail) / max(self.elapsed, 1e-9), 3),
+            "workers": self.workers,
+            "rps": self.ctx.limiter.rate if self.ctx.limiter else 0.0,
+            "retries": stats.retries if stats else 0,
+            "limit": round(limit.limit, 2) if limit else None,
+        }
+
+    def summary(self) -> str:
+        d = self.to_dict()
+        line = (
+            f"Region {self.region}: {d['cities']} city(ies) | OK: {self.ok} | FAIL: {self.fail} | "
+            f"{self.elapsed:.1f}s ({d['cities_per_s']:.2f} cities/s, "
+            f"{self.workers} worker(s), rps {d['rps'] or 'off'})"
+        )
+        pool = self.ctx.pool
+        if not (pool and pool.stats):
+            return line
+        trips = f" | breaker trips: {pool.breaker.trips}" if pool.breaker else ""
+        adaptive = f"\n   {pool.limit.summary()}" if pool.limit else ""
+        return f"{line}\n   {pool.stats.summary()}{trips}{adaptive}"
+
+
+def run_regions(
+    runs: list[RegionRun],
+    fn: Callable[[dict, EtlContext], Any],
+    on_result: Callable[[BatchResult], None],
+) -> None:
+    """
+    Drive every region concurrently, each through its own run_batch pool.
+    `on_result` calls are serialized, so a plain (non thread-safe) Tally works.
+    """
+    lock = threading.Lock()
+
+    def drive(run: RegionRun) -> None:
+        t0 = time.perf_counter()
+        total = len(run.cities)
+        results = run_batch(run.cities, lambda c: fn(c, run.ctx), workers=run.workers)
+        for done, result in enumerate(results, 1):
+            if result[3] is None:
+                run.ok += 1
+            else:
+                run.fail += 1
+            with lock:
+                on_result(result)
+            if run.pause > 0 and done < total:
+                time.sleep(run.pause)
+        run.elapsed = time.perf_counter() - t0
+
+    if len(runs) == 1:
+        drive(runs[0])
+        return
+    with ThreadPoolExecutor(max_workers=len(runs), thread_name_prefix="region") as ex:
+        for f in [ex.submit(drive, r) for r in runs]:
+            f.result()
@@ -0,0 +1,305 @@
+# hydro/retry.py
+"""
+Resilience helpers for upstream HTTP calls:
+- RetryPolicy:     attempts, exponential backoff with full jitter, Retry-After, timeouts
+- CircuitBreaker:  pauses every worker when the recent error rate spikes
+- RequestStats:    per-attempt latency and retry counters for the run summary
+- is_success:      the 2xx check every caller applies to the final status
+- send / send_async: run one logical request under those three (and, for
+                   send, an optional AdaptiveLimit on requests in flight); the
+                   per-attempt bookkeeping is shared, only the waiting differs
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, TypeVar
+
+import requests
+
+from .throttle import AdaptiveLimit
+
+log = logging.getLogger("hydromet")
+
+T = TypeVar("T")
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+SUCCESS_STATUSES = range(200, 300)
+
+
+def is_success(status: int) -> bool:
+    """A 2xx status."""
+    return status in SUCCESS_STATUSES
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After header (seconds or HTTP date) -> seconds, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    attempts: int = 4  # total tries, first one included
+    backoff: float = 1.0  # base delay (s), doubled per retry
+    max_backoff: float = 30.0
+    connect_timeout: float = 10.0
+    read_timeout: float = 40.0
+    retry_statuses: frozenset[int] = RETRY_STATUSES
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """requests-style (connect, read) timeout."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def delay(self, retry: int, retry_after: float | None = None) -> float:
+        """Seconds to wait before retry number `retry` (1-based)."""
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        cap = min(self.max_backoff, self.backoff * (2 ** (retry - 1)))
+        return random.uniform(0, cap)  # full jitter
+
+
+NO_RETRY = RetryPolicy(attempts=1)
+
+
+class CircuitBreaker:
+    """
+    Opens when at least `threshold` of the last `window` outcomes failed
+    (and `min_calls` were seen); while open, every caller waits `cooldown`
+    seconds before sending anything. Shared by all workers of a run.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        threshold: float = 0.5,
+        min_calls: int = 10,
+        cooldown: float = 30.0,
+    ):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    def wait_time(self) -> float:
+        return max(0.0, self._open_until - time.monotonic())
+
+    def wait(self) -> None:
+        if (delay := self.wait_time()) > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        if (delay := self.wait_time()) > 0:
+            await asyncio.sleep(delay)
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self._outcomes.append(ok)
+            n = len(self._outcomes)
+            failures = n - sum(self._outcomes)
+            if n >= self.min_calls and failures / n >= self.threshold:
+                self._open_until = time.monotonic() + self.cooldown
+                self._outcomes.clear()
+                self.trips += 1
+                log.warning(
+                    f"Circuit breaker open: {failures}/{n} recent requests failed; "
+                    f"pausing {self.cooldown:.0f}s"
+                )
+
+
+class RequestStats:
+    """Thread-safe counters for the run summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: list[float] = []
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def attempt(self, seconds: float) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def done(self, retries: int, ok: bool) -> None:
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+            self.failures += 0 if ok else 1
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            data = sorted(self.latencies)
+        if not data:
+            return 0.0
+        return data[min(len(data) - 1, int(p / 100 * len(data)))]
+
+    def summary(self) -> str:
+        return (
+            f"Requests: {self.requests} | attempts: {len(self.latencies)} | "
+            f"retries: {self.retries} | failed: {self.failures} | "
+            f"latency p50={self.percentile(50):.2f}s p95={self.percentile(95):.2f}s "
+            f"max={self.percentile(100):.2f}s"
+        )
+
+
+def _retryable_exc(e: Exception) -> bool:
+    return isinstance(e, requests.ConnectionError | requests.Timeout)
+
+
+class _Attempts:
+    """
+    Per-attempt bookkeeping of one logical request (stats, breaker, limit,
+    retry decision), shared by send() and send_async(): only the waiting differs.
+    """
+
+    def __init__(
+        self,
+        policy: RetryPolicy | None = None,
+        breaker: CircuitBreaker | None = None,
+        stats: RequestStats | None = None,
+        limit: AdaptiveLimit | None = None,
+        retryable_exc: Callable[[Exception], bool] = _retryable_exc,
+    ):
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker
+        self.stats = stats
+        self.limit = limit
+        self.retryable_exc = retryable_exc
+        # outcome of the attempt holding the limit slot: (congested, latency)
+        self._outcome: tuple[bool, float | None] = (False, None)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a slot of `limit` (if any) for one attempt; it is freed however the attempt ends."""
+        if not self.limit:
+            yield
+            return
+        self._outcome = (False, None)
+        token = self.limit.acquire()
+        try:
+            yield
+        finally:
+            congested, latency = self._outcome
+            self.limit.release(token, congested=congested, latency=latency)
+
+    def _finish(self, n: int, ok: bool) -> None:
+        if self.stats:
+            self.stats.done(n - 1, ok=ok)
+
+    def raised(self, n: int, e: Exception, elapsed: float) -> float | None:
+        """Attempt `n` raised `e`: seconds before the next one, or None to re-raise."""
+        retryable = self.retryable_exc(e)
+        self._outcome = (retryable, None)
+        if self.stats:
+            self.stats.attempt(elapsed)
+        if self.breaker:
+            self.breaker.record(False)
+        if n >= self.policy.attempts or not retryable:
+            self._finish(n, ok=False)
+            return None
+        log.warning(f"Attempt {n}/{self.policy.attempts} failed: {e}")
+        return self.policy.delay(n)
+
+    def returned(
+        self, n: int, status: int, retry_after: str | None, elapsed: float
+    ) -> float | None:
+        """Attempt `n` got `status`: seconds before a retry, or None to return the result."""
+        if self.stats:
+            self.stats.attempt(elapsed)
+        failed = status in self.policy.retry_statuses
+        self._outcome = (failed, elapsed)
+        if self.breaker:
+            self.breaker.record(not failed)
+        if not failed or n >= self.policy.attempts:
+            self._finish(n, ok=not failed)
+            return None
+        log.warning(f"Attempt {n}/{self.policy.attempts} got HTTP {status}")
+        return self.policy.delay(n, parse_retry_after(retry_after))
+
+
+def send(
+    attempt: Callable[[], T],
+    status_of: Callable[[T], tuple[int, str | None]],
+    *,
+    before: Callable[[], Any] | None = None,
+    **guards: Any,
+) -> T:
+    """
+    Call `attempt()` until it returns a non-retryable status or attempts run out.
+    `status_of(result)` gives (status_code, Retry-After header); `before()` runs
+    before every attempt (e.g. rate limiter). `guards` are policy, breaker, stats,
+    retryable_exc and limit: each attempt holds a slot of that AdaptiveLimit, which
+    sees retryable statuses/exceptions as congestion.
+    The last result/exception is returned/raised.
+    """
+    tries = _Attempts(**guards)
+    for n in range(1, tries.policy.attempts + 1):
+        if tries.breaker:
+            tries.breaker.wait()
+        if before:
+            before()
+        # the slot is taken after the rate limiter so waiting for a token holds none
+        with tries.slot():
+            t0 = time.perf_counter()
+            try:
+                result = attempt()
+            except Exception as e:
+                delay = tries.raised(n, e, time.perf_counter() - t0)
+                if delay is None:
+                    raise
+            else:
+                delay = tries.returned(n, *status_of(result), time.perf_counter() - t0)
+                if delay is None:
+                    return result
+        time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def send_async(
+    attempt: Callable[[], Awaitable[T]],
+    status_of: Callable[[T], tuple[int, str | None]],
+    *,
+    before: Callable[[], Awaitable[Any]] | None = None,
+    **guards: Any,
+) -> T:
+    """Async twin of send(); no `limit` (AdaptiveLimit blocks its thread)."""
+    tries = _Attempts(**guards)
+    if tries.limit:
+        raise TypeError("send_async does not take an AdaptiveLimit")
+    for n in range(1, tries.policy.attempts + 1):
+        if tries.breaker:
+            await tries.breaker.wait_async()
+        if before:
+            await before()
+        t0 = time.perf_counter()
+        try:
+            result = await attempt()
+        except Exception as e:
+            delay = tries.raised(n, e, time.perf_counter() - t0)
+            if delay is None:
+                raise
+        else:
+            delay = tries.returned(n, *status_of(result), time.perf_counter() - t0)
+            if delay is None:
+                return result
+        await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
@@ -1,4 +1,26 @@
-from config import BASE, URL_GET, URL_POST
+from config import (
+    BASE,
+    HTML_PARSER,
+    OROBNAT_ENCODING,
+    OROBNAT_REGION,
+    RESULTS_TYPED_COLUMNS,
+    URL_GET,
+    URL_POST,
+)
+
+# hydro modules read their config through this module
+__all__ = [
+    "BASE",
+    "DEFAULT_HEADERS",
+    "DEFAULT_SEARCH",
+    "HTML_PARSER",
+    "OROBNAT_ENCODING",
+    "OROBNAT_REGION",
+    "RESULTS_TYPED_COLUMNS",
+    "URL_GET",
+    "URL_POST",
+    "VERIFY_SSL",
+]
 
 VERIFY_SSL = False
 
@@ -9,9 +31,9 @@ DEFAULT_HEADERS = {
     "User-Agent": "Mozilla/5.0",
 }
 
-# Minimal defaults for the OROBNAT search form
+# Minimal defaults for the OROBNAT search form (idRegion: cities without a region)
 DEFAULT_SEARCH = {
-    "idRegion": "11",
+    "idRegion": OROBNAT_REGION,
     "usd": "AEP",
     "posPLV": "0",
 }
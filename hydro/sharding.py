@@ -0,0 +1,53 @@
+# hydro/sharding.py
+"""
+Deterministic sharding of city rows across nodes (`--shard i/N`).
+
+Assignment uses rendezvous (highest-random-weight) hashing on the city key
+(commune_code|water_code): it depends only on the key and N, so adding cities
+never moves existing ones, and going from N to N+1 shards moves only ~1/(N+1)
+of them.
+"""
+
+import hashlib
+from collections.abc import Callable, Iterable
+
+from .payloads import city_key
+
+
+def parse_shard(spec: str) -> tuple[int, int] | None:
+    """'i/N' (0-based i) -> (i, N); '' -> None."""
+    if not spec:
+        return None
+    try:
+        i_str, n_str = spec.split("/", 1)
+        i, n = int(i_str), int(n_str)
+    except ValueError as e:
+        raise ValueError(f"Invalid shard {spec!r}: expected 'i/N', e.g. 0/4") from e
+    if n < 1 or not (0 <= i < n):
+        raise ValueError(f"Invalid shard {spec!r}: need 0 <= i < N")
+    return i, n
+
+
+def _weight(key: str, shard: int) -> int:
+    digest = hashlib.blake2b(f"{shard}:{key}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def shard_of(key: str, n: int) -> int:
+    return max(range(n), key=lambda s: _weight(key, s))
+
+
+def filter_shard(
+    cities: Iterable[dict],
+    shard: tuple[int, int] | None,
+    key: Callable[[dict], str] = city_key,
+) -> list[dict]:
+    """Keep only the cities assigned to `shard` (all of them when shard is None)."""
+    if shard is None:
+        return list(cities)
+    i, n = shard
+    return [c for c in cities if shard_of(key(c), n) == i]
+
+
+def shard_label(shard: tuple[int, int] | None) -> str:
+    return f"{shard[0]}/{shard[1]}" if shard else "all"
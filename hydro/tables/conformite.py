@@ -1,32 +1,25 @@
-from bs4 import BeautifulSoup
-
 from db.supabase_utils import upsert_conformite as sb_upsert_conformite  # usar utils
 
+from ..parsing.fields import FieldMap
 from ..parsing.mappers import clean_text
-from ..parsing.sections import parse_section_kv
-
-
-def build_conformite(html: str, id_page: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-    conf = parse_section_kv(soup, "Conformité")
+from ..parsing.page import ParsedPage, as_page
+from ..parsing.sections import CONF_TITLE
+
+# column -> label pattern(s) in the "Conformité" table
+CONF_FIELDS = FieldMap(
+    {
+        "conclusions_sanitaires": "conclusions sanitaires",
+        "conformite_bacteriologique": "bactériolog",
+        "conformite_physico_chimique": "physico",
+        "respect_references_qualite": "références",
+    }
+)
 
-    def gc(key: str):
-        for k, v in conf.items():
-            if key.lower() in k.lower():
-                return v
-        return None
 
-    return {
-        "id": id_page,
-        "conclusions_sanitaires": clean_text(
-            gc("conclusions sanitaires")
-            or gc("conclusions_sanitaires")
-            or gc("Conclusions sanitaires")
-        ),
-        "conformite_bacteriologique": gc("bactériolog"),
-        "conformite_physico_chimique": gc("physico"),
-        "respect_references_qualite": gc("références") or gc("references"),
-    }
+def build_conformite(page: ParsedPage | str, id_page: str) -> dict:
+    conf = CONF_FIELDS.extract(as_page(page).section(CONF_TITLE))
+    conf["conclusions_sanitaires"] = clean_text(conf["conclusions_sanitaires"])
+    return {"id": id_page, **conf}
 
 
 def upsert_conformite(row: dict) -> None:
@@ -1,16 +1,14 @@
-from bs4 import BeautifulSoup
-
 from db.supabase_utils import upsert_criteres as sb_upsert_criteres  # usar utils
 
-from ..parsing.sections import extract_communes_block_csv
+from ..parsing.page import ParsedPage, as_page
 
 
-def build_criteres(html: str, payload: dict, id_page: str) -> dict:
+def build_criteres(page: ParsedPage | str, payload: dict, id_page: str) -> dict:
     """
     departement, commune (code INSEE), reseau -> del payload
     communes (CSV) -> del HTML (bloque 'Commune(s) et/ou quartier(s) du réseau')
     """
-    communes_csv = extract_communes_block_csv(BeautifulSoup(html, "html.parser"))
+    communes_csv = as_page(page).communes_csv
     return {
         "id": id_page,
         "departement": (payload.get("departement") or "").strip(),
@@ -1,31 +1,27 @@
-from bs4 import BeautifulSoup
-
 from db.supabase_utils import upsert_informations as sb_upsert_informations  # usar utils
 
+from ..parsing.fields import FieldMap
 from ..parsing.mappers import parse_datetime_any
-from ..parsing.sections import parse_section_kv
-
-
-def build_informations(html: str, id_page: str) -> dict:
-    soup = BeautifulSoup(html, "html.parser")
-    info = parse_section_kv(soup, "Informations générales")
+from ..parsing.page import ParsedPage, as_page
+from ..parsing.sections import INFO_TITLE
+
+# column -> label pattern(s) in the "Informations générales" table
+INFO_FIELDS = FieldMap(
+    {
+        "date_prelevement": "prélèvement",
+        "commune_prelevement": "commune",
+        "installation": "installation",
+        "service_distribution": "service",
+        "responsable_distribution": "responsable",
+        "maitre_ouvrage": "maître",
+    }
+)
 
-    def gi(key: str):
-        for k, v in info.items():
-            if key.lower() in k.lower():
-                return v
-        return None
 
-    dt = parse_datetime_any(gi("prélèvement"))
-    return {
-        "id": id_page,
-        "date_prelevement": dt.isoformat() if dt else None,
-        "commune_prelevement": gi("commune"),
-        "installation": gi("installation"),
-        "service_distribution": gi("service"),
-        "responsable_distribution": gi("responsable"),
-        "maitre_ouvrage": gi("maître") or gi("maitre"),
-    }
+def build_informations(page: ParsedPage | str, id_page: str) -> dict:
+    info = INFO_FIELDS.extract(as_page(page).section(INFO_TITLE))
+    dt = parse_datetime_any(info["date_prelevement"])
+    return {"id": id_page, **info, "date_prelevement": dt.isoformat() if dt else None}
 
 
 def upsert_informations(row: dict) -> None:
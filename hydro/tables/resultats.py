@@ -1,30 +1,37 @@
-from bs4 import BeautifulSoup
-
 from db.supabase_utils import upsert_resultats as sb_upsert_resultats  # usar utils
 
-from ..parsing.sections import parse_results_rows
-
-
-def build_resultats(html: str, id_page: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
-    rows = parse_results_rows(soup)
-    out: list[dict] = []
-    for r in rows:
-        out.append(
-            {
-                "id": id_page,
-                "parametre": r.get("parametre") or r.get("Paramètre") or r.get("Parametre") or "",
-                "valeur": r.get("valeur") or r.get("Valeur") or "",
-                "limite_qualite": r.get("limite_qualite") or r.get("Limite de qualité") or "",
-                "reference_qualite": r.get("reference_qualite")
-                or r.get("Référence de qualité")
-                or r.get("Reference de qualite")
-                or "",
-            }
-        )
+from ..parsing.fields import FieldMap
+from ..parsing.page import ParsedPage, as_page
+from ..parsing.values import VALUE_FIELDS, parse_values, typed_columns
+from ..settings import RESULTS_TYPED_COLUMNS
+
+# column -> header(s) of the "Résultats d'analyses" table (whole header, not substring)
+RESULT_FIELDS = FieldMap(
+    {
+        "parametre": "parametre",
+        "valeur": "valeur",
+        "limite_qualite": ("limite_qualite", "limite de qualite"),
+        "reference_qualite": ("reference_qualite", "reference de qualite"),
+    },
+    exact=True,
+)
+
+
+def build_resultats(page: ParsedPage | str, id_page: str) -> list[dict]:
+    out = RESULT_FIELDS.extract_rows(as_page(page).results_rows, missing="", id=id_page)
+    if RESULTS_TYPED_COLUMNS:
+        add_typed_columns(out)
     return out
 
 
+def add_typed_columns(rows: list[dict]) -> None:
+    """Add <field>_op/_num/_max/_unit/_flag next to each raw value column (in place)."""
+    for field in VALUE_FIELDS:
+        values = parse_values([r[field] for r in rows])
+        for r, v in zip(rows, values, strict=True):
+            r.update(typed_columns(field, v, measured=field == "valeur"))
+
+
 def upsert_resultats(rows: list[dict]) -> None:
     if rows:
         sb_upsert_resultats(rows)
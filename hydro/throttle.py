@@ -0,0 +1,145 @@
+# hydro/throttle.py
+"""
+Rate limiting shared by all workers of a run.
+
+TokenBucket caps the request rate to an upstream (e.g. OROBNAT) no matter how
+many threads call it: each request takes one token, tokens refill at `rate`
+per second, and at most `burst` can accumulate.
+
+AdaptiveLimit caps how many requests are in flight and moves that cap with
+the upstream's health (AIMD): it grows additively while responses come back
+fast and clean, and is cut multiplicatively on 429/5xx/timeouts.
+"""
+
+import asyncio
+import threading
+import time
+
+from .metrics import METRICS
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("TokenBucket: rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _take(self, tokens: float) -> float:
+        """Take `tokens` if available and return 0, else return the delay to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available; return the time waited (seconds)."""
+        waited = 0.0
+        while (delay := self._take(tokens)) > 0:
+            time.sleep(delay)
+            waited += delay
+        return waited
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Same as acquire() without blocking the event loop."""
+        waited = 0.0
+        while (delay := self._take(tokens)) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        return waited
+
+
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit shared by all workers calling one upstream.
+
+    At most int(limit) requests are in flight (acquire() blocks). Each healthy
+    response (no congestion signal, latency within `slow_factor` x the running
+    latency baseline) adds 1/limit, i.e. about +1 per round of `limit`
+    requests; a slow one leaves the limit as is. A congestion signal (429,
+    5xx, timeout) multiplies it by `decrease`, at most once per round:
+    failures of requests sent before the last cut are ignored, so one burst
+    of errors is one cut. The limit is published as the METRICS gauge
+    "throttle.<name>.limit".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_limit: int,
+        *,
+        initial: float | None = None,
+        min_limit: int = 1,
+        decrease: float = 0.5,
+        slow_factor: float = 2.0,
+    ):
+        if max_limit < 1 or not 0 < decrease < 1:
+            raise ValueError("AdaptiveLimit: max_limit must be >= 1 and 0 < decrease < 1")
+        self.name = name
+        self.min_limit = max(1, min(min_limit, max_limit))
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.slow_factor = slow_factor
+        start = initial if initial is not None else min(2, max_limit)
+        self.limit = float(min(max_limit, max(self.min_limit, start)))
+        self.peak = self.limit
+        self.cuts = 0
+        self.in_flight = 0
+        self._baseline: float | None = None  # EWMA of response latencies
+        self._epoch = 0  # bumped on every cut
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self) -> None:
+        METRICS.gauge(f"throttle.{self.name}.limit", self.limit)
+
+    def acquire(self) -> int:
+        """Wait for a free slot; the returned token goes back to release()."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            return self._epoch
+
+    def release(self, token: int, congested: bool, latency: float | None = None) -> None:
+        """Free the slot and adapt the limit to the outcome of that request."""
+        with self._cond:
+            self.in_flight -= 1
+            before = self.limit
+            if congested:
+                if token == self._epoch:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._epoch += 1
+                    self.cuts += 1
+            elif latency is not None and self._healthy(latency):
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self.peak = max(self.peak, self.limit)
+            changed = self.limit != before
+            self._cond.notify_all()
+        if changed:
+            self._publish()
+            if congested:
+                METRICS.add(f"throttle.{self.name}.cuts")
+
+    def _healthy(self, latency: float) -> bool:
+        if self._baseline is None:
+            self._baseline = latency
+            return True
+        healthy = latency <= self.slow_factor * self._baseline
+        self._baseline = 0.9 * self._baseline + 0.1 * latency  # follows lasting shifts
+        return healthy
+
+    def summary(self) -> str:
+        return (
+            f"Adaptive {self.name}: limit {self.limit:.1f} "
+            f"(range {self.min_limit}-{self.max_limit}, peak {self.peak:.1f}) | cuts: {self.cuts}"
+        )
@@ -0,0 +1,5 @@
+import os
+
+# db.supabase_utils builds its client at import time; the tests never reach it
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
@@ -0,0 +1,36 @@
+"""Every registered parser backend must build the same table rows from a saved page."""
+
+from pathlib import Path
+
+import pytest
+
+from hydro.etl_runner import build_page_rows
+from hydro.parsing.backends import BACKENDS, available_backends
+
+PAGES = sorted((Path(__file__).parent / "fixtures" / "pages").glob("*.html"))
+PAYLOAD = {"reseau": "075000123", "departement": "075", "communeDepartement": "75056"}
+REFERENCE = "bs4"
+
+
+def _rows(backend: str, page: Path):
+    return build_page_rows(BACKENDS[backend](page.read_bytes()), PAYLOAD)
+
+
+def test_corpus_is_present():
+    assert PAGES
+
+
+@pytest.mark.parametrize("backend", [n for n in BACKENDS if n != REFERENCE])
+@pytest.mark.parametrize("page", PAGES, ids=lambda p: p.stem)
+def test_backend_builds_same_rows(backend: str, page: Path):
+    if backend not in available_backends():
+        pytest.skip(f"{backend} is not installed")
+    assert _rows(backend, page) == _rows(REFERENCE, page)
+
+
+@pytest.mark.parametrize("page", PAGES, ids=lambda p: p.stem)
+def test_str_and_bytes_input_agree(page: Path):
+    html = page.read_bytes()
+    parse = BACKENDS[REFERENCE]
+    text = html.decode("cp1252" if "cp1252" in page.stem else "utf-8")
+    assert build_page_rows(parse(text), PAYLOAD) == build_page_rows(parse(html), PAYLOAD)
@@ -0,0 +1,8 @@
+"""The parsing benchmark is a gate: a regression against bench_baseline.json fails the suite."""
+
+from hydro.parsing import bench
+
+
+def test_bench_has_no_regression(tmp_path):
+    argv = ["--min-time", str(bench.MIN_SAMPLE_S), "--json", str(tmp_path / "bench.json")]
+    assert bench.main(argv) == 0
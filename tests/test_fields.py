@@ -0,0 +1,100 @@
+"""FieldMap label resolution for the section tables."""
+
+import pytest
+
+from hydro.parsing import fields
+from hydro.parsing.fields import FieldMap, normalize_label
+from hydro.tables.conformite import CONF_FIELDS
+from hydro.tables.informations import INFO_FIELDS
+from hydro.tables.resultats import RESULT_FIELDS
+
+
+@pytest.mark.parametrize(
+    "label", ["Maître d'ouvrage", "Maitre d'ouvrage", "MAITRE D'OUVRAGE", "maître_d'ouvrage"]
+)
+def test_info_owner_spellings(label):
+    assert INFO_FIELDS.extract({label: "SIAEP"})["maitre_ouvrage"] == "SIAEP"
+
+
+@pytest.mark.parametrize(
+    ("label", "column"),
+    [
+        ("Conclusions sanitaires", "conclusions_sanitaires"),
+        ("conclusions_sanitaires", "conclusions_sanitaires"),
+        ("Respect des références de qualité", "respect_references_qualite"),
+        ("Respect des references de qualite", "respect_references_qualite"),
+        ("Conformité bactériologique", "conformite_bacteriologique"),
+    ],
+)
+def test_conformite_spellings(label, column):
+    assert CONF_FIELDS.extract({label: "oui"})[column] == "oui"
+
+
+def test_missing_label_gives_none():
+    info = INFO_FIELDS.extract({"Commune de prélèvement": "PARIS"})
+    assert info["commune_prelevement"] == "PARIS"
+    assert info["maitre_ouvrage"] is None
+
+
+def test_normalize_label():
+    assert normalize_label("  Référence_de   QUALITÉ ") == "reference de qualite"
+
+
+def test_patterns_are_tried_in_priority_order():
+    fm = FieldMap({"col": ("second", "first")})
+    # the first pattern wins even when its label comes later on the page
+    assert fm.extract({"the first label": "a", "the second label": "b"}) == {"col": "b"}
+    assert fm.extract({"the first label": "a"}) == {"col": "a"}
+
+
+def test_first_label_in_page_order_wins_for_one_pattern():
+    fm = FieldMap({"col": "service"})
+    assert fm.extract({"Service A": "a", "Service B": "b"}) == {"col": "a"}
+
+
+def test_exact_headers_do_not_match_substrings():
+    row = {
+        "Paramètre": "pH",
+        "Valeur": "7,8",
+        "Limite de qualité": "",
+        "Référence de qualité": "",
+    }
+    assert RESULT_FIELDS.extract(row) == {
+        "parametre": "pH",
+        "valeur": "7,8",
+        "limite_qualite": "",
+        "reference_qualite": "",
+    }
+    # a substring match is enough without exact=True, never with it
+    assert RESULT_FIELDS.extract({"Valeur mesurée": "1"})["valeur"] is None
+    assert FieldMap({"valeur": "valeur"}).extract({"Valeur mesurée": "1"}) == {"valeur": "1"}
+
+
+def test_extract_rows_fills_missing_and_const():
+    rows = [{"parametre": "pH", "valeur": "7"}, {"parametre": "Nitrates", "valeur": "12 mg/L"}]
+    out = RESULT_FIELDS.extract_rows(rows, missing="", id="p1")
+    assert out == [{"id": "p1", **r, "limite_qualite": "", "reference_qualite": ""} for r in rows]
+
+
+def test_index_is_cached_per_label_set(monkeypatch):
+    fm = FieldMap({"col": "service"})
+    built = []
+    build = fm._build_index
+    monkeypatch.setattr(fm, "_build_index", lambda labels: built.append(labels) or build(labels))
+
+    fm.extract({"Service": "a"})
+    fm.extract({"Service": "b"})
+    fm.extract_rows([{"Service": "c"}, {"Service": "d"}])
+    assert built == [("Service",)]
+
+    fm.extract({"Service de l'eau": "e"})
+    assert built == [("Service",), ("Service de l'eau",)]
+
+
+def test_index_cache_is_bounded(monkeypatch):
+    limit = 2
+    monkeypatch.setattr(fields, "MAX_INDEXES", limit)
+    fm = FieldMap({"col": "x"})
+    for i in range(5):
+        fm.index((f"x{i}",))
+    assert len(fm._indexes) <= limit
@@ -0,0 +1,36 @@
+"""parse_value on cells as they appear in OROBNAT result tables."""
+
+import pytest
+
+from hydro.parsing.values import Value, parse_value
+
+CELLS = [
+    ("<0,05 mg/L", Value("<", 0.05, None, "mg/L")),
+    ("≤50 mg/L", Value("<=", 50.0, None, "mg/L")),
+    ("> 1 000 n/(100mL)", Value(">", 1000.0, None, "n/(100mL)")),
+    ("0,26 mg(Cl2)/L", Value("=", 0.26, None, "mg(Cl2)/L")),
+    ("1,5E-3 mg/L", Value("=", 0.0015, None, "mg/L")),
+    # thousands separators vs units that start with digits
+    ("1 200 µS/cm", Value("=", 1200.0, None, "µS/cm")),
+    ("12 100mL", Value("=", 12.0, None, "100mL")),
+    ("0 n/(100mL)", Value("=", 0.0, None, "n/(100mL)")),
+    ("<1 n/(100mL)", Value("<", 1.0, None, "n/(100mL)")),
+    # ranges
+    ("≥6,5 et ≤9 unité pH", Value(">=", 6.5, 9.0, "unité pH", "range")),
+    ("10 mg/L - 20 mg/L", Value(">=", 10.0, 20.0, "mg/L", "range")),
+    ("0,5 à 1 mg/L", Value(">=", 0.5, 1.0, "mg/L", "range")),
+    ("15 - 25", Value(">=", 15.0, 25.0, None, "range")),
+    # cells without a number
+    ("<LQ", Value(flag="below_detection")),
+    ("Absence", Value(flag="absent")),
+    ("Présence", Value(flag="present")),
+    ("Traces", Value(flag="trace")),
+    ("Conforme", Value(flag="text")),
+    ("", Value()),
+    (None, Value()),
+]
+
+
+@pytest.mark.parametrize(("cell", "expected"), CELLS, ids=[repr(c) for c, _ in CELLS])
+def test_parse_value(cell, expected):
+    assert parse_value(cell) == expected
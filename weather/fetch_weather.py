@@ -1,17 +1,51 @@
+import argparse
+import json
 import time
 from datetime import datetime, timezone
 
 import requests
+from requests.adapters import HTTPAdapter
 
-from config import API_KEY, OPENWEATHER_URL
-from db.supabase_utils import fetch_cities, insert_weather
+from config import API_KEY, OPENWEATHER_RPM, OPENWEATHER_URL
+from db.supabase_utils import upsert_weather
+from hydro.city_cache import add_city_cache_args, load_cities
+from hydro.executor import run_batch
+from hydro.retry import NO_RETRY, is_success, send
+from hydro.sharding import filter_shard, parse_shard, shard_label
+from hydro.throttle import AdaptiveLimit, TokenBucket
 
+# Columns of `cities` this job reads (the shard key columns are always included)
+CITY_COLUMNS = ("city_name", "lat", "lon")
 
-def get_weather(lat, lon, api_key=API_KEY, units="metric", lang="en"):
+
+def make_session(workers: int = 1) -> requests.Session:
+    """Keep-alive session shared by the workers (up to one pooled connection each)."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+def get_weather(
+    lat, lon, api_key=API_KEY, units="metric", lang="en", *, limit=None, session=None, limiter=None
+):
+    """
+    Current weather JSON, or None. `session`: pooled session (default: a new
+    connection per call); `limiter`: TokenBucket sized to the key's quota;
+    `limit`: AdaptiveLimit shared by the workers.
+    """
     url = OPENWEATHER_URL
     params = {"lat": lat, "lon": lon, "appid": api_key, "units": units, "lang": lang}
-    resp = requests.get(url, params=params, timeout=20)
-    if resp.status_code == 200:
+    http = session or requests
+    resp = send(
+        lambda: http.get(url, params=params, timeout=20),
+        lambda r: (r.status_code, r.headers.get("Retry-After")),
+        policy=NO_RETRY,
+        before=limiter.acquire if limiter else None,
+        limit=limit,
+    )
+    if is_success(resp.status_code):
         return resp.json()
     print("API error:", resp.status_code, resp.text)
     return None
@@ -42,29 +76,116 @@ def build_weather_row(city_row, weather):
     }
 
 
+def fetch_rows(cities, args):
+    """
+    Fetch every city (--workers at a time) and map it to a weather_data row.
+    Return ([(city, row)], failed). Concurrent runs are paced by --rpm (and
+    --adaptive); a sequential run without --adaptive sleeps --sleep per call.
+    """
+    workers = max(1, args.workers)
+    limit = AdaptiveLimit("openweather", max_limit=workers) if args.adaptive else None
+    paced = workers > 1 or args.adaptive
+    limiter = TokenBucket(args.rpm / 60, burst=workers) if paced and args.rpm > 0 else None
+    session = make_session(workers)
+
+    def fetch(c):
+        return get_weather(c["lat"], c["lon"], limit=limit, session=session, limiter=limiter)
+
+    fetched, failed = [], []
+    try:
+        for i, (_, c, w, err) in enumerate(run_batch(cities, fetch, workers), start=1):
+            row = build_weather_row(c, w) if w else None
+            if row and row["city_id"] is not None and row["dt_unix"] is not None:
+                fetched.append((c, row))
+                print(f"✅ [{i}/{len(cities)}] Fetched {c['city_name']}.")
+            else:
+                error = str(err) if err else ("no city id / dt in response" if w else "no data")
+                print(f"❌ [{i}/{len(cities)}] No data for {c['city_name']}: {error}")
+                failed.append({"name": c["city_name"], "error": error})
+            if not paced:
+                time.sleep(args.sleep)  # Respect API rate limits
+    finally:
+        session.close()
+    if limit:
+        print(limit.summary())
+    return fetched, failed
+
+
 def main():
-    cities = fetch_cities()
+    parser = argparse.ArgumentParser(description="HydroMet weather ETL")
+    parser.add_argument(
+        "--sleep", type=float, default=1.1, help="Seconds between API calls (sequential runs)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Cities fetched concurrently (paced by --rpm)"
+    )
+    parser.add_argument(
+        "--rpm",
+        type=float,
+        default=OPENWEATHER_RPM,
+        help="API calls/minute allowed by the key (OPENWEATHER_RPM; 0 = unpaced)",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Adapt the calls in flight (AIMD, 1..--workers) to the API's latency and "
+        "429/5xx/timeouts; replaces --sleep",
+    )
+    parser.add_argument("--limit", type=int, default=0, help="Only the first N cities (0 = all)")
+    parser.add_argument(
+        "--shard", type=str, default="", help="Process only shard i of N (e.g. 0/4)"
+    )
+    parser.add_argument(
+        "--summary-json", type=str, default="", help="Also write the run summary to this JSON file"
+    )
+    add_city_cache_args(parser)
+    args = parser.parse_args()
+
+    shard = parse_shard(args.shard)
+    cities = load_cities(
+        CITY_COLUMNS,
+        args.city_cache,
+        args.city_cache_ttl,
+        args.refresh_cities,
+        args.city_cache_max_age,
+    )
+    located = [c for c in cities if c.get("lat") is not None and c.get("lon") is not None]
+    if len(located) < len(cities):
+        # e.g. discovered with --activate and not geocoded yet
+        print(f"Skipping {len(cities) - len(located)} active city(ies) without coordinates.")
+    cities = filter_shard(located, shard)
+    if args.limit:
+        cities = cities[: args.limit]
     if not cities:
         print("There are no active cities in the 'cities' table.")
         return
 
-    print(f"Processing {len(cities)} cities…")
-    for i, c in enumerate(cities, start=1):
-        lat, lon = c["lat"], c["lon"]
-        w = get_weather(lat, lon)
-        if w:
-            try:
-                row = build_weather_row(c, w)
-                r = insert_weather(row)
-                if r.data:
-                    print(f"✅ [{i}/{len(cities)}] Inserted {c['city_name']}.")
-                else:
-                    print(f"⚠️ [{i}/{len(cities)}] Insert executed with no data returned.")
-            except Exception as e:
-                print(f"❌ [{i}/{len(cities)}] Error inserting {c['city_name']}: {e}")
-        else:
-            print(f"❌ [{i}/{len(cities)}] No data for {c['city_name']}.")
-        time.sleep(1.1)  # Respect API rate limits
+    print(f"Processing {len(cities)} cities (shard {shard_label(shard)})…")
+    fetched, failed = fetch_rows(cities, args)
+
+    # One idempotent bulk upsert on (city_id, dt_unix) instead of one insert per city
+    ok, written = 0, 0
+    if fetched:
+        try:
+            written = upsert_weather([row for _, row in fetched])
+            ok = len(fetched)
+            print(f"✅ Upserted {written} weather row(s) for {ok} city(ies).")
+        except Exception as e:
+            print(f"❌ Error upserting {len(fetched)} weather row(s): {e}")
+            failed += [{"name": c["city_name"], "error": str(e)} for c, _ in fetched]
+
+    print(f"Total: {len(cities)} | OK: {ok} | FAIL: {len(failed)} | shard: {shard_label(shard)}")
+    if args.summary_json:
+        summary = {
+            "total": len(cities),
+            "ok": ok,
+            "fail": len(failed),
+            "written": written,
+            "failed": failed,
+            "shard": shard_label(shard),
+        }
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
 
 
 if __name__ == "__main__":